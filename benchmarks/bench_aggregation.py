@@ -0,0 +1,63 @@
+# Licensed to the Apache Software Foundation (ASF) under one or more
+# contributor license agreements.  See the NOTICE file distributed with
+# this work for additional information regarding copyright ownership.
+# The ASF licenses this file to You under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with
+# the License.  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Measures how long it takes to re-aggregate a large changelog.
+
+Usage: python benchmarks/bench_aggregation.py [rows]
+"""
+
+import os
+import sys
+import random
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(
+                                                               __file__))))
+
+from rackspace_monitoring.base import AlarmChangelog
+from rackspace_monitoring.aggregation import AlarmStateAggregator
+
+STATES = ['OK', 'WARNING', 'CRITICAL']
+
+
+def build(rows):
+    aggregator = AlarmStateAggregator()
+    rnd = random.Random(42)
+    entries = (AlarmChangelog(id=i, alarm_id='al%d' % (i % 5000),
+                              entity_id='en%d' % (i % 1000),
+                              check_id='ch%d' % (i % 5000),
+                              state=rnd.choice(STATES), timestamp=i)
+               for i in xrange(rows))
+    aggregator.add_changelog(entries)
+    return aggregator
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    aggregator = build(rows)
+
+    for name in ['transition_matrix', 'transition_rates']:
+        func = getattr(aggregator, name)
+        best = min(timeit.repeat(func, number=1, repeat=5))
+        print('%-20s %8d rows %8.3f s' % (name, rows, best))
+
+    func = lambda: aggregator.transition_counts(by='entity')
+    best = min(timeit.repeat(func, number=1, repeat=5))
+    print('%-20s %8d rows %8.3f s' % ('transition_counts', rows, best))
+
+
+if __name__ == '__main__':
+    main()
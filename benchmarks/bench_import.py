@@ -0,0 +1,158 @@
+# Licensed to the Apache Software Foundation (ASF) under one or more
+# contributor license agreements.  See the NOTICE file distributed with
+# this work for additional information regarding copyright ownership.
+# The ASF licenses this file to You under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with
+# the License.  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Measures cold import time of the package entry points, and the time to
+construct a driver, in fresh interpreters and checks it against a budget.
+
+Python 2 has no -X importtime so the child process wraps __import__ and
+reports self and cumulative time of every module it loads, the same
+numbers -X importtime prints.
+
+Driver construction uses ex_auth_token and ex_tenant_ids so it doesn't
+make an authentication request.
+
+Exits with status 1 if a time budget is exceeded or a module which should
+be imported lazily is loaded.
+
+Usage: python benchmarks/bench_import.py [runs] [top]
+"""
+
+import os
+import sys
+import subprocess
+
+try:
+    import simplejson as json
+except:
+    import json
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+LAZY = ['rackspace_monitoring.criteria', 'rackspace_monitoring.pagination',
+        'ujson', 'cjson', 'numpy', 'sqlite3']
+
+CONSTRUCT_DRIVER = """
+from rackspace_monitoring.providers import get_driver
+from rackspace_monitoring.types import Provider
+get_driver(Provider.RACKSPACE)('user', 'key', ex_auth_token='token',
+                               ex_tenant_ids={'compute': '23213'},
+                               ex_force_base_url='http://127.0.0.1:1')
+"""
+
+# name -> (statement, median cumulative time budget in ms, modules which
+# must not be loaded by running it)
+BUDGETS = {
+    'import rackspace_monitoring.providers': (
+        'import rackspace_monitoring.providers', 10,
+        ['libcloud', 'rackspace_monitoring.drivers.rackspace']),
+    'import rackspace_monitoring.drivers.rackspace': (
+        'import rackspace_monitoring.drivers.rackspace', 150, LAZY),
+    # The JSON codec is picked on the first request. libcloud itself loads
+    # simplejson if it's installed and json otherwise.
+    'get_driver(...)(user, key)': (
+        CONSTRUCT_DRIVER, 200,
+        LAZY + (json.__name__ == 'simplejson' and ['json'] or [])),
+}
+
+CHILD = r"""
+import sys
+import time
+import __builtin__
+
+sys.path.insert(0, sys.argv[2])
+original_import = __builtin__.__import__
+records = []
+stack = []
+
+
+def timed_import(name, *args, **kwargs):
+    before = len(sys.modules)
+    stack.append(0.0)
+    start = time.time()
+    try:
+        return original_import(name, *args, **kwargs)
+    finally:
+        elapsed = time.time() - start
+        children = stack.pop()
+        if stack:
+            stack[-1] += elapsed
+        if len(sys.modules) != before:
+            records.append((name, elapsed - children, elapsed))
+
+__builtin__.__import__ = timed_import
+start = time.time()
+exec sys.argv[1]
+total = time.time() - start
+__builtin__.__import__ = original_import
+# Modules which failed to import are None
+modules = sorted([name for name, module in sys.modules.items() if module])
+
+import json
+sys.stdout.write(json.dumps({'total': total, 'records': records,
+                             'modules': modules}))
+"""
+
+
+def run_child(statement):
+    env = dict(os.environ)
+    env['PYTHONDONTWRITEBYTECODE'] = '1'
+    process = subprocess.Popen([sys.executable, '-c', CHILD, statement,
+                                ROOT], stdout=subprocess.PIPE, env=env)
+    stdout = process.communicate()[0]
+    if process.returncode != 0:
+        raise Exception('Running %s failed' % (statement))
+    return json.loads(stdout)
+
+
+def median(values):
+    values = sorted(values)
+    return values[len(values) / 2]
+
+
+def main():
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    top = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+    failed = False
+
+    for name in sorted(BUDGETS.keys()):
+        statement, budget, forbidden = BUDGETS[name]
+        results = [run_child(statement) for _ in xrange(runs)]
+        total = median([result['total'] for result in results]) * 1000
+        loaded = results[0]['modules']
+
+        print('%s: %.1f ms (budget %d ms), %d modules' %
+              (name, total, budget, len(loaded)))
+        print('  %10s %10s  imported module' % ('self [us]', 'cum [us]'))
+        records = sorted(results[-1]['records'], key=lambda r: -r[1])
+        for name, self_time, cumulative in records[:top]:
+            print('  %10d %10d  %s' % (self_time * 1e6, cumulative * 1e6,
+                                       name))
+
+        if total > budget:
+            failed = True
+            print('  FAIL: over budget by %.1f ms' % (total - budget))
+
+        unexpected = [name for name in loaded if name.split('.')[0] in
+                      forbidden or name in forbidden]
+        if unexpected:
+            failed = True
+            print('  FAIL: eagerly imported %s' % (', '.join(unexpected)))
+
+    sys.exit(failed and 1 or 0)
+
+
+if __name__ == '__main__':
+    main()
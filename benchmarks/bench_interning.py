@@ -0,0 +1,124 @@
+# Licensed to the Apache Software Foundation (ASF) under one or more
+# contributor license agreements.  See the NOTICE file distributed with
+# this work for additional information regarding copyright ownership.
+# The ASF licenses this file to You under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with
+# the License.  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Measures memory retained by mapped overview objects with and without
+interning of repeated values (ex_intern_values).
+
+Usage: python benchmarks/bench_interning.py [checks]
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(
+                                                               __file__))))
+
+try:
+    import simplejson as json
+except:
+    import json
+
+from rackspace_monitoring.utils import Interner, NullInterner
+from rackspace_monitoring.drivers.rackspace import RackspaceMonitoringDriver
+
+CHECKS_PER_ENTITY = 5
+ZONES = ['mzdfw', 'mzord', 'mziad', 'mzlon', 'mzhkg', 'mzsyd']
+TYPES = ['remote.http', 'remote.ping', 'remote.dns', 'remote.ssh']
+STATES = ['OK', 'WARNING', 'CRITICAL']
+
+
+def overview_page(checks):
+    values = []
+    for i in xrange(checks / CHECKS_PER_ENTITY):
+        entity_id = 'en%08d' % (i)
+        item = {'entity': {'id': entity_id, 'label': 'host-%d' % (i),
+                           'ip_addresses': {'default': '10.0.0.1'},
+                           'metadata': {}},
+                'checks': [], 'alarms': [], 'latest_alarm_states': []}
+
+        for j in xrange(CHECKS_PER_ENTITY):
+            check_id = 'ch%08d%d' % (i, j)
+            alarm_id = 'al%08d%d' % (i, j)
+            item['checks'].append({
+                'id': check_id, 'label': 'check %d' % (j),
+                'type': TYPES[j % len(TYPES)], 'details': {},
+                'monitoring_zones_poll': ZONES[:3], 'timeout': 30,
+                'period': 60, 'target_alias': 'default',
+                'target_resolver': None})
+            item['alarms'].append({
+                'id': alarm_id, 'check_type': TYPES[j % len(TYPES)],
+                'check_id': check_id, 'criteria': 'return OK',
+                'notification_plan_id': 'npTechnicalContactsEmail'})
+            item['latest_alarm_states'].append({
+                'entity_id': entity_id, 'check_id': check_id,
+                'alarm_id': alarm_id, 'timestamp': 1321898988,
+                'state': STATES[j % len(STATES)]})
+
+        values.append(item)
+    return json.dumps({'values': values})
+
+
+def retained_size(root, exclude):
+    seen = set([id(obj) for obj in exclude])
+    stack = [root]
+    total = 0
+
+    while stack:
+        obj = stack.pop()
+        if id(obj) in seen:
+            continue
+        seen.add(id(obj))
+        total += sys.getsizeof(obj)
+
+        if isinstance(obj, dict):
+            stack.extend(obj.keys())
+            stack.extend(obj.values())
+        elif isinstance(obj, (list, tuple)):
+            stack.extend(obj)
+        elif hasattr(obj, '__dict__'):
+            stack.append(obj.__dict__)
+
+    return total
+
+
+def measure(body, interner):
+    driver = RackspaceMonitoringDriver.__new__(RackspaceMonitoringDriver)
+    driver._identity_map = None
+    driver._lazy_models = False
+    driver._intern = interner
+
+    data = json.loads(body)
+    result = [driver._to_overview_obj(item, {}) for item in data['values']]
+    del data
+    return retained_size(result, exclude=[driver, driver.__dict__, None])
+
+
+def main():
+    checks = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    body = overview_page(checks)
+
+    baseline = measure(body, NullInterner())
+    interned = measure(body, Interner())
+
+    print('checks:            %d' % (checks))
+    print('without interning: %.1f MB' % (baseline / 1024.0 / 1024))
+    print('with interning:    %.1f MB' % (interned / 1024.0 / 1024))
+    print('saving:            %.1f %%' % (100.0 * (baseline - interned) /
+                                          baseline))
+
+
+if __name__ == '__main__':
+    main()
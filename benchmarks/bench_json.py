@@ -0,0 +1,122 @@
+# Licensed to the Apache Software Foundation (ASF) under one or more
+# contributor license agreements.  See the NOTICE file distributed with
+# this work for additional information regarding copyright ownership.
+# The ASF licenses this file to You under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with
+# the License.  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Measures decode time of views overview and audit pages for every installed
+JSON codec.
+
+Usage: python benchmarks/bench_json.py [entities] [repeat]
+"""
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(
+                                                               __file__))))
+
+from rackspace_monitoring.json_codecs import available_codecs, get_codec
+
+CHECKS_PER_ENTITY = 5
+AUDITS_PER_PAGE = 1000
+ZONES = ['mzdfw', 'mzord', 'mziad']
+TYPES = ['remote.http', 'remote.ping', 'remote.dns', 'remote.ssh']
+STATES = ['OK', 'WARNING', 'CRITICAL']
+
+
+def overview_page(entities):
+    values = []
+    for i in xrange(entities):
+        entity_id = 'en%08d' % (i)
+        item = {'entity': {'id': entity_id, 'label': 'host-%d' % (i),
+                           'ip_addresses': {'default': '10.0.0.1'},
+                           'metadata': {}},
+                'checks': [], 'alarms': [], 'latest_alarm_states': []}
+
+        for j in xrange(CHECKS_PER_ENTITY):
+            check_id = 'ch%08d%d' % (i, j)
+            alarm_id = 'al%08d%d' % (i, j)
+            item['checks'].append({
+                'id': check_id, 'label': 'check %d' % (j),
+                'type': TYPES[j % len(TYPES)],
+                'details': {'url': 'http://host-%d.example.com/' % (i)},
+                'monitoring_zones_poll': ZONES, 'timeout': 30,
+                'period': 60, 'target_alias': 'default',
+                'target_resolver': None})
+            item['alarms'].append({
+                'id': alarm_id, 'check_type': TYPES[j % len(TYPES)],
+                'check_id': check_id,
+                'criteria': 'if (metric["code"] != "200") '
+                            '{ return CRITICAL } return OK',
+                'notification_plan_id': 'npTechnicalContactsEmail'})
+            item['latest_alarm_states'].append({
+                'entity_id': entity_id, 'check_id': check_id,
+                'alarm_id': alarm_id, 'timestamp': 1321898988,
+                'state': STATES[j % len(STATES)]})
+
+        values.append(item)
+    return {'values': values, 'metadata': {'count': entities,
+                                           'next_marker': None}}
+
+
+def audit_page():
+    values = []
+    for i in xrange(AUDITS_PER_PAGE):
+        values.append({
+            'id': 'aud%08d' % (i), 'timestamp': 1321898988000 + i,
+            'headers': {'User-Agent': 'rackspace-monitoring',
+                        'Content-Type': 'application/json'},
+            'url': '/v1.0/12345/entities/en%08d/checks' % (i),
+            'app': 'checks', 'query': {}, 'txnId': '.rh-%08d' % (i),
+            'payload': '{"label": "check %d", "type": "remote.http"}' % (i),
+            'method': 'POST', 'account_id': 'ac12345',
+            'who': None, 'why': None, 'statusCode': 201})
+    return {'values': values, 'metadata': {'count': AUDITS_PER_PAGE,
+                                           'next_marker': 'aud%08d' % (i)}}
+
+
+def best_of(repeat, func, arg):
+    result = None
+    for _ in xrange(repeat):
+        start = time.time()
+        func(arg)
+        elapsed = time.time() - start
+        if result is None or elapsed < result:
+            result = elapsed
+    return result
+
+
+def main():
+    entities = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    repeat = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+
+    json = get_codec('json')
+    pages = [('overview', json.dumps(overview_page(entities))),
+             ('audits', json.dumps(audit_page()))]
+
+    for page, body in pages:
+        print('%s page (%.1f KB):' % (page, len(body) / 1024.0))
+        baseline = None
+        for name in available_codecs()[::-1]:
+            elapsed = best_of(repeat, get_codec(name).loads, body)
+            baseline = baseline or elapsed
+            print('  %-10s %8.2f ms  %5.1fx' % (name, elapsed * 1000,
+                                                 baseline / elapsed))
+
+    print('default codec: %s' % (get_codec().name))
+
+
+if __name__ == '__main__':
+    main()
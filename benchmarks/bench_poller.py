@@ -0,0 +1,151 @@
+# Licensed to the Apache Software Foundation (ASF) under one or more
+# contributor license agreements.  See the NOTICE file distributed with
+# this work for additional information regarding copyright ownership.
+# The ASF licenses this file to You under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with
+# the License.  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Simulates an hour of alarm state polling and compares the number of API
+requests (pages) of a fixed interval overview poller with the adaptive
+poller, and the delay until a state change is detected.
+
+Usage: python benchmarks/bench_poller.py [entities] [changes per hour]
+"""
+
+import os
+import sys
+import random
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(
+                                                               __file__))))
+
+from rackspace_monitoring.base import Entity, AlarmChangelog
+from rackspace_monitoring.drivers.rackspace import LatestAlarmState
+from rackspace_monitoring.poller import AlarmStatePoller
+
+START = 1321898988.0
+DURATION = 3600
+TICK = 10
+PAGE_SIZE = 100
+
+
+class Clock(object):
+    now = START
+
+    def __call__(self):
+        return self.now
+
+
+class SimulatedStream(object):
+    """
+    Stream with the number of pages a real listing would need.
+    """
+
+    def __init__(self, items, count):
+        self.items = items
+        self.pages = max(1, (count + PAGE_SIZE - 1) / PAGE_SIZE)
+
+    def __iter__(self):
+        return iter(self.items)
+
+
+class SimulatedDriver(object):
+    """
+    Counts requests as the number of pages a real listing would need.
+    """
+
+    def __init__(self, count):
+        self.requests = 0
+        self.states = dict([('en%06d' % (i), ('OK', START - 86400)) for i
+                            in xrange(count)])
+        self.changelog = []
+
+    def change(self, entity_id, state, timestamp):
+        self.states[entity_id] = (state, timestamp)
+        self.changelog.append(AlarmChangelog(
+            id='cl%d' % (len(self.changelog)), alarm_id='al' + entity_id,
+            entity_id=entity_id, check_id='ch' + entity_id, state=state,
+            timestamp=int(timestamp * 1000)))
+
+    def ex_views_overview(self, ex_stream=False, ex_entity_ids=None):
+        entity_ids = ex_entity_ids or sorted(self.states.keys())
+        stream = SimulatedStream(self._overview(entity_ids),
+                                 len(entity_ids))
+        self.requests += stream.pages
+        return stream
+
+    def _overview(self, entity_ids):
+        for entity_id in entity_ids:
+            state, timestamp = self.states[entity_id]
+            yield {'entity': Entity(id=entity_id, label=entity_id,
+                                    ip_addresses=[], driver=self),
+                   'checks': [], 'alarms': [],
+                   'latest_alarm_states': [LatestAlarmState(
+                        entity_id=entity_id, check_id='ch' + entity_id,
+                        alarm_id='al' + entity_id, timestamp=int(timestamp),
+                        state=state)]}
+
+    def list_alarm_changelog(self, ex_stream=False, ex_from=None):
+        changes = [change for change in self.changelog
+                   if ex_from is None or change.timestamp >= ex_from]
+        stream = SimulatedStream(changes, len(changes))
+        self.requests += stream.pages
+        return stream
+
+
+def main():
+    count = len(sys.argv) > 1 and int(sys.argv[1]) or 20000
+    changes = len(sys.argv) > 2 and int(sys.argv[2]) or 200
+    random.seed(0)
+
+    # Incidents flap on a few hot entities
+    hot = random.sample(sorted(['en%06d' % (i) for i in xrange(count)]), 20)
+    schedule = sorted([(START + random.random() * DURATION, random.choice(hot))
+                       for _ in xrange(changes)])
+
+    clock = Clock()
+    driver = SimulatedDriver(count)
+    poller = AlarmStatePoller(driver, min_interval=TICK, clock=clock)
+    delays = []
+    changed_at = {}
+
+    def on_transition(transition):
+        key = transition.entity_id
+        if key in changed_at:
+            delays.append(clock.now - changed_at.pop(key))
+
+    poller.subscribe(on_transition)
+    poller.poll_once()
+
+    while clock.now < START + DURATION:
+        clock.now += TICK
+        while schedule and schedule[0][0] <= clock.now:
+            timestamp, entity_id = schedule.pop(0)
+            state = driver.states[entity_id][0] == 'OK' and 'CRITICAL' or \
+                    'OK'
+            driver.change(entity_id, state, timestamp)
+            changed_at.setdefault(entity_id, timestamp)
+        poller.poll_once()
+
+    fixed = (DURATION / TICK + 1) * ((count + PAGE_SIZE - 1) / PAGE_SIZE)
+    print('entities:                  %d' % (count))
+    print('fixed %ds overview:        %d requests' % (TICK, fixed))
+    print('adaptive poller:           %d requests (%.0fx fewer)' %
+          (driver.requests, float(fixed) / driver.requests))
+    if delays:
+        delays.sort()
+        print('detection delay:           median %.1f s, max %.1f s' %
+              (delays[len(delays) / 2], delays[-1]))
+
+
+if __name__ == '__main__':
+    main()
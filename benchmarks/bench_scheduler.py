@@ -0,0 +1,109 @@
+# Licensed to the Apache Software Foundation (ASF) under one or more
+# contributor license agreements.  See the NOTICE file distributed with
+# this work for additional information regarding copyright ownership.
+# The ASF licenses this file to You under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with
+# the License.  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Measures the latency of interactive requests while a bulk scan keeps the
+connection busy, with a single class (first come, first served) and with
+the default priority classes. Requests are simulated with sleeps.
+
+Usage: python benchmarks/bench_scheduler.py [scan workers]
+"""
+
+import os
+import sys
+import time
+import threading
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(
+                                                               __file__))))
+
+from rackspace_monitoring.scheduler import RequestScheduler, PriorityClass
+
+MAX_CONCURRENCY = 8
+REQUEST_TIME = 0.02
+INTERACTIVE_REQUESTS = 100
+
+
+def request(scheduler, name):
+    start = time.time()
+    ticket = scheduler.acquire(name)
+    try:
+        time.sleep(REQUEST_TIME)
+    finally:
+        scheduler.release(ticket)
+    return time.time() - start
+
+
+def run(scheduler, scan_workers, interactive='interactive'):
+    stop = threading.Event()
+
+    def scan():
+        while not stop.isSet():
+            request(scheduler, 'background')
+
+    threads = [threading.Thread(target=scan) for _ in range(scan_workers)]
+    for thread in threads:
+        thread.start()
+    time.sleep(0.2)
+
+    start = time.time()
+    latencies = []
+    for _ in range(INTERACTIVE_REQUESTS):
+        latencies.append(request(scheduler, interactive))
+        time.sleep(0.005)
+
+    elapsed = time.time() - start
+    stop.set()
+    for thread in threads:
+        thread.join()
+
+    latencies.sort()
+    return (latencies[len(latencies) / 2],
+            latencies[int(len(latencies) * 0.99) - 1], elapsed)
+
+
+def main():
+    scan_workers = len(sys.argv) > 1 and int(sys.argv[1]) or 32
+
+    # One class for everything, i.e. first come, first served
+    fifo = RequestScheduler(max_concurrency=MAX_CONCURRENCY,
+                            classes=[PriorityClass('background')],
+                            default_class='background')
+    # Weighted fair queuing without reserved slots
+    weighted = RequestScheduler(max_concurrency=MAX_CONCURRENCY,
+                                classes=[PriorityClass('interactive',
+                                                       weight=16),
+                                         PriorityClass('background')],
+                                default_class='background')
+    default = RequestScheduler(max_concurrency=MAX_CONCURRENCY)
+
+    print('scan workers:   %d, slots: %d, request time: %d ms' %
+          (scan_workers, MAX_CONCURRENCY, REQUEST_TIME * 1000))
+    for name, scheduler, interactive in [
+            ('fifo', fifo, 'background'),
+            ('weighted', weighted, 'interactive'),
+            ('default', default, 'interactive')]:
+        granted = scheduler.stats()['background']['granted']
+        p50, p99, elapsed = run(scheduler, scan_workers, interactive)
+        scanned = scheduler.stats()['background']['granted'] - granted
+        if interactive == 'background':
+            scanned -= INTERACTIVE_REQUESTS
+        print('%-15s interactive p50 %5.1f ms, p99 %5.1f ms, '
+              'scan %d requests/s' %
+              (name + ':', p50 * 1000, p99 * 1000, scanned / elapsed))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,99 @@
+# Licensed to the Apache Software Foundation (ASF) under one or more
+# contributor license agreements.  See the NOTICE file distributed with
+# this work for additional information regarding copyright ownership.
+# The ASF licenses this file to You under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with
+# the License.  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Measures build, update and query time of the search index.
+
+Usage: python benchmarks/bench_search.py [objects]
+"""
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(
+                                                               __file__))))
+
+from rackspace_monitoring.base import Entity, Check
+from rackspace_monitoring.search import SearchIndex
+
+CHECKS_PER_ENTITY = 4
+ROLES = ['web', 'db', 'cache', 'queue', 'worker']
+REGIONS = ['dfw', 'ord', 'iad', 'lon', 'syd']
+
+QUERIES = [('web-00040', False), ('10.0.7', True), ('cache', True),
+           ('/health', False), ('production', False), ('lon', False),
+           ('nothing-matches', False)]
+
+
+def objects(count):
+    result = []
+    for i in xrange(count / (CHECKS_PER_ENTITY + 1)):
+        entity_id = 'en%08d' % (i)
+        role = ROLES[i % len(ROLES)]
+        region = REGIONS[i % len(REGIONS)]
+        result.append(Entity(id=entity_id,
+                             label='%s-%s-%05d' % (region, role, i),
+                             ip_addresses=[('public0_v4', '10.%d.%d.%d' % (
+                                            i / 65536, i / 256 % 256,
+                                            i % 256))],
+                             extra={'environment': 'production'},
+                             driver=None))
+
+        for j in xrange(CHECKS_PER_ENTITY):
+            result.append(Check(id='ch%08d%d' % (i, j),
+                                label='%s check %d' % (role, j),
+                                timeout=30, period=60, monitoring_zones=[],
+                                target_alias='public0_v4',
+                                target_resolver=None, type='remote.http',
+                                details={'url': 'http://%s-%05d/health' %
+                                         (role, i)},
+                                entity_id=entity_id, driver=None))
+    return result
+
+
+def timed(func, *args, **kwargs):
+    start = time.time()
+    result = func(*args, **kwargs)
+    return result, (time.time() - start) * 1000
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    items = objects(count)
+    index = SearchIndex()
+
+    _, elapsed = timed(index.add_many, items)
+    print('indexed %d objects: %.0f ms' % (len(index), elapsed))
+
+    # First query applies the pending vocabulary changes
+    _, elapsed = timed(index.search, 'warmup')
+    print('first query:        %.1f ms' % (elapsed))
+
+    for query, prefix in QUERIES:
+        result, elapsed = timed(index.search, query, prefix=prefix)
+        print('%-10s %-18r %7d results %8.2f ms' % (
+              prefix and 'prefix' or 'substring', query, len(result),
+              elapsed))
+
+    entity = items[0]
+    entity.label = 'renamed-entity'
+    _, elapsed = timed(index.add, entity)
+    _, query_elapsed = timed(index.search, 'renamed')
+    print('update + query:     %.2f ms + %.2f ms' % (elapsed, query_elapsed))
+
+
+if __name__ == '__main__':
+    main()
@@ -1,5 +1,9 @@
+from __future__ import with_statement
+
 import os
 import sys
+import time
+import threading
 
 root_dir = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 web_dir  = os.path.join(root_dir, 'demo', 'web')
@@ -10,8 +14,18 @@ from jinja2 import Environment, FileSystemLoader
 
 from rackspace_monitoring.types import Provider
 from rackspace_monitoring.providers import get_driver
+from rackspace_monitoring.utils import DriverPool
+
+API_URL = os.environ.get('MONITORING_API_URL', 'https://ele-api.k1k.me/v1.0')
+
+# Number of entities shown on a page
+PAGE_SIZE = 100
+
+# How long a page of entities is served from the cache
+PAGE_CACHE_TTL = 30
 
-env = Environment(loader=FileSystemLoader(os.path.join(web_dir, 'templates')))
+env = Environment(loader=FileSystemLoader(os.path.join(web_dir, 'templates')),
+                  autoescape=True)
 
 def http_methods_allowed(methods=['GET', 'HEAD']):
     method = cherrypy.request.method.upper()
@@ -21,28 +35,120 @@ def http_methods_allowed(methods=['GET', 'HEAD']):
 
 cherrypy.tools.allow = cherrypy.Tool('on_start_resource', http_methods_allowed)
 
+
+def create_driver(username, apikey):
+    cls = get_driver(Provider.RACKSPACE)
+    return cls(username, apikey, ex_force_base_url=API_URL)
+
+
+class PageCache(object):
+    """
+    Short lived cache of entity pages keyed by account, marker and page
+    size, so reloading or going back to a page doesn't hit the API.
+    """
+
+    def __init__(self, ttl=PAGE_CACHE_TTL, max_size=1000):
+        self.ttl = ttl
+        self.max_size = max_size
+        self._lock = threading.Lock()
+        self._pages = {}
+
+    def get(self, key):
+        with self._lock:
+            value = self._pages.get(key)
+            if value is None:
+                return None
+            expires, page = value
+            if expires < time.time():
+                del self._pages[key]
+                return None
+            return page
+
+    def set(self, key, page):
+        now = time.time()
+        with self._lock:
+            if len(self._pages) >= self.max_size:
+                self._pages = dict([(k, v) for k, v in self._pages.items()
+                                    if v[0] >= now])
+                if len(self._pages) >= self.max_size:
+                    self._pages.clear()
+            self._pages[key] = (now + self.ttl, page)
+
+
+class EntityPage(object):
+    """
+    A page of entities which is only requested when the template first
+    reads it, so the page header is sent before the API request is made.
+    """
+
+    def __init__(self, drivers, credentials, cache, marker, limit):
+        self.drivers = drivers
+        self.credentials = credentials
+        self.cache = cache
+        self.key = drivers.key(*credentials)
+        self.marker = marker
+        self.limit = limit
+        self._page = None
+
+    def _load(self):
+        if self._page is None:
+            cache_key = (self.key, self.marker, self.limit)
+            page = self.cache.get(cache_key)
+            if page is None:
+                page = self.drivers.call(self.credentials[0],
+                                         self.credentials[1], self._request)
+                self.cache.set(cache_key, page)
+            self._page = page
+        return self._page
+
+    def _request(self, driver):
+        result = driver.list_entities(ex_next_marker=self.marker,
+                                      ex_limit=self.limit, ex_stream=True)
+        entities = result.next_page()
+        return (entities, result.checkpoint.marker)
+
+    @property
+    def entities(self):
+        return self._load()[0]
+
+    @property
+    def next_marker(self):
+        return self._load()[1]
+
+
 class Root:
-    def _driver(self):
-        cookie = cherrypy.request.cookie
-        username = None
-        apikey = None
+    def __init__(self):
+        self.drivers = DriverPool(create_driver)
+        self.pages = PageCache()
 
-        if cookie.has_key('monitoring_username'):
-            username = cookie['monitoring_username'].value
-        if cookie.has_key('monitoring_apikey'):
-            apikey = cookie['monitoring_apikey'].value
+    def _credentials(self):
+        cookie = cherrypy.request.cookie
+        if not (cookie.has_key('monitoring_username') and
+                cookie.has_key('monitoring_apikey')):
+            return None
 
-        raxMon = get_driver(Provider.RACKSPACE)
-        driver = raxMon(username, apikey, ex_force_base_url="https://ele-api.k1k.me/v1.0")
-        return driver
+        return (cookie['monitoring_username'].value,
+                cookie['monitoring_apikey'].value)
 
     @cherrypy.expose
-    def list_entities(self):
-        driver = self._driver()
-        entities = driver.list_entities()
-        print entities
+    def list_entities(self, marker=None, limit=PAGE_SIZE):
+        credentials = self._credentials()
+        if credentials is None:
+            raise cherrypy.HTTPRedirect('/')
+        try:
+            limit = max(1, min(int(limit), 1000))
+        except ValueError:
+            raise cherrypy.HTTPError(400, 'Invalid limit')
+
+        page = EntityPage(self.drivers, credentials, self.pages,
+                          marker or None, limit)
         tmpl = env.get_template('list_entities.html')
-        return tmpl.render(entities=entities)
+        return tmpl.generate(page=page, limit=limit)
+
+    # Send the rendered template as it is generated instead of buffering it
+    list_entities._cp_config = {'response.stream': True,
+                                'tools.encode.on': True,
+                                'tools.encode.encoding': 'utf-8'}
 
     @cherrypy.expose
     @cherrypy.tools.allow(methods=['POST'])
@@ -53,13 +159,12 @@ class Root:
 
     @cherrypy.expose
     def index(self):
-        cookie = cherrypy.request.cookie
-        if cookie.has_key('monitoring_username') and cookie.has_key('monitoring_apikey'):
-            return self.list_entities()
-        else:
-            tmpl = env.get_template('index.html')
+        if self._credentials() is not None:
+            raise cherrypy.HTTPRedirect('/list_entities')
+
+        tmpl = env.get_template('index.html')
         return tmpl.render()
 
 
 cherrypy.tree.mount(Root(), script_name='/')
-cherrypy.config.update({'engine.autoreload_on': False})
\ No newline at end of file
+cherrypy.config.update({'engine.autoreload_on': False})
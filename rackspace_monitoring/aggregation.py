@@ -0,0 +1,289 @@
+# Licensed to the Apache Software Foundation (ASF) under one or more
+# contributor license agreements.  See the NOTICE file distributed with
+# this work for additional information regarding copyright ownership.
+# The ASF licenses this file to You under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with
+# the License.  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Columnar aggregation of alarm states.
+
+Records from C{ex_views_overview} and C{list_alarm_changelog} are streamed
+into integer coded columns and all the grouping is done with numpy. numpy
+is an optional dependency and is only required when this module is used.
+"""
+
+from array import array
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+__all__ = ['AlarmStateAggregator']
+
+GROUP_BY = ['entity', 'check_type', 'zone']
+
+
+class Encoder(object):
+    """
+    Maps hashable values to dense integer codes (0, 1, 2, ...).
+    """
+
+    def __init__(self):
+        self.codes = {}
+        self.values = []
+
+    def encode(self, value):
+        code = self.codes.get(value)
+        if code is None:
+            code = len(self.values)
+            self.codes[value] = code
+            self.values.append(value)
+        return code
+
+    def __len__(self):
+        return len(self.values)
+
+
+class AlarmStateAggregator(object):
+    """
+    Aggregates latest alarm states and alarm changelog entries.
+
+    Both input methods accept any iterable (a C{LazyList} included) and only
+    keep the integer codes of every record, so the source objects can be
+    discarded as soon as they have been consumed.
+    """
+
+    def __init__(self):
+        if numpy is None:
+            raise ImportError('AlarmStateAggregator requires numpy')
+
+        self.entities = Encoder()
+        self.check_types = Encoder()
+        self.zones = Encoder()
+        self.states = Encoder()
+        self._checks = Encoder()
+        self._series = Encoder()
+
+        # check code -> check type code, -1 if the check type is unknown
+        self._check_type_of = array('i')
+        # check code -> tuple of zone codes
+        self._zones_of = []
+
+        # latest alarm states, one row per state
+        self._latest = {'entity': array('i'), 'check': array('i'),
+                        'state': array('i')}
+        # latest alarm states exploded per monitoring zone
+        self._latest_zone = {'zone': array('i'), 'state': array('i')}
+        # changelog, one row per entry
+        self._log = {'series': array('i'), 'entity': array('i'),
+                     'check': array('i'), 'state': array('i'),
+                     'timestamp': array('d')}
+
+    def _encode_check(self, check_id):
+        code = self._checks.encode(check_id)
+        if code == len(self._check_type_of):
+            self._check_type_of.append(-1)
+            self._zones_of.append(())
+        return code
+
+    def _add_check(self, check):
+        code = self._encode_check(check.id)
+        self._check_type_of[code] = self.check_types.encode(check.type)
+        self._zones_of[code] = tuple([self.zones.encode(zone) for zone in
+                                      check.monitoring_zones or []])
+
+    def add_overview(self, items):
+        """
+        Consume items as returned by C{ex_views_overview}.
+
+        @return: Number of latest alarm states added.
+        """
+        latest = self._latest
+        latest_zone = self._latest_zone
+        count = 0
+
+        for item in items:
+            for check in item['checks']:
+                self._add_check(check)
+
+            for state in item['latest_alarm_states']:
+                check_code = self._encode_check(state.check_id)
+                state_code = self.states.encode(state.state)
+
+                latest['entity'].append(self.entities.encode(state.entity_id))
+                latest['check'].append(check_code)
+                latest['state'].append(state_code)
+
+                for zone_code in self._zones_of[check_code]:
+                    latest_zone['zone'].append(zone_code)
+                    latest_zone['state'].append(state_code)
+                count += 1
+
+        return count
+
+    def add_changelog(self, entries):
+        """
+        Consume C{AlarmChangelog} objects as returned by
+        C{list_alarm_changelog}.
+
+        Entries don't need to be ordered, they are sorted by timestamp when
+        the transitions are computed.
+
+        @return: Number of changelog entries added.
+        """
+        log = self._log
+        count = 0
+
+        for entry in entries:
+            series = (entry.entity_id, entry.alarm_id, entry.check_id)
+            log['series'].append(self._series.encode(series))
+            log['entity'].append(self.entities.encode(entry.entity_id))
+            log['check'].append(self._encode_check(entry.check_id))
+            log['state'].append(self.states.encode(entry.state))
+            log['timestamp'].append(entry.timestamp or 0)
+            count += 1
+
+        return count
+
+    def _column(self, column):
+        if column.typecode == 'd':
+            return numpy.frombuffer(column, dtype=numpy.float64)
+        return numpy.frombuffer(column, dtype=numpy.int32)
+
+    def _check_type_column(self, check_codes):
+        lookup = self._column(self._check_type_of)
+        return lookup[check_codes]
+
+    def _grouped_counts(self, groups, states, group_count):
+        """
+        Count (group, state) pairs. Rows with a negative group code are
+        ignored.
+        """
+        state_count = len(self.states)
+        mask = groups >= 0
+        combined = groups[mask].astype(numpy.int64) * state_count
+        combined += states[mask]
+        counts = numpy.bincount(combined,
+                                minlength=group_count * state_count)
+        return counts.reshape((group_count, state_count))
+
+    def state_count_matrix(self, by='entity'):
+        """
+        Count latest alarm states per group.
+
+        @type by: C{str}
+        @param by: One of C{entity}, C{check_type} or C{zone}.
+
+        @return: (group values, state values, counts) tuple where counts is a
+                 (len(group values), len(state values)) integer array.
+        """
+        if by == 'entity':
+            groups = self._column(self._latest['entity'])
+            states = self._column(self._latest['state'])
+            encoder = self.entities
+        elif by == 'check_type':
+            groups = self._check_type_column(
+                self._column(self._latest['check']))
+            states = self._column(self._latest['state'])
+            encoder = self.check_types
+        elif by == 'zone':
+            groups = self._column(self._latest_zone['zone'])
+            states = self._column(self._latest_zone['state'])
+            encoder = self.zones
+        else:
+            raise ValueError('Invalid group: %s (valid: %s)' %
+                             (by, ', '.join(GROUP_BY)))
+
+        counts = self._grouped_counts(groups, states, len(encoder))
+        return list(encoder.values), list(self.states.values), counts
+
+    def state_counts(self, by='entity'):
+        """
+        Same as L{state_count_matrix}, but returns a nested dict
+        (C{{group: {state: count}}}) without the zero counts.
+        """
+        groups, states, counts = self.state_count_matrix(by=by)
+        result = {}
+
+        for row, column in zip(*numpy.nonzero(counts)):
+            group = result.setdefault(groups[row], {})
+            group[states[column]] = int(counts[row, column])
+
+        return result
+
+    def _transitions(self):
+        """
+        Return (from state, to state, row index) arrays for all the
+        consecutive changelog entries which belong to the same alarm.
+        """
+        series = self._column(self._log['series'])
+        timestamps = self._column(self._log['timestamp'])
+        states = self._column(self._log['state'])
+
+        order = numpy.lexsort((timestamps, series))
+        series = series[order]
+        states = states[order]
+
+        same = series[1:] == series[:-1]
+        return states[:-1][same], states[1:][same], order[1:][same]
+
+    def transition_matrix(self):
+        """
+        Count state transitions over the changelog.
+
+        @return: (state values, counts) tuple where counts[i, j] is the
+                 number of times an alarm went from state i to state j.
+        """
+        state_count = len(self.states)
+        from_states, to_states, _ = self._transitions()
+        combined = from_states.astype(numpy.int64) * state_count + to_states
+        counts = numpy.bincount(combined, minlength=state_count * state_count)
+        return (list(self.states.values),
+                counts.reshape((state_count, state_count)))
+
+    def transition_rates(self):
+        """
+        Same as L{transition_matrix}, but every row is normalized so it
+        contains the probability of going from state i to state j.
+        """
+        states, counts = self.transition_matrix()
+        totals = counts.sum(axis=1).astype(numpy.float64)
+        totals[totals == 0] = 1
+        return states, counts / totals[:, numpy.newaxis]
+
+    def transition_counts(self, by='entity'):
+        """
+        Count actual state changes (from state != to state) per group.
+
+        @type by: C{str}
+        @param by: One of C{entity} or C{check_type}.
+
+        @return: C{dict} mapping group value to a number of state changes.
+        """
+        from_states, to_states, rows = self._transitions()
+        rows = rows[from_states != to_states]
+
+        if by == 'entity':
+            groups = self._column(self._log['entity'])[rows]
+            encoder = self.entities
+        elif by == 'check_type':
+            groups = self._check_type_column(
+                self._column(self._log['check'])[rows])
+            encoder = self.check_types
+        else:
+            raise ValueError('Invalid group: %s (valid: entity, check_type)' %
+                             (by))
+
+        counts = numpy.bincount(groups[groups >= 0], minlength=len(encoder))
+        return dict([(encoder.values[code], int(counts[code])) for code
+                     in numpy.nonzero(counts)[0]])
@@ -137,13 +137,14 @@ class NotificationType(object):
 
 class Alarm(object):
     def __init__(self, id, type, criteria, driver, entity_id,
-                 notification_plan_id=None):
+                 notification_plan_id=None, check_id=None):
         self.id = id
         self.type = type
         self.criteria = criteria
         self.driver = driver
         self.notification_plan_id = notification_plan_id
         self.entity_id = entity_id
+        self.check_id = check_id
 
     def update(self, data):
         self.driver.update_alarm(alarm=self, data=data)
@@ -183,18 +184,106 @@ class Check(object):
 
 class AlarmChangelog(object):
 
-    def __init__(self, id, alarm_id, entity_id, check_id, state):
+    def __init__(self, id, alarm_id, entity_id, check_id, state,
+                 timestamp=None):
         self.id = id
         self.alarm_id = alarm_id
         self.entity_id = entity_id
         self.check_id = check_id
         self.state = state
+        self.timestamp = timestamp
 
     def __repr__(self):
         return ('<AlarmChangelog: id=%s alarm_id=%s, state=%s...>' % (
           self.id, self.alarm_id, self.state))
 
 
+class AccountSnapshot(object):
+    """
+    Complete picture of an account with lookups between the related objects.
+    """
+
+    def __init__(self, entities, checks, alarms, notifications,
+                 notification_plans, monitoring_zones, check_types,
+                 notification_types, errors=None):
+        """
+        @type checks: C{dict}
+        @param checks: Entity id to a list of Check objects.
+
+        @type alarms: C{dict}
+        @param alarms: Entity id to a list of Alarm objects.
+
+        @type errors: C{list}
+        @param errors: (collection name or Entity, exception) tuples for the
+                       listings which have failed.
+        """
+        self.entities = entities
+        self.checks = checks
+        self.alarms = alarms
+        self.notifications = notifications
+        self.notification_plans = notification_plans
+        self.monitoring_zones = monitoring_zones
+        self.check_types = check_types
+        self.notification_types = notification_types
+        self.errors = errors or []
+
+        self._entities = dict([(obj.id, obj) for obj in entities])
+        self._notifications = dict([(obj.id, obj) for obj in notifications])
+        self._notification_plans = dict([(obj.id, obj) for obj in
+                                         notification_plans])
+        self._checks = {}
+        for items in checks.values():
+            self._checks.update([((obj.entity_id, obj.id), obj) for obj in
+                                 items])
+
+    def get_entity(self, entity_id):
+        return self._entities.get(entity_id)
+
+    def get_notification(self, notification_id):
+        return self._notifications.get(notification_id)
+
+    def get_notification_plan(self, notification_plan_id):
+        return self._notification_plans.get(notification_plan_id)
+
+    def checks_for(self, entity):
+        return self.checks.get(entity.id, [])
+
+    def alarms_for(self, entity):
+        return self.alarms.get(entity.id, [])
+
+    def check_for(self, alarm):
+        return self._checks.get((alarm.entity_id, alarm.check_id))
+
+    def notification_plan_for(self, alarm):
+        return self._notification_plans.get(alarm.notification_plan_id)
+
+    def notifications_for(self, notification_plan, state=None):
+        """
+        Return notifications of a plan for a single state (critical_state,
+        warning_state or ok_state) or for all the states.
+        """
+        states = [state] if state else ['critical_state', 'warning_state',
+                                        'ok_state']
+        ids = []
+        for name in states:
+            for notification_id in getattr(notification_plan, name) or []:
+                if notification_id not in ids:
+                    ids.append(notification_id)
+
+        return [self._notifications[notification_id] for notification_id in
+                ids if notification_id in self._notifications]
+
+    @property
+    def complete(self):
+        return not self.errors
+
+    def __repr__(self):
+        return ('<AccountSnapshot: entities=%s, notifications=%s, '
+                'notification_plans=%s, errors=%s ...>' %
+                (len(self.entities), len(self.notifications),
+                 len(self.notification_plans), len(self.errors)))
+
+
 class MonitoringDriver(object):
     """
     A base MonitoringDriver to derive from.
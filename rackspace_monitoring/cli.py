@@ -0,0 +1,480 @@
+# Licensed to the Apache Software Foundation (ASF) under one or more
+# contributor license agreements.  See the NOTICE file distributed with
+# this work for additional information regarding copyright ownership.
+# The ASF licenses this file to You under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with
+# the License.  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+raxmon - command line interface for Rackspace Cloud Monitoring.
+
+Every command writes one JSON object per line to the output as soon as it
+has been received, so the output can be piped into other tools while long
+listings are still being fetched.
+
+Usage: raxmon [options] <command> [<type>] [<id> ...]
+
+Commands:
+
+    list <type>            List objects, checks and alarms are listed for
+                           all the entities unless --entity is given.
+    get <type> <id>...     Get objects.
+    create <type>          Create an object from --data.
+    update <type> <id>...  Update objects with --data.
+    delete <type> <id>...  Delete objects.
+    overview               Entities with their checks, alarms and states.
+    changelog              Alarm changelog, --follow keeps polling for new
+                           changes.
+    audits                 Export the audit log.
+
+Types: entities, checks, alarms, notifications, notification_plans,
+check_types, notification_types, monitoring_zones.
+"""
+
+from __future__ import with_statement
+
+import os
+import sys
+import time
+import errno
+import hashlib
+from optparse import OptionParser
+
+from rackspace_monitoring.json_codecs import get_codec
+from rackspace_monitoring.utils import (imap_unordered, ChangelogCursor,
+                                        is_auth_error)
+
+__all__ = ['AuthCache', 'to_record', 'main']
+
+DEFAULT_CACHE_PATH = os.path.join('~', '.raxmon', 'cache.json')
+
+# Rackspace auth tokens are valid for 24 hours.
+DEFAULT_CACHE_TTL = 12 * 60 * 60
+
+# Types whose objects belong to an entity
+ENTITY_TYPES = ['checks', 'alarms']
+
+# Static listings which are cached together with the auth token
+CATALOG_TYPES = ['check_types', 'notification_types', 'monitoring_zones']
+
+TYPES = ['entities', 'notifications', 'notification_plans'] + \
+        ENTITY_TYPES + CATALOG_TYPES
+
+SINGULAR = {'entities': 'entity', 'checks': 'check', 'alarms': 'alarm',
+            'notifications': 'notification',
+            'notification_plans': 'notification_plan'}
+
+# --data keys of create which are API field names whose keyword argument of
+# the driver's create method has a different name
+CREATE_ARGUMENTS = {'entities': {'metadata': 'extra'}}
+
+
+class CommandError(Exception):
+    pass
+
+
+class AuthCache(object):
+    """
+    Auth tokens, service catalogs and static listings (check types, ...)
+    stored in a JSON file between invocations. Entries are keyed by a hash
+    of the username and the auth URL, API keys are never stored.
+    """
+
+    def __init__(self, path=DEFAULT_CACHE_PATH, ttl=DEFAULT_CACHE_TTL,
+                 codec=None):
+        self.path = os.path.expanduser(path)
+        self.ttl = ttl
+        self.codec = get_codec(codec)
+
+    def key(self, username, auth_url=None):
+        return hashlib.sha1('%s\n%s' % (username, auth_url or '')).hexdigest()
+
+    def _read(self):
+        try:
+            with open(self.path, 'r') as fp:
+                return self.codec.loads(fp.read())
+        except (IOError, ValueError):
+            return {}
+
+    def _write(self, data):
+        directory = os.path.dirname(self.path)
+        if directory and not os.path.isdir(directory):
+            os.makedirs(directory, 0700)
+
+        # Write to a temporary file and rename it so a concurrent invocation
+        # never reads a partially written file.
+        tmp_path = '%s.%s.tmp' % (self.path, os.getpid())
+        fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0600)
+        with os.fdopen(fd, 'w') as fp:
+            fp.write(self.codec.dumps(data))
+        os.rename(tmp_path, self.path)
+
+    def get(self, key):
+        entry = self._read().get(key)
+        if entry is None or entry.get('created', 0) + self.ttl < time.time():
+            return None
+        return entry
+
+    def update(self, key, **values):
+        data = self._read()
+        entry = data.get(key)
+        if entry is None or 'auth_token' in values:
+            entry = {'created': time.time()}
+        entry.update(values)
+        data[key] = entry
+        self._write(data)
+
+    def delete(self, key):
+        data = self._read()
+        if data.pop(key, None) is not None:
+            self._write(data)
+
+
+class Ref(object):
+    """
+    Stands in for an object in update and delete calls which only need its
+    id, saving a request to get the object first.
+    """
+
+    def __init__(self, id, entity_id=None):
+        self.id = id
+        self.entity_id = entity_id
+
+
+def to_record(value):
+    """
+    Convert driver objects to values which can be serialized to JSON.
+    """
+    if isinstance(value, dict):
+        return dict([(key, to_record(item)) for key, item in value.items()])
+    elif isinstance(value, (list, tuple)):
+        return [to_record(item) for item in value]
+    elif hasattr(value, '__dict__'):
+        return dict([(key, to_record(item)) for key, item in
+                     value.__dict__.items()
+                     if key != 'driver' and not key.startswith('_')])
+    return value
+
+
+class Output(object):
+    def __init__(self, fp, codec=None):
+        self.fp = fp
+        self.codec = get_codec(codec)
+        self.count = 0
+
+    def write(self, value):
+        self.fp.write(self.codec.dumps(to_record(value)) + '\n')
+        self.fp.flush()
+        self.count += 1
+
+    def write_all(self, values):
+        for value in values:
+            self.write(value)
+
+
+def _load_data(value, codec):
+    if value is None:
+        raise CommandError('Missing --data')
+    if value.startswith('@'):
+        with open(value[1:], 'r') as fp:
+            value = fp.read()
+    try:
+        return codec.loads(value)
+    except ValueError, e:
+        raise CommandError('Invalid --data: %s' % (e))
+
+
+class Commands(object):
+    def __init__(self, driver, options, output, cache=None, cache_key=None):
+        self.driver = driver
+        self.options = options
+        self.output = output
+        self.cache = cache
+        self.cache_key = cache_key
+
+    def _entity_ids(self):
+        # Listed in the calling thread so a failure (e.g. an expired token)
+        # reaches run() instead of ending the fan-out silently.
+        if self.options.entity:
+            return [self.options.entity]
+        return [entity.id for entity in
+                self.driver.list_entities(ex_stream=True)]
+
+    def _fan_out(self, func, items):
+        """
+        Call func for every item over --parallel threads and write all the
+        values it returns. Failures are reported after everything else has
+        been written.
+        """
+        errors = []
+        for item, result, error in imap_unordered(func, items,
+                                                  self.options.parallel):
+            if error:
+                errors.append((item, error))
+            else:
+                self.output.write_all(result)
+
+        for item, error in errors:
+            if is_auth_error(error):
+                # Not a failure of this item, run() authenticates again
+                raise error
+
+        for item, error in errors:
+            sys.stderr.write('%s: %s\n' % (item, error))
+        if errors:
+            raise CommandError('%s of the requests failed' % (len(errors)))
+
+    def _list_kwargs(self):
+        kwargs = {'ex_stream': True, 'ex_limit': self.options.limit}
+        if self.options.label:
+            kwargs['ex_label'] = self.options.label
+        return kwargs
+
+    def list(self, type, *args):
+        kwargs = self._list_kwargs()
+        if type in ENTITY_TYPES:
+            method = getattr(self.driver, 'list_%s' % (type))
+
+            def fetch(entity_id):
+                return list(method(Ref(entity_id), **kwargs))
+
+            self._fan_out(fetch, self._entity_ids())
+        elif type in CATALOG_TYPES:
+            self._list_catalog(type)
+        else:
+            method = getattr(self.driver, 'list_%s' % (type))
+            self.output.write_all(method(**kwargs))
+
+    def _list_catalog(self, type):
+        entry = self.cache and self.cache.get(self.cache_key) or {}
+        records = entry.get(type)
+        if records is None:
+            method = getattr(self.driver, 'list_%s' % (type))
+            records = [to_record(obj) for obj in method(ex_stream=True)]
+            if self.cache:
+                self.cache.update(self.cache_key, **{type: records})
+        self.output.write_all(records)
+
+    def get(self, type, *ids):
+        if not ids:
+            raise CommandError('Missing id')
+
+        method = getattr(self.driver, 'get_%s' % (SINGULAR[type]))
+        if type in ENTITY_TYPES:
+            entity_id = self._require_entity()
+            fetch = lambda obj_id: [method(entity_id, obj_id)]
+        else:
+            fetch = lambda obj_id: [method(obj_id)]
+        self._fan_out(fetch, ids)
+
+    def _require_entity(self):
+        if not self.options.entity:
+            raise CommandError('Missing --entity')
+        return self.options.entity
+
+    def create(self, type, *args):
+        data = _load_data(self.options.data, self.output.codec)
+        for key, name in CREATE_ARGUMENTS.get(type, {}).items():
+            if key not in data:
+                continue
+            if name in data:
+                raise CommandError('Invalid --data: %s and %s are the same '
+                                   'field' % (key, name))
+            data[name] = data.pop(key)
+
+        method = getattr(self.driver, 'create_%s' % (SINGULAR[type]))
+        if type in ENTITY_TYPES:
+            data['entity'] = Ref(self._require_entity())
+        self.output.write(method(**data))
+
+    def update(self, type, *ids):
+        data = _load_data(self.options.data, self.output.codec)
+        method = getattr(self.driver, 'update_%s' % (SINGULAR[type]))
+        entity_id = type in ENTITY_TYPES and self._require_entity() or None
+        self._fan_out(lambda obj_id: [method(Ref(obj_id, entity_id),
+                                             dict(data))], ids)
+
+    def delete(self, type, *ids):
+        method = getattr(self.driver, 'delete_%s' % (SINGULAR[type]))
+        entity_id = type in ENTITY_TYPES and self._require_entity() or None
+
+        def delete(obj_id):
+            return [{'id': obj_id,
+                     'deleted': method(Ref(obj_id, entity_id))}]
+
+        self._fan_out(delete, ids)
+
+    def overview(self, *args):
+        kwargs = {'ex_stream': True}
+        if self.options.entity:
+            kwargs['ex_entity_ids'] = [self.options.entity]
+        self.output.write_all(self.driver.ex_views_overview(**kwargs))
+
+    def changelog(self, *args):
+        options = self.options
+        cursor = ChangelogCursor(options.start)
+        while True:
+            self.output.write_all(cursor.read(self.driver,
+                                              ex_entity_id=options.entity,
+                                              ex_to=options.end))
+            if not options.follow:
+                return
+            time.sleep(options.interval)
+
+    def audits(self, *args):
+        self.output.write_all(self.driver.list_audits(
+                                start_from=self.options.start,
+                                to=self.options.end, ex_stream=True,
+                                ex_limit=self.options.limit))
+
+
+COMMANDS = {'list': True, 'get': True, 'create': True, 'update': True,
+            'delete': True, 'overview': False, 'changelog': False,
+            'audits': False}
+
+
+def get_parser():
+    usage = '%prog [options] <command> [<type>] [<id> ...]\n\nCommands:' + \
+            __doc__.split('Commands:')[1].rstrip()
+    parser = OptionParser(prog='raxmon', usage=usage)
+    parser.add_option('-u', '--username',
+                      default=os.environ.get('RAXMON_USERNAME'))
+    parser.add_option('-k', '--api-key',
+                      default=os.environ.get('RAXMON_API_KEY'))
+    parser.add_option('--auth-url', default=os.environ.get('RAXMON_AUTH_URL'))
+    parser.add_option('--base-url', default=os.environ.get('RAXMON_BASE_URL'))
+    parser.add_option('--cache-file',
+                      default=os.environ.get('RAXMON_CACHE',
+                                             DEFAULT_CACHE_PATH),
+                      help='auth token and catalog cache (default: '
+                           '%default)')
+    parser.add_option('--no-cache', action='store_true', default=False)
+    parser.add_option('-o', '--output', default=None,
+                      help='output file (default: stdout)')
+    parser.add_option('-p', '--parallel', type='int', default=10,
+                      help='number of concurrent requests when fanning out '
+                           'over entities or ids (default: %default)')
+    parser.add_option('-e', '--entity', default=None,
+                      help='entity id of checks and alarms')
+    parser.add_option('-d', '--data', default=None,
+                      help='JSON object (or @file) for create and update')
+    parser.add_option('-l', '--limit', type='int', default=None,
+                      help='page size')
+    parser.add_option('--label', default=None)
+    parser.add_option('--from', dest='start', type='int', default=None,
+                      help='start in milliseconds since epoch')
+    parser.add_option('--to', dest='end', type='int', default=None,
+                      help='end in milliseconds since epoch')
+    parser.add_option('-f', '--follow', action='store_true', default=False,
+                      help='keep polling the changelog')
+    parser.add_option('--interval', type='float', default=30,
+                      help='changelog polling interval in seconds')
+    parser.add_option('--json-codec',
+                      default=os.environ.get('RAXMON_JSON_CODEC'),
+                      help='JSON codec (default: fastest installed)')
+    return parser
+
+
+def get_driver(options, auth_info=None):
+    from rackspace_monitoring.providers import get_driver
+    from rackspace_monitoring.types import Provider
+
+    kwargs = {}
+    if options.auth_url:
+        kwargs['ex_force_auth_url'] = options.auth_url
+    if options.base_url:
+        kwargs['ex_force_base_url'] = options.base_url
+    if options.json_codec:
+        kwargs['ex_json_codec'] = options.json_codec
+    if auth_info:
+        kwargs['ex_auth_token'] = auth_info['auth_token']
+        kwargs['ex_tenant_ids'] = auth_info['tenant_ids']
+
+    cls = get_driver(Provider.RACKSPACE)
+    return cls(options.username, options.api_key, **kwargs)
+
+
+def run(options, args, output):
+    command, args = args[0], args[1:]
+    if command not in COMMANDS:
+        raise CommandError('Invalid command: %s' % (command))
+    if COMMANDS[command]:
+        if not args or args[0] not in TYPES:
+            raise CommandError('Invalid type, valid types: %s' %
+                               (', '.join(TYPES)))
+        if command != 'list' and args[0] not in SINGULAR:
+            raise CommandError('%s can only be listed' % (args[0]))
+
+    cache = None
+    cache_key = None
+    auth_info = None
+    if not options.no_cache:
+        cache = AuthCache(options.cache_file, codec=output.codec)
+        cache_key = cache.key(options.username, options.auth_url)
+        auth_info = cache.get(cache_key)
+        if auth_info is not None and 'auth_token' not in auth_info:
+            auth_info = None
+
+    driver = get_driver(options, auth_info)
+    if cache is not None and auth_info is None:
+        cache.update(cache_key, **driver.ex_get_auth_info())
+
+    commands = Commands(driver, options, output, cache, cache_key)
+    try:
+        getattr(commands, command)(*args)
+    except Exception, e:
+        # The cached token has expired or has been revoked, authenticate
+        # again unless something has already been written.
+        if auth_info is None or not is_auth_error(e) or output.count:
+            raise
+
+        cache.delete(cache_key)
+        driver = get_driver(options)
+        cache.update(cache_key, **driver.ex_get_auth_info())
+        commands.driver = driver
+        getattr(commands, command)(*args)
+
+
+def main(argv=None):
+    parser = get_parser()
+    options, args = parser.parse_args(argv)
+
+    if not args:
+        parser.error('Missing command')
+    if not options.username or not options.api_key:
+        parser.error('Missing username or API key')
+
+    try:
+        codec = get_codec(options.json_codec)
+    except ValueError, e:
+        parser.error(str(e))
+
+    fp = options.output and open(options.output, 'w') or sys.stdout
+    try:
+        run(options, args, Output(fp, codec))
+    except CommandError, e:
+        sys.stderr.write('%s\n' % (e))
+        return 1
+    except KeyboardInterrupt:
+        return 130
+    except IOError, e:
+        # Output piped into e.g. head(1) which has exited
+        if e.errno != errno.EPIPE:
+            raise
+    finally:
+        if fp is not sys.stdout:
+            fp.close()
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,510 @@
+# Licensed to the Apache Software Foundation (ASF) under one or more
+# contributor license agreements.  See the NOTICE file distributed with
+# this work for additional information regarding copyright ownership.
+# The ASF licenses this file to You under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with
+# the License.  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Local evaluator for the alarm criteria language.
+
+Criteria are parsed and compiled to a tree of Python closures which can be
+evaluated against the C{check_data} returned by C{test_check} without
+hitting the API. Compiled criteria are cached by the hash of the criteria
+text, up to C{CACHE_SIZE} least recently used ones.
+
+Supported subset of the language::
+
+    :set consecutiveCount=3
+    if (metric['code'] == '404' || metric['code'] regex '^5') {
+        return CRITICAL, "Got #{code}"
+    }
+    if (rate(metric['bytes']) > 1000 && !(metric['duration'] < 500)) {
+        return new AlarmStatus(WARNING, 'Slow');
+    }
+    return OK
+"""
+
+from __future__ import with_statement
+
+import re
+import hashlib
+import threading
+
+from collections import OrderedDict
+
+__all__ = ['CriteriaSyntaxError', 'CompiledCriteria', 'compile_criteria',
+           'evaluate_criteria', 'clear_cache']
+
+STATES = ['OK', 'WARNING', 'CRITICAL']
+DEFAULT_STATUS = 'Matched default return statement'
+
+INTEGER_TYPES = ['i', 'I', 'l', 'L']
+FLOAT_TYPES = ['n']
+
+TOKEN_RE = re.compile(r"""
+    (?P<ws>\s+) |
+    (?P<comment>//[^\n]*) |
+    (?P<number>\d+(?:\.\d+)?) |
+    (?P<string>'(?:\\.|[^'\\])*'|"(?:\\.|[^"\\])*") |
+    (?P<directive>:set\b) |
+    (?P<name>[A-Za-z_][A-Za-z0-9_]*) |
+    (?P<op>==|!=|<=|>=|&&|\|\||[<>!(){}\[\],;=\-])
+""", re.VERBOSE)
+
+COMPARISON_OPERATORS = ['==', '!=', '<', '>', '<=', '>=', 'regex', 'nregex']
+INTERPOLATION_RE = re.compile(r'#\{([^}]+)\}')
+
+
+class CriteriaSyntaxError(ValueError):
+    def __init__(self, message, line=None):
+        self.line = line
+        if line is not None:
+            message = '%s (line %s)' % (message, line)
+        super(CriteriaSyntaxError, self).__init__(message)
+
+
+class Token(object):
+    def __init__(self, type, value, line):
+        self.type = type
+        self.value = value
+        self.line = line
+
+    def __repr__(self):
+        return '<Token: type=%s, value=%r, line=%s>' % (self.type,
+                                                       self.value, self.line)
+
+
+def tokenize(text):
+    tokens = []
+    position = 0
+    line = 1
+
+    while position < len(text):
+        match = TOKEN_RE.match(text, position)
+        if not match:
+            raise CriteriaSyntaxError('Unexpected character %r' %
+                                      (text[position]), line=line)
+
+        type = match.lastgroup
+        value = match.group(type)
+
+        if type == 'string':
+            value = re.sub(r'\\(.)', r'\1', value[1:-1])
+
+        if type not in ['ws', 'comment']:
+            tokens.append(Token(type, value, line))
+
+        line += match.group(0).count('\n')
+        position = match.end()
+
+    tokens.append(Token('eof', None, line))
+    return tokens
+
+
+def _to_number(value):
+    if isinstance(value, (int, long, float)) or value is None:
+        return value
+
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _metric_value(metric):
+    type = metric.get('type')
+    data = metric.get('data')
+
+    if type in INTEGER_TYPES:
+        return int(data)
+    elif type in FLOAT_TYPES:
+        return float(data)
+    return data
+
+
+def _compare(operator, left, right):
+    if left is None or right is None:
+        return False
+
+    if operator in ['regex', 'nregex']:
+        matched = re.search(str(right), str(left)) is not None
+        return matched if operator == 'regex' else not matched
+
+    # Metric values are compared numerically if either side is a number.
+    if isinstance(left, basestring) != isinstance(right, basestring):
+        left, right = _to_number(left), _to_number(right)
+        if left is None or right is None:
+            return False
+
+    if operator == '==':
+        return left == right
+    elif operator == '!=':
+        return left != right
+    elif operator == '<':
+        return left < right
+    elif operator == '>':
+        return left > right
+    elif operator == '<=':
+        return left <= right
+    return left >= right
+
+
+class Parser(object):
+    """
+    Recursive descent parser which directly emits closures. Each expression
+    closure takes a context (a C{dict} with C{metrics}, C{previous} and
+    C{elapsed} keys) and each statement closure returns a (state, status)
+    tuple or None if it didn't return.
+    """
+
+    def __init__(self, text):
+        self.tokens = tokenize(text)
+        self.position = 0
+        self.depth = 0
+        self.settings = {}
+
+    def peek(self):
+        return self.tokens[self.position]
+
+    def next(self):
+        token = self.tokens[self.position]
+        self.position += 1
+        return token
+
+    def accept(self, value):
+        token = self.peek()
+        if token.type in ['op', 'name'] and token.value == value:
+            self.position += 1
+            return token
+        return None
+
+    def expect(self, value):
+        token = self.accept(value)
+        if token is None:
+            token = self.peek()
+            raise CriteriaSyntaxError('Expected %r, got %r' %
+                                      (value, token.value), line=token.line)
+        return token
+
+    def expect_type(self, type):
+        token = self.next()
+        if token.type != type:
+            raise CriteriaSyntaxError('Expected %s, got %r' %
+                                      (type, token.value), line=token.line)
+        return token
+
+    def parse(self):
+        statements = []
+        while self.peek().type != 'eof':
+            if self.peek().type == 'directive':
+                self.parse_directive()
+            else:
+                statements.append(self.parse_statement())
+        return self.block(statements)
+
+    def parse_directive(self):
+        self.next()
+        name = self.expect_type('name').value
+        self.expect('=')
+        self.settings[name] = _to_number(self.expect_type('number').value)
+
+    def block(self, statements):
+        def run(context):
+            for statement in statements:
+                result = statement(context)
+                if result is not None:
+                    return result
+            return None
+        return run
+
+    def parse_statement(self):
+        token = self.peek()
+        if self.accept('if'):
+            return self.parse_if()
+        elif self.accept('return'):
+            return self.parse_return(token.line)
+        raise CriteriaSyntaxError('Unexpected %r' % (token.value),
+                                  line=token.line)
+
+    def parse_body(self):
+        self.expect('{')
+        self.depth += 1
+        statements = []
+        while not self.accept('}'):
+            if self.peek().type == 'eof':
+                raise CriteriaSyntaxError('Missing closing "}"',
+                                          line=self.peek().line)
+            statements.append(self.parse_statement())
+        self.depth -= 1
+        return self.block(statements)
+
+    def parse_if(self):
+        self.expect('(')
+        condition = self.parse_expression()
+        self.expect(')')
+        body = self.parse_body()
+        otherwise = None
+
+        if self.accept('else'):
+            if self.accept('if'):
+                otherwise = self.parse_if()
+            else:
+                otherwise = self.parse_body()
+
+        def run(context):
+            if condition(context):
+                return body(context)
+            elif otherwise is not None:
+                return otherwise(context)
+            return None
+        return run
+
+    def parse_state(self):
+        token = self.expect_type('name')
+        if token.value not in STATES:
+            raise CriteriaSyntaxError('Invalid state %r' % (token.value),
+                                      line=token.line)
+        return token.value
+
+    def parse_return(self, line):
+        if self.accept('new'):
+            self.expect('AlarmStatus')
+            self.expect('(')
+            state = self.parse_state()
+            message = None
+            if self.accept(','):
+                message = self.expect_type('string').value
+            self.expect(')')
+        else:
+            state = self.parse_state()
+            message = None
+            if self.accept(','):
+                message = self.expect_type('string').value
+        self.accept(';')
+
+        if message is None:
+            if self.depth == 0:
+                default = DEFAULT_STATUS
+            else:
+                default = 'Matched return statement on line %s' % (line)
+
+            def run(context):
+                return state, default
+        else:
+            def run(context):
+                metrics = context['metrics']
+
+                def replace(match):
+                    value = metrics.get(match.group(1))
+                    return '' if value is None else str(value)
+                return state, INTERPOLATION_RE.sub(replace, message)
+        return run
+
+    def parse_expression(self):
+        left = self.parse_and()
+        while self.accept('||'):
+            right = self.parse_and()
+            left = (lambda a, b: lambda c: a(c) or b(c))(left, right)
+        return left
+
+    def parse_and(self):
+        left = self.parse_not()
+        while self.accept('&&'):
+            right = self.parse_not()
+            left = (lambda a, b: lambda c: a(c) and b(c))(left, right)
+        return left
+
+    def parse_not(self):
+        if self.accept('!'):
+            operand = self.parse_not()
+            return lambda c: not operand(c)
+        return self.parse_comparison()
+
+    def parse_comparison(self):
+        left = self.parse_operand()
+        token = self.peek()
+        if token.type in ['op', 'name'] and \
+           token.value in COMPARISON_OPERATORS:
+            self.next()
+            operator = token.value
+            right = self.parse_operand()
+            return lambda c: _compare(operator, left(c), right(c))
+        return left
+
+    def parse_metric(self):
+        self.expect('metric')
+        self.expect('[')
+        name = self.expect_type('string').value
+        self.expect(']')
+        return name
+
+    def parse_operand(self):
+        token = self.peek()
+
+        if token.type == 'number':
+            self.next()
+            value = _to_number(token.value)
+            return lambda c: value
+        elif token.type == 'string':
+            self.next()
+            value = token.value
+            return lambda c: value
+        elif self.accept('-'):
+            operand = self.parse_operand()
+
+            def negate(context):
+                value = _to_number(operand(context))
+                return None if value is None else -value
+            return negate
+        elif self.accept('('):
+            expression = self.parse_expression()
+            self.expect(')')
+            return expression
+        elif token.value == 'metric':
+            name = self.parse_metric()
+            return lambda c: c['metrics'].get(name)
+        elif self.accept('previous'):
+            self.expect('(')
+            name = self.parse_metric()
+            self.expect(')')
+            return lambda c: c['previous'].get(name)
+        elif self.accept('rate'):
+            self.expect('(')
+            name = self.parse_metric()
+            self.expect(')')
+
+            def rate(context):
+                current = _to_number(context['metrics'].get(name))
+                previous = _to_number(context['previous'].get(name))
+                elapsed = context['elapsed']
+                if current is None or previous is None or not elapsed:
+                    return None
+                return (current - previous) / elapsed
+            return rate
+
+        raise CriteriaSyntaxError('Unexpected %r' % (token.value),
+                                  line=token.line)
+
+
+class CompiledCriteria(object):
+    """
+    Compiled alarm criteria.
+    """
+
+    def __init__(self, criteria):
+        parser = Parser(criteria)
+        self.criteria = criteria
+        self._run = parser.parse()
+        self.settings = parser.settings
+
+    def evaluate_metrics(self, metrics, previous=None, elapsed=None):
+        """
+        Evaluate criteria against a dict of already decoded metric values.
+
+        @type elapsed: C{float}
+        @param elapsed: Seconds elapsed since the previous sample (used by
+                        rate()).
+
+        @return: (state, status) tuple.
+        """
+        context = {'metrics': metrics, 'previous': previous or {},
+                   'elapsed': elapsed}
+        result = self._run(context)
+        if result is None:
+            return 'OK', DEFAULT_STATUS
+        return result
+
+    def evaluate(self, check_data):
+        """
+        Evaluate criteria against the C{check_data} returned by
+        C{test_check}.
+
+        @return: List of dicts in the same format as returned by
+                 C{test_alarm}.
+        """
+        result = []
+        previous = {}
+
+        for item in check_data:
+            metrics = dict([(name, _metric_value(metric)) for name, metric
+                            in item.get('metrics', {}).items()])
+            zone = item.get('monitoring_zone_id')
+            timestamp = item.get('timestamp')
+
+            last = previous.get(zone)
+            elapsed = None
+            if last and last[0] is not None and timestamp is not None:
+                elapsed = (timestamp - last[0]) / 1000.0
+
+            state, status = self.evaluate_metrics(metrics,
+                                                  last and last[1] or {},
+                                                  elapsed)
+            previous[zone] = (timestamp, metrics)
+            result.append({'timestamp': timestamp, 'computed_state': state,
+                           'status': status})
+
+        return result
+
+    def __repr__(self):
+        return '<CompiledCriteria: hash=%s ...>' % (criteria_hash(
+                                                    self.criteria))
+
+
+# Maximum number of compiled criteria kept in the cache
+CACHE_SIZE = 500
+
+# Least recently used first
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def criteria_hash(criteria):
+    if isinstance(criteria, unicode):
+        criteria = criteria.encode('utf-8')
+    return hashlib.sha1(criteria).hexdigest()
+
+
+def compile_criteria(criteria):
+    """
+    Compile criteria, returning a cached L{CompiledCriteria} instance if the
+    same criteria text has already been compiled. When the cache is full,
+    the least recently used criteria are dropped.
+    """
+    key = criteria_hash(criteria)
+    with _cache_lock:
+        compiled = _cache.pop(key, None)
+        if compiled is not None:
+            # Moved to the end as the most recently used
+            _cache[key] = compiled
+            return compiled
+
+    # Compile outside of the lock so other lookups aren't blocked
+    compiled = CompiledCriteria(criteria)
+    with _cache_lock:
+        compiled = _cache.pop(key, compiled)
+        _cache[key] = compiled
+        if len(_cache) > CACHE_SIZE:
+            _cache.popitem(last=False)
+
+    return compiled
+
+
+def evaluate_criteria(criteria, check_data):
+    """
+    Local equivalent of C{test_alarm}.
+    """
+    return compile_criteria(criteria).evaluate(check_data)
+
+
+def clear_cache():
+    with _cache_lock:
+        _cache.clear()
@@ -13,13 +13,15 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+# Backward compatibility for Python 2.5
+from __future__ import with_statement
+
+import time
+import urllib
 import httplib
 import urlparse
-
-try:
-    import simplejson as json
-except:
-    import json
+import threading
+import contextlib
 
 from libcloud.common.types import MalformedResponseError, LibcloudError
 from libcloud.common.types import LazyList
@@ -27,11 +29,18 @@ from libcloud.common.base import Response
 
 from rackspace_monitoring.providers import Provider
 from rackspace_monitoring.utils import to_underscore_separated
+from rackspace_monitoring.utils import imap_unordered, IdentityMap
+from rackspace_monitoring.utils import Interner, NullInterner
+from rackspace_monitoring.utils import PageSizeTuner
+from rackspace_monitoring.json_codecs import get_codec
+# rackspace_monitoring.criteria and rackspace_monitoring.pagination are
+# imported on first use to keep the start up time of short lived scripts low.
 
 from rackspace_monitoring.base import (MonitoringDriver, Entity,
                                       NotificationPlan, MonitoringZone,
                                       Notification, CheckType, Alarm, Check,
-                                      NotificationType, AlarmChangelog)
+                                      NotificationType, AlarmChangelog,
+                                      AccountSnapshot)
 
 from libcloud.common.rackspace import AUTH_URL_US
 from libcloud.common.openstack import OpenStackBaseConnection
@@ -39,6 +48,9 @@ from libcloud.common.openstack import OpenStackBaseConnection
 API_VERSION = 'v1.0'
 API_URL = 'https://cmbeta.api.rackspacecloud.com/%s' % (API_VERSION)
 
+# Maximum number of distinct values kept by the interner of a driver
+INTERNER_MAX_SIZE = 10000
+
 class RackspaceMonitoringValidationError(LibcloudError):
 
     def __init__(self, code, type, message, details, driver):
@@ -69,6 +81,89 @@ class LatestAlarmState(object):
                 (self.entity_id, self.check_id, self.alarm_id, self.state))
 
 
+class LazyAttributesMixin(object):
+    """
+    Attributes listed in _lazy_attributes are decoded from the raw API item
+    (stored as _raw) the first time they are read.
+    """
+
+    # attribute name -> function(obj, raw item) which returns the value
+    _lazy_attributes = {}
+
+    def __getattr__(self, name):
+        raw = self.__dict__.get('_raw')
+        if raw is None or name not in self._lazy_attributes:
+            raise AttributeError(name)
+
+        value = self._lazy_attributes[name](self, raw)
+        self.__dict__[name] = value
+        return value
+
+
+def _decode_ip_addresses(obj, raw):
+    intern = obj.driver._intern
+    ipaddrs = raw.get('ip_addresses') or {}
+    return [(intern(key), value) for key, value in ipaddrs.items()]
+
+
+class LazyEntity(LazyAttributesMixin, Entity):
+    _lazy_attributes = {
+        'extra': lambda obj, raw: raw.get('metadata') or {},
+        'ip_addresses': _decode_ip_addresses}
+
+    def __init__(self, id, label, driver, raw):
+        self.id = id
+        self.label = label
+        self.driver = driver
+        self._raw = raw
+
+
+class LazyCheck(LazyAttributesMixin, Check):
+    _lazy_attributes = {
+        'details': lambda obj, raw: raw['details'],
+        'timeout': lambda obj, raw: raw['timeout'],
+        'period': lambda obj, raw: raw['period'],
+        'monitoring_zones': lambda obj, raw: obj.driver._intern.sequence(
+                                                raw['monitoring_zones_poll']),
+        'target_alias': lambda obj, raw: obj.driver._intern(
+                                                raw['target_alias']),
+        'target_resolver': lambda obj, raw: obj.driver._intern(
+                                                raw['target_resolver'])}
+
+    def __init__(self, id, label, type, entity_id, driver, raw):
+        self.id = id
+        self.label = label
+        self.type = type
+        self.entity_id = entity_id
+        self.driver = driver
+        self._raw = raw
+
+
+class LazyAlarm(LazyAttributesMixin, Alarm):
+    _lazy_attributes = {'criteria': lambda obj, raw: raw['criteria']}
+
+    def __init__(self, id, type, driver, entity_id, notification_plan_id,
+                 check_id, raw):
+        self.id = id
+        self.type = type
+        self.driver = driver
+        self.entity_id = entity_id
+        self.notification_plan_id = notification_plan_id
+        self.check_id = check_id
+        self._raw = raw
+
+
+class LazyNotification(LazyAttributesMixin, Notification):
+    _lazy_attributes = {'details': lambda obj, raw: raw['details']}
+
+    def __init__(self, id, label, type, driver, raw):
+        self.id = id
+        self.label = label
+        self.type = type
+        self.driver = driver
+        self._raw = raw
+
+
 class RackspaceMonitoringResponse(Response):
 
     valid_response_codes = [httplib.CONFLICT]
@@ -94,7 +189,7 @@ class RackspaceMonitoringResponse(Response):
 
         if content_type == 'application/json':
             try:
-                data = json.loads(self.body)
+                data = self.connection.get_json_codec().loads(self.body)
             except:
                 raise MalformedResponseError('Failed to parse JSON',
                                              body=self.body,
@@ -119,6 +214,71 @@ class RackspaceMonitoringResponse(Response):
         return body
 
 
+class InFlightRequest(object):
+    """
+    GET request which is currently being performed and whose response can be
+    shared with other callers.
+    """
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.response = None
+        self.error = None
+        self.service_time = None
+
+    def wait(self):
+        self.event.wait()
+        if self.error is not None:
+            raise self.error
+        return self.response
+
+
+class PriorityView(object):
+    """
+    Proxy which makes every request of the wrapped driver (or iterator
+    returned by it) in the given priority class, see
+    L{RackspaceMonitoringDriver.ex_with_priority}.
+    """
+
+    def __init__(self, target, driver, priority):
+        self._target = target
+        self._driver = driver
+        self._priority = priority
+
+    def _call(self, func, *args, **kwargs):
+        with self._driver.ex_priority(self._priority):
+            return func(*args, **kwargs)
+
+    def _wrap(self, result):
+        if isinstance(result, LazyList):
+            # Pages are requested when the list is first used
+            get_more = result._get_more
+            result._get_more = lambda **kwargs: self._call(get_more,
+                                                           **kwargs)
+        elif hasattr(result, 'next'):
+            return PriorityView(result, self._driver, self._priority)
+        return result
+
+    def __getattr__(self, name):
+        value = getattr(self._target, name)
+        if not callable(value):
+            return value
+
+        def wrapper(*args, **kwargs):
+            return self._wrap(self._call(value, *args, **kwargs))
+        return wrapper
+
+    def __iter__(self):
+        return self
+
+    def next(self):
+        return self._call(self._target.next)
+
+    def __repr__(self):
+        return '<PriorityView: priority=%s, target=%r>' % (self._priority,
+                                                           self._target)
+
+
 class RackspaceMonitoringConnection(OpenStackBaseConnection):
     """
     Base connection class for the Rackspace Monitoring driver.
@@ -129,8 +289,23 @@ class RackspaceMonitoringConnection(OpenStackBaseConnection):
     auth_url = AUTH_URL_US
     _url_key = "monitoring_url"
 
+    # If True, concurrent identical GET requests share a single HTTP request
+    # and its response object.
+    single_flight = True
+
+    # JSON codec used for request and response bodies, None means the
+    # fastest installed codec.
+    json_codec = None
+
+    # RequestScheduler which every HTTP request needs to acquire a slot from
+    # (None means requests are sent right away).
+    scheduler = None
+
     def __init__(self, user_id, key, secure=False, ex_force_base_url=API_URL,
                  ex_force_auth_url=None, ex_force_auth_version='2.0'):
+        self._local = threading.local()
+        self._in_flight = {}
+        self._in_flight_lock = threading.Lock()
         self.api_version = API_VERSION
         self.monitoring_url = ex_force_base_url
         self.accept_format = 'application/json'
@@ -140,6 +315,38 @@ class RackspaceMonitoringConnection(OpenStackBaseConnection):
                                 ex_force_auth_url=ex_force_auth_url,
                                 ex_force_auth_version=ex_force_auth_version)
 
+    def _get_connection(self):
+        return getattr(self._local, 'connection', None)
+
+    def _set_connection(self, connection):
+        self._local.connection = connection
+
+    # Underlying HTTP connection is stored per thread so a single driver
+    # instance can be shared between multiple threads.
+    connection = property(_get_connection, _set_connection)
+
+    def _get_priority(self):
+        return getattr(self._local, 'priority', None)
+
+    def _set_priority(self, priority):
+        self._local.priority = priority
+
+    # Priority class of the requests made by the current thread
+    priority = property(_get_priority, _set_priority)
+
+    @property
+    def last_service_time(self):
+        """
+        Duration of the last HTTP request of the current thread in seconds,
+        without the time spent waiting for a scheduler slot.
+        """
+        return getattr(self._local, 'service_time', None)
+
+    def get_json_codec(self):
+        if self.json_codec is None:
+            self.json_codec = get_codec()
+        return self.json_codec
+
     def request(self, action, params=None, data='', headers=None, method='GET',
                 raw=False):
         if not headers:
@@ -149,16 +356,71 @@ class RackspaceMonitoringConnection(OpenStackBaseConnection):
 
         headers['Accept'] = 'application/json'
 
+        if [value for value in params.values()
+            if isinstance(value, (list, tuple))]:
+            # Filters such as entityId can be repeated which libcloud's
+            # urlencode() doesn't support.
+            action = '%s?%s' % (action, urllib.urlencode(
+                                    sorted(params.items()), doseq=True))
+            params = {}
+
         if method in ['POST', 'PUT']:
             headers['Content-Type'] = 'application/json; charset=UTF-8'
-            data = json.dumps(data)
+            data = self.get_json_codec().dumps(data)
 
-        return super(RackspaceMonitoringConnection, self).request(
-            action=action,
-            params=params, data=data,
-            method=method, headers=headers,
-            raw=raw
-        )
+        kwargs = {'action': action, 'params': params, 'data': data,
+                  'method': method, 'headers': headers, 'raw': raw}
+
+        if method != 'GET' or raw or not self.single_flight:
+            return self._send(kwargs)
+
+        return self._single_flight_request(kwargs)
+
+    def _send(self, kwargs):
+        ticket = None
+        if self.scheduler is not None:
+            ticket = self.scheduler.acquire(self.priority)
+
+        start = time.time()
+        try:
+            return super(RackspaceMonitoringConnection, self).request(**kwargs)
+        finally:
+            self._local.service_time = time.time() - start
+            if ticket is not None:
+                self.scheduler.release(ticket)
+
+    def _single_flight_request(self, kwargs):
+        # Requests of different priority classes aren't shared, otherwise an
+        # interactive request could wait for the slot of a queued background
+        # request.
+        key = (kwargs['action'], tuple(sorted(kwargs['params'].items())),
+               self.priority)
+
+        with self._in_flight_lock:
+            call = self._in_flight.get(key)
+            leader = call is None
+            if leader:
+                call = InFlightRequest()
+                self._in_flight[key] = call
+
+        if not leader:
+            try:
+                return call.wait()
+            finally:
+                self._local.service_time = call.service_time
+
+        try:
+            call.response = self._send(kwargs)
+        except Exception, e:
+            call.error = e
+            raise
+        finally:
+            call.service_time = self.last_service_time
+            with self._in_flight_lock:
+                del self._in_flight[key]
+            call.event.set()
+
+        return call.response
 
 
 class RackspaceMonitoringDriver(MonitoringDriver):
@@ -170,12 +432,90 @@ class RackspaceMonitoringDriver(MonitoringDriver):
     connectionCls = RackspaceMonitoringConnection
 
     def __init__(self, *args, **kwargs):
+        """
+        @keyword ex_identity_map: If True, list and get methods return the
+                                  same Entity, Check, Alarm, Notification and
+                                  NotificationPlan instance for the same id as
+                                  long as it is referenced, updating it in
+                                  place with the newly received data.
+        @type    ex_identity_map: C{bool}
+
+        @keyword ex_lazy_models: If True, list and get methods return Entity,
+                                 Check, Alarm and Notification objects which
+                                 only decode heavy attributes (extra,
+                                 ip_addresses, details, criteria, ...) from
+                                 the raw API item when they are first read.
+        @type    ex_lazy_models: C{bool}
+
+        @keyword ex_json_codec: Name of the JSON codec (ujson, simplejson,
+                                json, cjson) or a JSONCodec instance.
+                                Defaults to the fastest installed codec,
+                                which is picked on the first request.
+        @type    ex_json_codec: C{str}
+
+        @keyword ex_auto_page_size: If True, list methods called without
+                                    ex_limit pick a page size based on the
+                                    observed latency of previous pages instead
+                                    of using the API default.
+        @type    ex_auto_page_size: C{bool}
+
+        @keyword ex_auth_token: Previously obtained auth token, used together
+                                with ex_tenant_ids to skip the authentication
+                                request (see L{ex_get_auth_info}).
+        @type    ex_auth_token: C{str}
+
+        @keyword ex_tenant_ids: Tenant ids by service type from the service
+                                catalog of a previous authentication.
+        @type    ex_tenant_ids: C{dict}
+
+        @keyword ex_scheduler: RequestScheduler every request needs to get a
+                               slot from, see L{ex_priority}. Can be shared
+                               by several drivers.
+        @type    ex_scheduler: L{RequestScheduler}
+
+        @keyword ex_intern_values: If True, check types, states, target
+                                   aliases, monitoring zone lists and other
+                                   repeated values share a single copy across
+                                   all the returned objects.
+        @type    ex_intern_values: C{bool}
+        """
+        # Low cardinality values which repeat across many objects (types,
+        # states, zone lists) can be interned so large result sets share a
+        # single copy. Ids and labels are unique and aren't interned.
+        if kwargs.pop('ex_intern_values', False):
+            self._intern = Interner(max_size=INTERNER_MAX_SIZE)
+        else:
+            self._intern = NullInterner()
+        self._identity_map = None
+        if kwargs.pop('ex_identity_map', False):
+            self._identity_map = IdentityMap()
+        self._lazy_models = kwargs.pop('ex_lazy_models', False)
+        json_codec = kwargs.pop('ex_json_codec', None)
+        if json_codec is not None:
+            # The default codec is picked by the connection on first use
+            json_codec = get_codec(json_codec)
+        self._auto_page_size = kwargs.pop('ex_auto_page_size', False)
+        self._page_size_tuners = {}
+
         self._ex_force_base_url = kwargs.pop('ex_force_base_url', None)
         self._ex_force_auth_url = kwargs.pop('ex_force_auth_url', None)
         self._ex_force_auth_version = kwargs.pop('ex_force_auth_version', None)
+        auth_token = kwargs.pop('ex_auth_token', None)
+        tenant_ids = kwargs.pop('ex_tenant_ids', None)
+        scheduler = kwargs.pop('ex_scheduler', None)
         super(RackspaceMonitoringDriver, self).__init__(*args, **kwargs)
 
-        self.connection._populate_hosts_and_request_paths()
+        self.connection.json_codec = json_codec
+        self.connection.scheduler = scheduler
+        if auth_token and tenant_ids:
+            connection = self.connection
+            connection.auth_token = auth_token
+            connection.tenant_ids = dict(tenant_ids)
+            (connection.host, connection.port, connection.secure,
+             connection.request_path) = connection._tuple_from_url(
+                                                    connection.base_url)
+        else:
+            self.connection._populate_hosts_and_request_paths()
         tenant_id = self.connection.tenant_ids['compute']
         self.connection._force_base_url = '%s/%s' % (
                 self.connection._force_base_url, tenant_id)
@@ -190,10 +530,55 @@ class RackspaceMonitoringDriver(MonitoringDriver):
             rv['ex_force_auth_version'] = self._ex_force_auth_version
         return rv
 
+    def ex_get_auth_info(self):
+        """
+        Return the auth token and the tenant ids of the connection which can
+        be passed to the constructor as ex_auth_token and ex_tenant_ids.
+
+        @rtype: C{dict}
+        """
+        return {'auth_token': self.connection.auth_token,
+                'tenant_ids': dict(self.connection.tenant_ids)}
+
+    @contextlib.contextmanager
+    def ex_priority(self, priority):
+        """
+        Context manager which makes the requests of the current thread in
+        the given priority class of the scheduler (interactive, default or
+        background with the default classes).
+
+        Worker threads started by the driver (L{ex_fetch_account_snapshot},
+        L{ex_test_check_and_alarm_many}) use the priority of the caller,
+        other threads keep their own priority.
+
+        @type priority: C{str}
+        @param priority: Name of the priority class.
+        """
+        connection = self.connection
+        previous = connection.priority
+        connection.priority = priority
+        try:
+            yield self
+        finally:
+            connection.priority = previous
+
+    def ex_with_priority(self, priority):
+        """
+        Return a view of the driver whose methods make their requests in the
+        given priority class. Lists and iterators returned by the view also
+        request their pages in that class.
+
+        @type priority: C{str}
+        @param priority: Name of the priority class.
+
+        @rtype: L{PriorityView}
+        """
+        return PriorityView(self, self, priority)
+
     def _get_more(self, last_key, value_dict):
         key = None
 
-        params = value_dict.get('params', {})
+        params = dict(value_dict.get('params', {}))
 
         if not last_key:
             key = value_dict.get('start_marker')
@@ -203,13 +588,21 @@ class RackspaceMonitoringDriver(MonitoringDriver):
         if key:
             params['marker'] = key
 
+        tuner = None
+        if 'limit' not in params and self._auto_page_size:
+            tuner = self._get_page_size_tuner(value_dict)
+            params['limit'] = tuner.limit
+
         response = self.connection.request(value_dict['url'], params)
+        # Only the HTTP request, a page which waited for a scheduler slot or
+        # for an identical request isn't slow.
+        elapsed = self.connection.last_service_time
 
         # newdata, self._last_key, self._exhausted
         if response.status == httplib.NO_CONTENT:
-            return [], None, False
+            return [], None, True
         elif response.status == httplib.OK:
-            resp = json.loads(response.body)
+            resp = response.object
             l = None
 
             if 'list_item_mapper' in value_dict:
@@ -217,15 +610,98 @@ class RackspaceMonitoringDriver(MonitoringDriver):
                 l = [func(x, value_dict) for x in resp['values']]
             else:
                 l = value_dict['object_mapper'](resp, value_dict)
+
+            if tuner is not None and elapsed is not None:
+                tuner.observe(elapsed, len(resp.get('values', l)),
+                              params['limit'])
+
             m = resp['metadata'].get('next_marker')
             return l, m, m == None
 
-        body = json.loads(response.body)
+        body = response.object or {}
 
         details = body['details'] if 'details' in body else ''
         raise LibcloudError('Unexpected status code: %s (url=%s, details=%s)' %
                             (response.status, value_dict['url'], details))
 
+    def _with_caller_priority(self, func):
+        """
+        Wrap a function which is called on worker threads so its requests
+        are made in the priority class of the calling thread.
+        """
+        priority = self.connection.priority
+
+        def wrapper(*args, **kwargs):
+            with self.ex_priority(priority):
+                return func(*args, **kwargs)
+        return wrapper
+
+    def _get_page_size_tuner(self, value_dict):
+        # Page latency mostly depends on the type of listed items so a
+        # single tuner is shared by all the listings with the same mapper.
+        mapper = (value_dict.get('list_item_mapper') or
+                  value_dict['object_mapper'])
+        return self._page_size_tuners.setdefault(mapper.__name__,
+                                                 PageSizeTuner())
+
+    def _list(self, value_dict, ex_stream=False, ex_limit=None,
+              ex_filter=None, ex_ids=None, attributes=None):
+        """
+        Return a LazyList (L{IteratorList}) for the provided value_dict or a
+        ListIterator if ex_stream is True. ListIterator doesn't retain the
+        items so each page can be garbage collected as soon as it has been
+        consumed. Both expose a checkpoint which can be passed to
+        L{ex_resume}.
+
+        @type ex_limit: C{int}
+        @param ex_limit: Page size, picked automatically if not provided.
+
+        @type ex_filter: C{callable}
+        @param ex_filter: Client side predicate which is called with each
+                          item.
+
+        @type ex_ids: C{list}
+        @param ex_ids: Only return items with these ids. No more pages are
+                       requested once all of them have been found.
+
+        @type attributes: C{dict}
+        @param attributes: Only return items whose attributes are equal to
+                           the provided values (None values are ignored).
+
+        If any client side filter is provided, the pages are read through a
+        FilteredIterator.
+        """
+        if ex_limit is not None:
+            value_dict.setdefault('params', {})['limit'] = ex_limit
+
+        from rackspace_monitoring.pagination import ListIterator
+
+        attributes = dict([(name, value) for name, value in
+                           (attributes or {}).items() if value is not None])
+        iterator = ListIterator(get_more=self._get_more,
+                                value_dict=value_dict)
+        return self._iterator_result(iterator, ex_stream, ex_filter, ex_ids,
+                                     attributes)
+
+    def _iterator_result(self, iterator, ex_stream, ex_filter=None,
+                         ex_ids=None, attributes=None):
+        from rackspace_monitoring.pagination import (FilteredIterator,
+                                                     IteratorList)
+
+        if ex_filter is not None or ex_ids is not None or attributes:
+            iterator = FilteredIterator(iterator, predicate=ex_filter,
+                                        ids=ex_ids, attributes=attributes)
+        if ex_stream:
+            return iterator
+
+        return IteratorList(iterator)
+
+    def _canonical(self, obj):
+        if self._identity_map is None:
+            return obj
+
+        return self._identity_map.add(obj)
+
     def _plural_to_singular(self, name):
         kv = {'entities': 'entity',
               'alarms': 'alarm',
@@ -288,22 +764,28 @@ class RackspaceMonitoringDriver(MonitoringDriver):
         else:
             raise LibcloudError('Unexpected status code: %s' % (resp.status))
 
-    def list_check_types(self):
+    def list_check_types(self, ex_stream=False, ex_limit=None,
+                         ex_filter=None, ex_ids=None):
         value_dict = {'url': '/check_types',
                        'list_item_mapper': self._to_check_type}
 
-        return LazyList(get_more=self._get_more, value_dict=value_dict)
+        return self._list(value_dict=value_dict, ex_stream=ex_stream,
+                          ex_limit=ex_limit, ex_filter=ex_filter,
+                          ex_ids=ex_ids)
 
     def _to_check_type(self, obj, value_dict):
         return CheckType(id=obj['id'],
                          fields=obj.get('fields', []),
                          is_remote=obj.get('type') == 'remote')
 
-    def list_notification_types(self):
+    def list_notification_types(self, ex_stream=False, ex_limit=None,
+                                ex_filter=None, ex_ids=None):
         value_dict = {'url': '/notification_types',
                        'list_item_mapper': self._to_notification_type}
 
-        return LazyList(get_more=self._get_more, value_dict=value_dict)
+        return self._list(value_dict=value_dict, ex_stream=ex_stream,
+                          ex_limit=ex_limit, ex_filter=ex_filter,
+                          ex_ids=ex_ids)
 
     def _to_notification_type(self, obj, value_dict):
         return NotificationType(id=obj['id'],
@@ -315,10 +797,15 @@ class RackspaceMonitoringDriver(MonitoringDriver):
                               source_ips=obj['source_ips'],
                               driver=self)
 
-    def list_monitoring_zones(self):
+    def list_monitoring_zones(self, ex_stream=False, ex_limit=None,
+                              ex_filter=None, ex_ids=None,
+                              ex_country_code=None):
         value_dict = {'url': '/monitoring_zones',
                        'list_item_mapper': self._to_monitoring_zone}
-        return LazyList(get_more=self._get_more, value_dict=value_dict)
+        return self._list(value_dict=value_dict, ex_stream=ex_stream,
+                          ex_limit=ex_limit, ex_filter=ex_filter,
+                          ex_ids=ex_ids,
+                          attributes={'country_code': ex_country_code})
 
     ##########
     ## Alarms
@@ -330,39 +817,87 @@ class RackspaceMonitoringDriver(MonitoringDriver):
         return self._to_alarm(resp.object, {'entity_id': entity_id})
 
     def _to_alarm(self, alarm, value_dict):
-        return Alarm(id=alarm['id'], type=alarm['check_type'],
+        intern = self._intern
+        if self._lazy_models:
+            return self._canonical(LazyAlarm(id=alarm['id'],
+                type=intern(alarm['check_type']),
+                notification_plan_id=intern(alarm['notification_plan_id']),
+                check_id=alarm.get('check_id'),
+                driver=self, entity_id=value_dict['entity_id'], raw=alarm))
+
+        return self._canonical(Alarm(id=alarm['id'],
+            type=intern(alarm['check_type']),
             criteria=alarm['criteria'],
-            notification_plan_id=alarm['notification_plan_id'],
-            driver=self, entity_id=value_dict['entity_id'])
+            notification_plan_id=intern(alarm['notification_plan_id']),
+            check_id=alarm.get('check_id'),
+            driver=self, entity_id=value_dict['entity_id']))
 
-    def list_alarms(self, entity, ex_next_marker=None):
+    def list_alarms(self, entity, ex_next_marker=None, ex_stream=False,
+                    ex_limit=None, ex_filter=None, ex_ids=None, ex_type=None,
+                    ex_check_id=None, ex_notification_plan_id=None):
         value_dict = {'url': '/entities/%s/alarms' % (entity.id),
                       'start_marker': ex_next_marker,
                       'list_item_mapper': self._to_alarm,
                       'entity_id': entity.id}
 
-        return LazyList(get_more=self._get_more, value_dict=value_dict)
+        attributes = {'type': ex_type, 'check_id': ex_check_id,
+                      'notification_plan_id': ex_notification_plan_id}
+        return self._list(value_dict=value_dict, ex_stream=ex_stream,
+                          ex_limit=ex_limit, ex_filter=ex_filter,
+                          ex_ids=ex_ids, attributes=attributes)
+
+    def list_alarm_changelog(self, ex_next_marker=None, ex_stream=False,
+                             ex_limit=None, ex_filter=None,
+                             ex_entity_id=None, ex_from=None, ex_to=None):
+        """
+        @type ex_entity_id: C{str}
+        @param ex_entity_id: Only return changes of this entity (server side).
+
+        @type ex_from: C{int}
+        @param ex_from: Start of the period in milliseconds since epoch.
+
+        @type ex_to: C{int}
+        @param ex_to: End of the period in milliseconds since epoch.
+        """
+        params = {}
+        if ex_entity_id:
+            params['entityId'] = ex_entity_id
+        if ex_from:
+            params['from'] = ex_from
+        if ex_to:
+            params['to'] = ex_to
 
-    def list_alarm_changelog(self, ex_next_marker=None):
         value_dict = {'url': '/changelogs/alarms',
+                      'params': params,
                       'start_marker': ex_next_marker,
                       'list_item_mapper': self._to_alarm_changelog}
 
-        return LazyList(get_more=self._get_more, value_dict=value_dict)
+        return self._list(value_dict=value_dict, ex_stream=ex_stream,
+                          ex_limit=ex_limit, ex_filter=ex_filter)
 
     def _to_alarm_changelog(self, values, value_dict):
+        intern = self._intern
         alarm_changelog = AlarmChangelog(id=values['id'],
                                          alarm_id=values['alarm_id'],
                                          entity_id=values['entity_id'],
                                          check_id=values['check_id'],
-                                         state=values['state'])
+                                         state=intern(values['state']),
+                                         timestamp=values.get('timestamp'))
         return alarm_changelog
 
-    def delete_alarm(self, alarm):
+    def delete_alarm(self, alarm, ex_dependency_graph=None):
+        """
+        @type ex_dependency_graph: L{DependencyGraph}
+        @param ex_dependency_graph: Graph which the alarm is removed from
+                                    once it has been deleted.
+        """
         resp = self.connection.request("/entities/%s/alarms/%s" % (
             alarm.entity_id, alarm.id),
             method='DELETE')
-        return resp.status == httplib.NO_CONTENT
+        deleted = resp.status == httplib.NO_CONTENT
+        if deleted and ex_dependency_graph is not None:
+            ex_dependency_graph.remove(alarm)
+        return deleted
 
     def update_alarm(self, alarm, data):
         return self._update("/entities/%s/alarms/%s" % (alarm.entity_id,
@@ -390,27 +925,53 @@ class RackspaceMonitoringDriver(MonitoringDriver):
     ## Notifications
     ####################
 
-    def list_notifications(self, ex_next_marker=None):
+    def list_notifications(self, ex_next_marker=None, ex_stream=False,
+                           ex_limit=None, ex_filter=None, ex_ids=None,
+                           ex_label=None, ex_type=None):
         value_dict = {'url': '/notifications',
                       'start_marker': ex_next_marker,
                       'list_item_mapper': self._to_notification}
 
-        return LazyList(get_more=self._get_more, value_dict=value_dict)
+        return self._list(value_dict=value_dict, ex_stream=ex_stream,
+                          ex_limit=ex_limit, ex_filter=ex_filter,
+                          ex_ids=ex_ids,
+                          attributes={'label': ex_label, 'type': ex_type})
 
     def _to_notification(self, notification, value_dict):
-        return Notification(id=notification['id'], label=notification['label'],
+        if self._lazy_models:
+            return self._canonical(LazyNotification(id=notification['id'],
+                label=notification['label'], type=notification['type'],
+                driver=self, raw=notification))
+
+        return self._canonical(Notification(id=notification['id'],
+                            label=notification['label'],
                             type=notification['type'],
-                            details=notification['details'], driver=self)
+                            details=notification['details'], driver=self))
 
     def get_notification(self, notification_id):
         resp = self.connection.request("/notifications/%s" % (notification_id))
 
         return self._to_notification(resp.object, {})
 
-    def delete_notification(self, notification):
+    def delete_notification(self, notification, ex_dependency_graph=None):
+        """
+        @type ex_dependency_graph: L{DependencyGraph}
+        @param ex_dependency_graph: If provided, DependencyError is raised
+                                    without deleting anything if a
+                                    notification plan references the
+                                    notification. The notification is
+                                    removed from the graph once it has been
+                                    deleted.
+        """
+        if ex_dependency_graph is not None:
+            ex_dependency_graph.check_delete(notification, driver=self)
+
         resp = self.connection.request("/notifications/%s" % (notification.id),
                                        method='DELETE')
-        return resp.status == httplib.NO_CONTENT
+        deleted = resp.status == httplib.NO_CONTENT
+        if deleted and ex_dependency_graph is not None:
+            ex_dependency_graph.remove(notification)
+        return deleted
 
     def update_notification(self, notification, data):
         return self._update("/notifications/%s" % (notification.id),
@@ -432,26 +993,44 @@ class RackspaceMonitoringDriver(MonitoringDriver):
         critical_state = notification_plan.get('critical_state', [])
         warning_state = notification_plan.get('warning_state', [])
         ok_state = notification_plan.get('ok_state', [])
-        return NotificationPlan(id=notification_plan['id'],
+        return self._canonical(NotificationPlan(id=notification_plan['id'],
             label=notification_plan['label'],
             critical_state=critical_state, warning_state=warning_state,
-            ok_state=ok_state, driver=self)
+            ok_state=ok_state, driver=self))
 
     def get_notification_plan(self, notification_plan_id):
         resp = self.connection.request("/notification_plans/%s" % (
             notification_plan_id))
         return self._to_notification_plan(resp.object, {})
 
-    def delete_notification_plan(self, notification_plan):
+    def delete_notification_plan(self, notification_plan,
+                                 ex_dependency_graph=None):
+        """
+        @type ex_dependency_graph: L{DependencyGraph}
+        @param ex_dependency_graph: If provided, DependencyError is raised
+                                    without deleting anything if an alarm
+                                    references the plan. The plan is removed
+                                    from the graph once it has been deleted.
+        """
+        if ex_dependency_graph is not None:
+            ex_dependency_graph.check_delete(notification_plan, driver=self)
+
         resp = self.connection.request("/notification_plans/%s" %
                 (notification_plan.id), method='DELETE')
-        return resp.status == httplib.NO_CONTENT
-
-    def list_notification_plans(self, ex_next_marker=None):
+        deleted = resp.status == httplib.NO_CONTENT
+        if deleted and ex_dependency_graph is not None:
+            ex_dependency_graph.remove(notification_plan)
+        return deleted
+
+    def list_notification_plans(self, ex_next_marker=None,
+                                ex_stream=False, ex_limit=None,
+                                ex_filter=None, ex_ids=None, ex_label=None):
         value_dict = {'url': "/notification_plans",
                       'start_marker': ex_next_marker,
                       'list_item_mapper': self._to_notification_plan}
-        return LazyList(get_more=self._get_more, value_dict=value_dict)
+        return self._list(value_dict=value_dict, ex_stream=ex_stream,
+                          ex_limit=ex_limit, ex_filter=ex_filter,
+                          ex_ids=ex_ids, attributes={'label': ex_label})
 
     def update_notification_plan(self, notification_plan, data):
         return self._update("/notification_plans/%s" % (notification_plan.id),
@@ -477,25 +1056,36 @@ class RackspaceMonitoringDriver(MonitoringDriver):
         return self._to_check(resp.object, {'entity_id': entity_id})
 
     def _to_check(self, obj, value_dict):
-        return Check(**{
+        intern = self._intern
+        if self._lazy_models:
+            return self._canonical(LazyCheck(id=obj['id'],
+                label=obj.get('label'), type=intern(obj['type']),
+                entity_id=value_dict['entity_id'], driver=self, raw=obj))
+
+        return self._canonical(Check(**{
             'id': obj['id'],
             'label': obj.get('label'),
             'timeout': obj['timeout'],
             'period': obj['period'],
-            'monitoring_zones': obj['monitoring_zones_poll'],
-            'target_alias': obj['target_alias'],
-            'target_resolver': obj['target_resolver'],
-            'type': obj['type'],
+            'monitoring_zones': intern.sequence(obj['monitoring_zones_poll']),
+            'target_alias': intern(obj['target_alias']),
+            'target_resolver': intern(obj['target_resolver']),
+            'type': intern(obj['type']),
             'details': obj['details'],
             'driver': self,
-            'entity_id': value_dict['entity_id']})
+            'entity_id': value_dict['entity_id']}))
 
-    def list_checks(self, entity, ex_next_marker=None):
+    def list_checks(self, entity, ex_next_marker=None, ex_stream=False,
+                    ex_limit=None, ex_filter=None, ex_ids=None,
+                    ex_label=None, ex_type=None):
         value_dict = {'url': "/entities/%s/checks" % (entity.id),
                       'start_marker': ex_next_marker,
                       'list_item_mapper': self._to_check,
                       'entity_id': entity.id}
-        return LazyList(get_more=self._get_more, value_dict=value_dict)
+        return self._list(value_dict=value_dict, ex_stream=ex_stream,
+                          ex_limit=ex_limit, ex_filter=ex_filter,
+                          ex_ids=ex_ids,
+                          attributes={'label': ex_label, 'type': ex_type})
 
     def _check_kwarg_to_data(self, kwargs):
         data = {'who': kwargs.get('who'),
@@ -533,11 +1123,19 @@ class RackspaceMonitoringDriver(MonitoringDriver):
                                                         check.id),
             data=data, coerce=self.get_check)
 
-    def delete_check(self, check):
+    def delete_check(self, check, ex_dependency_graph=None):
+        """
+        @type ex_dependency_graph: L{DependencyGraph}
+        @param ex_dependency_graph: Graph which the check is removed from
+                                    once it has been deleted.
+        """
         resp = self.connection.request("/entities/%s/checks/%s" %
                                        (check.entity_id, check.id),
                                        method='DELETE')
-        return resp.status == httplib.NO_CONTENT
+        deleted = resp.status == httplib.NO_CONTENT
+        if deleted and ex_dependency_graph is not None:
+            ex_dependency_graph.remove(check)
+        return deleted
 
     ###########
     ## Entity
@@ -548,13 +1146,20 @@ class RackspaceMonitoringDriver(MonitoringDriver):
         return self._to_entity(resp.object, {})
 
     def _to_entity(self, entity, value_dict):
+        intern = self._intern
+        if self._lazy_models:
+            return self._canonical(LazyEntity(id=entity['id'],
+                label=entity['label'], driver=self, raw=entity))
+
         ips = []
         ipaddrs = entity.get('ip_addresses', {})
         if ipaddrs is not None:
             for key in ipaddrs.keys():
-                ips.append((key, ipaddrs[key]))
-        return Entity(id=entity['id'], label=entity['label'],
-                      extra=entity['metadata'], driver=self, ip_addresses=ips)
+                ips.append((intern(key), ipaddrs[key]))
+        return self._canonical(Entity(id=entity['id'],
+                                      label=entity['label'],
+                                      extra=entity['metadata'], driver=self,
+                                      ip_addresses=ips))
 
     def delete_entity(self, entity, ex_delete_children=False):
         try:
@@ -574,12 +1179,16 @@ class RackspaceMonitoringDriver(MonitoringDriver):
 
         return resp.status == httplib.NO_CONTENT
 
-    def list_entities(self, ex_next_marker=None):
+    def list_entities(self, ex_next_marker=None, ex_stream=False,
+                      ex_limit=None, ex_filter=None, ex_ids=None,
+                      ex_label=None):
         value_dict = {'url': '/entities',
                       'start_marker': ex_next_marker,
                       'list_item_mapper': self._to_entity}
 
-        return LazyList(get_more=self._get_more, value_dict=value_dict)
+        return self._list(value_dict=value_dict, ex_stream=ex_stream,
+                          ex_limit=ex_limit, ex_filter=ex_filter,
+                          ex_ids=ex_ids, attributes={'label': ex_label})
 
     def create_entity(self, **kwargs):
         data = {'who': kwargs.get('who'),
@@ -601,13 +1210,27 @@ class RackspaceMonitoringDriver(MonitoringDriver):
     def _to_audit(self, audit, value_dict):
         return audit
 
-    def list_audits(self, start_from=None, to=None):
-        # TODO: add start/end date support
+    def list_audits(self, start_from=None, to=None, ex_stream=False,
+                    ex_limit=None, ex_filter=None):
+        """
+        @type start_from: C{int}
+        @param start_from: Start of the period in milliseconds since epoch.
+
+        @type to: C{int}
+        @param to: End of the period in milliseconds since epoch.
+        """
+        params = {}
+        if start_from:
+            params['from'] = start_from
+        if to:
+            params['to'] = to
+
         value_dict = {'url': '/audits',
-                      'params': {'limit': 200},
+                      'params': params,
                       'list_item_mapper': self._to_audit}
 
-        return LazyList(get_more=self._get_more, value_dict=value_dict)
+        return self._list(value_dict=value_dict, ex_stream=ex_stream,
+                          ex_limit=ex_limit, ex_filter=ex_filter)
 
     #########
     ## Other
@@ -619,6 +1242,48 @@ class RackspaceMonitoringDriver(MonitoringDriver):
         result = self.test_alarm(entity=entity, **data)
         return result
 
+    def ex_test_check_and_alarm_many(self, specs, ex_max_workers=10,
+                                     ex_local_criteria=False):
+        """
+        Run test_check_and_alarm for multiple entities.
+
+        Checks are tested on a pool of threads and each alarm test is started
+        as soon as its check test has finished.
+
+        @type specs: C{iterable}
+        @param specs: (entity, criteria, check kwargs) tuples.
+
+        @type ex_local_criteria: C{bool}
+        @param ex_local_criteria: Evaluate criteria locally instead of calling
+                                  the test-alarm API endpoint.
+
+        @return: Generator which yields (entity, result, error) tuples in
+                 completion order.
+        """
+        def run_check(spec):
+            entity, criteria, kwargs = spec
+            return self.test_check(entity=entity, **kwargs)
+
+        def run_alarm(item):
+            spec, check_data, error = item
+            if error:
+                raise error
+
+            entity, criteria = spec[0], spec[1]
+            if ex_local_criteria:
+                from rackspace_monitoring.criteria import evaluate_criteria
+                return evaluate_criteria(criteria, check_data)
+            return self.test_alarm(entity=entity, criteria=criteria,
+                                   check_data=check_data)
+
+        checks = imap_unordered(self._with_caller_priority(run_check), specs,
+                                ex_max_workers)
+        alarms = imap_unordered(self._with_caller_priority(run_alarm), checks,
+                                ex_max_workers)
+
+        for item, result, error in alarms:
+            yield item[0][0], result, error
+
     ####################
     # Extension methods
     ####################
@@ -628,11 +1293,25 @@ class RackspaceMonitoringDriver(MonitoringDriver):
                                        (entity.id, alarm.id)).object
         return resp
 
-    def ex_list_alarm_history(self, entity, alarm, check, ex_next_marker=None):
+    def ex_list_alarm_history(self, entity, alarm, check, ex_next_marker=None,
+                              ex_stream=False, ex_limit=None, ex_filter=None,
+                              ex_from=None):
+        """
+        @type ex_from: C{int}
+        @param ex_from: Only return records from this time on (milliseconds
+                        since epoch).
+        """
+        params = {}
+        if ex_from:
+            params['from'] = ex_from
+
         value_dict = {'url': '/entities/%s/alarms/%s/history/%s' %
                               (entity.id, alarm.id, check.id),
-                       'list_item_mapper': self._to_alarm_history_obj}
-        return LazyList(get_more=self._get_more, value_dict=value_dict)
+                      'params': params,
+                      'start_marker': ex_next_marker,
+                      'list_item_mapper': self._to_alarm_history_obj}
+        return self._list(value_dict=value_dict, ex_stream=ex_stream,
+                          ex_limit=ex_limit, ex_filter=ex_filter)
 
     def _to_alarm_history_obj(self, values, value_dict):
         return values
@@ -649,22 +1328,128 @@ class RackspaceMonitoringDriver(MonitoringDriver):
         for alarm in alarms:
             self.delete_alarm(alarm=alarm)
 
+    def ex_fetch_account_snapshot(self, ex_max_workers=10):
+        """
+        Fetch all the collections of an account.
+
+        Independent collections are listed concurrently, after that checks
+        and alarms of all the entities are listed over a pool of at most
+        ex_max_workers threads. Failed listings are recorded in the
+        snapshot errors instead of aborting the whole fetch.
+
+        @rtype: L{AccountSnapshot}
+        """
+        collections = {'entities': self.list_entities,
+                       'notifications': self.list_notifications,
+                       'notification_plans': self.list_notification_plans,
+                       'monitoring_zones': self.list_monitoring_zones,
+                       'check_types': self.list_check_types,
+                       'notification_types': self.list_notification_types}
+        result = dict([(name, []) for name in collections])
+        errors = []
+
+        def fetch_collection(name):
+            return list(collections[name](ex_stream=True))
+
+        fetch_collection = self._with_caller_priority(fetch_collection)
+        for name, items, error in imap_unordered(fetch_collection,
+                                                 collections.keys(),
+                                                 ex_max_workers):
+            if error:
+                errors.append((name, error))
+            else:
+                result[name] = items
+
+        children = {'checks': {}, 'alarms': {}}
+        methods = {'checks': self.list_checks, 'alarms': self.list_alarms}
+
+        def fetch_children(task):
+            entity, name = task
+            return list(methods[name](entity=entity, ex_stream=True))
+
+        tasks = [(entity, name) for entity in result['entities'] for name in
+                 ['checks', 'alarms']]
+        fetch_children = self._with_caller_priority(fetch_children)
+        for task, items, error in imap_unordered(fetch_children, tasks,
+                                                 ex_max_workers):
+            entity, name = task
+            if error:
+                errors.append((entity, error))
+            else:
+                children[name][entity.id] = items
+
+        return AccountSnapshot(checks=children['checks'],
+                               alarms=children['alarms'], errors=errors,
+                               **result)
+
+    def ex_resume(self, checkpoint, ex_checkpoint_sink=None, ex_filter=None,
+                  ex_stream=True):
+        """
+        Resume a listing from a checkpoint. The client side filters stored
+        in the checkpoint are applied again.
+
+        @type checkpoint: L{ListCheckpoint}
+        @param checkpoint: Checkpoint of a list or iterator returned by any
+                           of the list methods.
+
+        @type ex_checkpoint_sink: C{object}
+        @param ex_checkpoint_sink: Object with a save(checkpoint) method which
+                                   is called every time a page has been
+                                   consumed (e.g. L{FileCheckpointSink}).
+
+        @type ex_filter: C{callable}
+        @param ex_filter: Predicate of the original listing. Required if it
+                          was listed with ex_filter, a callable can't be
+                          stored in the checkpoint.
+
+        @type ex_stream: C{bool}
+        @param ex_stream: Return an iterator (default) instead of a list.
+
+        @rtype: L{ListIterator}
+        """
+        from rackspace_monitoring.pagination import ListIterator
+
+        filters = checkpoint.filters or {}
+        if filters.get('predicate') and ex_filter is None:
+            raise ValueError('The listing was filtered with ex_filter, '
+                             'it needs to be passed again')
+
+        iterator = ListIterator(get_more=self._get_more,
+                                value_dict=checkpoint.to_value_dict(self),
+                                checkpoint=checkpoint,
+                                sink=ex_checkpoint_sink)
+        return self._iterator_result(iterator, ex_stream, ex_filter,
+                                     filters.get('ids'),
+                                     filters.get('attributes'))
+
     def ex_limits(self):
         resp = self.connection.request('/limits',
                                        method='GET')
         return resp.object
 
-    def ex_views_overview(self, ex_next_marker=None):
+    def ex_views_overview(self, ex_next_marker=None, ex_stream=False,
+                          ex_limit=None, ex_filter=None, ex_entity_ids=None):
+        """
+        @type ex_entity_ids: C{list}
+        @param ex_entity_ids: Only return the overview of these entities
+                              (server side).
+        """
+        params = {}
+        if ex_entity_ids:
+            params['entityId'] = list(ex_entity_ids)
+
         value_dict = {'url': '/views/overview',
+                      'params': params,
                       'start_marker': ex_next_marker,
                       'list_item_mapper': self._to_overview_obj}
 
-        return LazyList(get_more=self._get_more, value_dict=value_dict)
+        return self._list(value_dict=value_dict, ex_stream=ex_stream,
+                          ex_limit=ex_limit, ex_filter=ex_filter)
 
     def _to_latest_alarm_state(self, obj, value_dict):
         return LatestAlarmState(entity_id=obj['entity_id'],
                 check_id=obj['check_id'], alarm_id=obj['alarm_id'],
-                timestamp=obj['timestamp'], state=obj['state'])
+                timestamp=obj['timestamp'], state=self._intern(obj['state']))
 
     def _to_overview_obj(self, data, value_dict):
         entity = self._to_entity(data['entity'], {})
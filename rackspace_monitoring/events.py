@@ -0,0 +1,313 @@
+# Licensed to the Apache Software Foundation (ASF) under one or more
+# contributor license agreements.  See the NOTICE file distributed with
+# this work for additional information regarding copyright ownership.
+# The ASF licenses this file to You under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with
+# the License.  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Dispatches alarm changelog entries to local handlers.
+
+A single L{EventBus} polls C{list_alarm_changelog} and every registered
+handler receives the matching entries in batches, so integrations don't
+need to poll the API themselves.
+"""
+
+from __future__ import with_statement
+
+import sys
+import time
+import Queue
+import threading
+
+from rackspace_monitoring.utils import ChangelogCursor
+
+__all__ = ['EventBus', 'Handler']
+
+
+class Handler(object):
+    """
+    A subscribed callback and its filters. None means "any".
+
+    The callback is called with a list of L{AlarmChangelog} entries. Batches
+    of the same handler never run concurrently and are delivered in order.
+    """
+
+    def __init__(self, callback, entity_ids=None, check_types=None,
+                 states=None, batch_window=1.0, max_batch=100,
+                 max_pending=1000):
+        self.callback = callback
+        self.entity_ids = entity_ids is not None and set(entity_ids) or None
+        self.check_types = check_types is not None and set(check_types) or \
+                           None
+        self.states = states is not None and set(states) or None
+        self.batch_window = batch_window
+        self.max_batch = max_batch
+        self.max_pending = max_pending
+
+        self.pending = []
+        self.deadline = None
+        self.busy = False
+        self.delivered = 0
+        self.errors = 0
+        self.last_error = None
+
+    def matches(self, change, check_type=None):
+        if self.entity_ids is not None and \
+           change.entity_id not in self.entity_ids:
+            return False
+        if self.states is not None and change.state not in self.states:
+            return False
+        if self.check_types is not None and \
+           check_type not in self.check_types:
+            return False
+        return True
+
+    def is_ready(self, now, flush=False):
+        if self.busy or not self.pending:
+            return False
+        return (flush or len(self.pending) >= self.max_batch or
+                now >= self.deadline)
+
+    def __repr__(self):
+        return ('<Handler: callback=%r, pending=%s, delivered=%s>' %
+                (self.callback, len(self.pending), self.delivered))
+
+
+class EventBus(object):
+    """
+    Batches alarm changelog entries per handler and runs the handlers on a
+    pool of worker threads.
+
+    Backpressure: C{publish} blocks while a matching handler has
+    C{max_pending} undelivered entries, so a slow handler slows down
+    polling instead of buffering without bounds.
+    """
+
+    def __init__(self, driver=None, max_workers=4, check_type_resolver=None,
+                 on_error=None):
+        """
+        @type check_type_resolver: C{callable}
+        @param check_type_resolver: Function called with (entity_id,
+                                    check_id) which returns the check type.
+                                    Defaults to C{driver.get_check} with a
+                                    cache. Only used if a handler filters by
+                                    check type.
+
+        @type on_error: C{callable}
+        @param on_error: Function called with (handler, batch, exception)
+                         when a handler raises an exception.
+        """
+        self.driver = driver
+        self.max_workers = max_workers
+        self.on_error = on_error
+        self._check_type_resolver = check_type_resolver
+        self._check_types = {}
+
+        self._cond = threading.Condition()
+        self._handlers = []
+        self._work = Queue.Queue()
+        self._threads = []
+        self._running = False
+        self._stopping = False
+
+        self._changelog = ChangelogCursor()
+
+    def subscribe(self, callback, entity_ids=None, check_types=None,
+                  states=None, batch_window=1.0, max_batch=100,
+                  max_pending=1000):
+        """
+        Register a handler.
+
+        @type batch_window: C{float}
+        @param batch_window: Seconds entries are collected for before the
+                             callback is called.
+
+        @type max_batch: C{int}
+        @param max_batch: Maximum number of entries passed to a single
+                          callback call.
+
+        @rtype: L{Handler}
+        """
+        handler = Handler(callback, entity_ids=entity_ids,
+                          check_types=check_types, states=states,
+                          batch_window=batch_window, max_batch=max_batch,
+                          max_pending=max_pending)
+        with self._cond:
+            self._handlers.append(handler)
+        return handler
+
+    def unsubscribe(self, handler):
+        with self._cond:
+            self._handlers.remove(handler)
+            self._cond.notifyAll()
+
+    def _resolve_check_type(self, change):
+        check_id = change.check_id
+        if check_id not in self._check_types:
+            try:
+                if self._check_type_resolver is not None:
+                    check_type = self._check_type_resolver(change.entity_id,
+                                                           check_id)
+                else:
+                    check_type = self.driver.get_check(change.entity_id,
+                                                       check_id).type
+            except Exception:
+                # Deleted check, only handlers without a check type filter
+                # receive the entry.
+                check_type = None
+            self._check_types[check_id] = check_type
+        return self._check_types[check_id]
+
+    def publish(self, changes):
+        """
+        Queue changelog entries for the matching handlers.
+        """
+        with self._cond:
+            handlers = list(self._handlers)
+        need_type = [handler for handler in handlers
+                     if handler.check_types is not None]
+
+        for change in changes:
+            check_type = need_type and self._resolve_check_type(change) or \
+                         None
+            matching = [handler for handler in handlers
+                        if handler.matches(change, check_type)]
+            if not matching:
+                continue
+
+            with self._cond:
+                for handler in matching:
+                    while (len(handler.pending) >= handler.max_pending and
+                           self._running and handler in self._handlers):
+                        self._cond.wait(0.1)
+
+                    if not handler.pending:
+                        handler.deadline = time.time() + \
+                                           handler.batch_window
+                    handler.pending.append(change)
+                self._cond.notifyAll()
+
+    def poll_once(self):
+        """
+        Read the new alarm changelog entries and publish them. The first
+        call only starts the changelog from now.
+
+        @return: Number of new entries.
+        """
+        if self._changelog.start is None:
+            self._changelog.start = int(time.time() * 1000)
+            return 0
+
+        changes = list(self._changelog.read(self.driver))
+        self.publish(changes)
+        return len(changes)
+
+    def run(self, interval=30, stop_event=None):
+        """
+        Poll the changelog every C{interval} seconds until C{stop_event} is
+        set. Starts the workers if needed and stops them at the end.
+        """
+        stop_event = stop_event or threading.Event()
+        self.start()
+        try:
+            while not stop_event.isSet():
+                self.poll_once()
+                stop_event.wait(interval)
+        finally:
+            self.stop()
+
+    def start(self):
+        with self._cond:
+            if self._running:
+                return
+            self._running = True
+            self._stopping = False
+
+        self._threads = [threading.Thread(target=self._dispatch)]
+        self._threads.extend([threading.Thread(target=self._work_loop) for
+                              _ in range(self.max_workers)])
+        for thread in self._threads:
+            thread.daemon = True
+            thread.start()
+
+    def stop(self, flush=True):
+        """
+        Stop the workers. If C{flush} is True, pending entries are delivered
+        first.
+        """
+        with self._cond:
+            if not self._running:
+                return
+            self._stopping = True
+            if not flush:
+                for handler in self._handlers:
+                    handler.pending = []
+            self._cond.notifyAll()
+
+        # The dispatcher exits once everything has been delivered and then
+        # stops the workers.
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+
+        with self._cond:
+            self._running = False
+
+    def _dispatch(self):
+        with self._cond:
+            while True:
+                now = time.time()
+                for handler in self._handlers:
+                    if handler.is_ready(now, flush=self._stopping):
+                        batch = handler.pending[:handler.max_batch]
+                        handler.pending = handler.pending[handler.max_batch:]
+                        handler.deadline = now + handler.batch_window
+                        handler.busy = True
+                        self._work.put((handler, batch))
+
+                if self._stopping and not [handler for handler in
+                                           self._handlers if
+                                           handler.pending or handler.busy]:
+                    break
+
+                deadlines = [handler.deadline for handler in self._handlers
+                             if handler.pending and not handler.busy]
+                timeout = deadlines and max(0, min(deadlines) - now) or None
+                self._cond.wait(timeout is None and 1.0 or timeout)
+
+        for _ in range(self.max_workers):
+            self._work.put(None)
+
+    def _work_loop(self):
+        while True:
+            item = self._work.get()
+            if item is None:
+                return
+
+            handler, batch = item
+            try:
+                try:
+                    handler.callback(batch)
+                except Exception:
+                    # A failing handler doesn't affect the other ones
+                    handler.errors += 1
+                    handler.last_error = sys.exc_info()[1]
+                    if self.on_error is not None:
+                        try:
+                            self.on_error(handler, batch, handler.last_error)
+                        except Exception:
+                            pass
+            finally:
+                with self._cond:
+                    handler.busy = False
+                    handler.delivered += len(batch)
+                    self._cond.notifyAll()
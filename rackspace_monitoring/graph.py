@@ -0,0 +1,240 @@
+# Licensed to the Apache Software Foundation (ASF) under one or more
+# contributor license agreements.  See the NOTICE file distributed with
+# this work for additional information regarding copyright ownership.
+# The ASF licenses this file to You under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with
+# the License.  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Dependency graph between the objects of an account for impact analysis.
+
+Edges point from an object to the objects it references:
+
+    alarm -> check, notification plan, entity
+    check -> entity
+    notification plan -> notification
+"""
+
+from __future__ import with_statement
+
+import threading
+
+from libcloud.common.types import LibcloudError
+
+from rackspace_monitoring.base import (Entity, Check, Alarm, Notification,
+                                      NotificationPlan)
+
+__all__ = ['DependencyGraph', 'DependencyError']
+
+PLAN_STATES = ['critical_state', 'warning_state', 'ok_state']
+
+
+class DependencyError(LibcloudError):
+    """
+    Raised when deleting an object would leave other objects referencing it.
+    """
+
+    def __init__(self, obj, dependents, driver=None):
+        self.obj = obj
+        self.dependents = dependents
+        value = ('%r is referenced by %s object(s): %s' %
+                 (obj, len(dependents),
+                  ', '.join([repr(item) for item in dependents[:5]])))
+        super(DependencyError, self).__init__(value=value, driver=driver)
+
+
+class DependencyGraph(object):
+    """
+    Forward and reverse references between entities, checks, alarms,
+    notification plans and notifications. Reverse lookups only visit the
+    direct dependents of an object.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # key -> object
+        self._objects = {}
+        # key -> keys of the referenced objects
+        self._references = {}
+        # key -> keys of the objects which reference it
+        self._dependents = {}
+
+    @classmethod
+    def from_snapshot(cls, snapshot):
+        """
+        Build a graph from an L{AccountSnapshot}.
+        """
+        graph = cls()
+        graph.add_many(snapshot.entities)
+        graph.add_many(snapshot.notifications)
+        graph.add_many(snapshot.notification_plans)
+        for checks in snapshot.checks.values():
+            graph.add_many(checks)
+        for alarms in snapshot.alarms.values():
+            graph.add_many(alarms)
+        return graph
+
+    def __len__(self):
+        return len(self._objects)
+
+    def __contains__(self, obj):
+        return self._key(obj) in self._objects
+
+    def _key(self, obj):
+        if isinstance(obj, Alarm):
+            return ('alarm', obj.entity_id, obj.id)
+        elif isinstance(obj, Check):
+            return ('check', obj.entity_id, obj.id)
+        elif isinstance(obj, Entity):
+            return ('entity', obj.id)
+        elif isinstance(obj, NotificationPlan):
+            return ('notification_plan', obj.id)
+        elif isinstance(obj, Notification):
+            return ('notification', obj.id)
+
+        raise ValueError('Unsupported object: %r' % (obj))
+
+    def _referenced_keys(self, obj):
+        if isinstance(obj, Alarm):
+            keys = [('entity', obj.entity_id),
+                    ('notification_plan', obj.notification_plan_id)]
+            if obj.check_id:
+                keys.append(('check', obj.entity_id, obj.check_id))
+            return keys
+        elif isinstance(obj, Check):
+            return [('entity', obj.entity_id)]
+        elif isinstance(obj, NotificationPlan):
+            keys = []
+            for state in PLAN_STATES:
+                keys.extend([('notification', notification_id) for
+                             notification_id in getattr(obj, state) or []])
+            return keys
+
+        return []
+
+    def _remove_references(self, key):
+        for reference in self._references.pop(key, ()):
+            dependents = self._dependents.get(reference)
+            if dependents is not None:
+                dependents.discard(key)
+                if not dependents:
+                    del self._dependents[reference]
+
+    def add(self, obj):
+        """
+        Add an object or replace a previously added version of it.
+        """
+        key = self._key(obj)
+        references = set(self._referenced_keys(obj))
+
+        with self._lock:
+            self._remove_references(key)
+            self._objects[key] = obj
+            self._references[key] = references
+            for reference in references:
+                self._dependents.setdefault(reference, set()).add(key)
+
+    def add_many(self, objects):
+        for obj in objects:
+            self.add(obj)
+
+    def remove(self, obj):
+        """
+        Remove an object. Objects which reference it are kept.
+        """
+        key = self._key(obj)
+        with self._lock:
+            self._objects.pop(key, None)
+            self._remove_references(key)
+
+    def _get(self, keys, kind=None):
+        result = []
+        for key in keys:
+            if kind is not None and key[0] != kind:
+                continue
+            obj = self._objects.get(key)
+            if obj is not None:
+                result.append(obj)
+        return result
+
+    def dependents(self, obj, kind=None):
+        """
+        Return the objects which directly reference an object.
+
+        @type kind: C{str}
+        @param kind: Only return objects of this kind (entity, check, alarm,
+                     notification_plan, notification).
+        """
+        with self._lock:
+            return self._get(self._dependents.get(self._key(obj), ()), kind)
+
+    def references(self, obj, kind=None):
+        """
+        Return the objects which an object references.
+        """
+        with self._lock:
+            return self._get(self._references.get(self._key(obj), ()), kind)
+
+    def missing_references(self, obj):
+        """
+        Return keys of the objects an object references which are not in the
+        graph (e.g. an alarm whose notification plan has been deleted).
+        """
+        with self._lock:
+            return [key for key in self._references.get(self._key(obj), ())
+                    if key not in self._objects]
+
+    def impact(self, obj):
+        """
+        Return all the objects which directly or indirectly reference an
+        object, i.e. everything which is affected if it's deleted.
+        """
+        with self._lock:
+            seen = set()
+            stack = [self._key(obj)]
+            while stack:
+                for key in self._dependents.get(stack.pop(), ()):
+                    if key not in seen:
+                        seen.add(key)
+                        stack.append(key)
+            return self._get(seen)
+
+    def plans_for_notification(self, notification):
+        return self.dependents(notification, kind='notification_plan')
+
+    def alarms_for_notification_plan(self, notification_plan):
+        return self.dependents(notification_plan, kind='alarm')
+
+    def alarms_for_notification(self, notification):
+        """
+        Return the alarms which send the notification in any state.
+        """
+        result = []
+        for plan in self.plans_for_notification(notification):
+            result.extend(self.alarms_for_notification_plan(plan))
+        return result
+
+    def alarms_for_check(self, check):
+        return self.dependents(check, kind='alarm')
+
+    def checks_for_entity(self, entity):
+        return self.dependents(entity, kind='check')
+
+    def alarms_for_entity(self, entity):
+        return self.dependents(entity, kind='alarm')
+
+    def check_delete(self, obj, driver=None):
+        """
+        Raise L{DependencyError} if other objects reference the object.
+        """
+        dependents = self.dependents(obj)
+        if dependents:
+            raise DependencyError(obj, dependents, driver=driver)
@@ -0,0 +1,326 @@
+# Licensed to the Apache Software Foundation (ASF) under one or more
+# contributor license agreements.  See the NOTICE file distributed with
+# this work for additional information regarding copyright ownership.
+# The ASF licenses this file to You under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with
+# the License.  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Alarm history analytics (flapping, mean time to recovery, time in state).
+
+All the timestamps are in milliseconds since epoch, same as in the API.
+"""
+
+from __future__ import with_statement
+
+from array import array
+
+from rackspace_monitoring.utils import imap_unordered
+
+__all__ = ['STATES', 'AlarmHistory', 'AlarmHistoryAnalyzer']
+
+STATES = ['OK', 'WARNING', 'CRITICAL']
+STATE_CODES = dict([(state, code) for code, state in enumerate(STATES)])
+OK = STATE_CODES['OK']
+
+
+class AlarmHistory(object):
+    """
+    State history of a single alarm / check pair stored as two compact
+    arrays sorted by timestamp.
+    """
+
+    def __init__(self, entity_id, alarm_id, check_id, check_type=None):
+        self.entity_id = entity_id
+        self.alarm_id = alarm_id
+        self.check_id = check_id
+        self.check_type = check_type
+        self.timestamps = array('d')
+        self.states = array('b')
+
+    def extend(self, records):
+        """
+        Merge history records (dicts as returned by C{ex_list_alarm_history})
+        into this history. Records which are already present (same
+        timestamp) are ignored so the same history can be merged multiple
+        times.
+
+        @return: Number of new records.
+        """
+        rows = dict(zip(self.timestamps, self.states))
+        count = len(rows)
+
+        for record in records:
+            state = STATE_CODES.get(record['computed_state'])
+            if state is not None:
+                rows[float(record['timestamp'])] = state
+
+        timestamps = sorted(rows.keys())
+        self.timestamps = array('d', timestamps)
+        self.states = array('b', [rows[key] for key in timestamps])
+        return len(rows) - count
+
+    def transitions(self):
+        """
+        Return a number of state changes.
+        """
+        states = self.states
+        return len([i for i in xrange(1, len(states))
+                    if states[i] != states[i - 1]])
+
+    def flapping_score(self):
+        """
+        Return a ratio of state changes to the number of consecutive record
+        pairs (0.0 - never changes, 1.0 - changes on every record).
+        """
+        if len(self.states) < 2:
+            return 0.0
+
+        return float(self.transitions()) / (len(self.states) - 1)
+
+    def recovery_times(self):
+        """
+        Return a list of durations between leaving and returning to the OK
+        state. Incidents which haven't recovered yet are not included.
+        """
+        result = []
+        started = None
+
+        for timestamp, state in zip(self.timestamps, self.states):
+            if state != OK and started is None:
+                started = timestamp
+            elif state == OK and started is not None:
+                result.append(timestamp - started)
+                started = None
+
+        return result
+
+    def mttr(self):
+        """
+        Return the mean time to recovery or None if the alarm has never
+        recovered.
+        """
+        times = self.recovery_times()
+        if not times:
+            return None
+
+        return sum(times) / len(times)
+
+    def time_in_state(self, until=None):
+        """
+        Return a dict with the total time spent in each state.
+
+        @type until: C{int}
+        @param until: End of the last interval, defaults to the timestamp of
+                      the last record.
+        """
+        result = dict([(state, 0.0) for state in STATES])
+        count = len(self.timestamps)
+
+        for i in xrange(count):
+            if i + 1 < count:
+                end = self.timestamps[i + 1]
+            elif until is not None:
+                end = until
+            else:
+                break
+
+            state = STATES[self.states[i]]
+            result[state] += max(end - self.timestamps[i], 0)
+
+        return result
+
+    def to_dict(self):
+        return {'entity_id': self.entity_id, 'alarm_id': self.alarm_id,
+                'check_id': self.check_id, 'check_type': self.check_type,
+                'timestamps': self.timestamps.tolist(),
+                'states': self.states.tolist()}
+
+    @classmethod
+    def from_dict(cls, data):
+        history = cls(entity_id=data['entity_id'],
+                      alarm_id=data['alarm_id'],
+                      check_id=data['check_id'],
+                      check_type=data.get('check_type'))
+        history.timestamps = array('d', data['timestamps'])
+        history.states = array('b', data['states'])
+        return history
+
+    def __repr__(self):
+        return ('<AlarmHistory: alarm_id=%s, check_id=%s, records=%s ...>' %
+                (self.alarm_id, self.check_id, len(self.timestamps)))
+
+
+class AlarmHistoryAnalyzer(object):
+    """
+    Fetches alarm histories concurrently and computes statistics over them.
+
+    Histories can be saved to and loaded from a file so repeated reports only
+    need to merge the new records instead of reprocessing everything.
+    """
+
+    def __init__(self, driver, max_workers=10):
+        self.driver = driver
+        self.max_workers = max_workers
+        self.histories = {}
+
+    def _get_history(self, entity_id, alarm_id, check_id, check_type):
+        key = (entity_id, alarm_id, check_id)
+        history = self.histories.get(key)
+        if history is None:
+            history = AlarmHistory(entity_id=entity_id, alarm_id=alarm_id,
+                                   check_id=check_id, check_type=check_type)
+            self.histories[key] = history
+        return history
+
+    def _since(self, entity_id, alarm_id, check_id):
+        history = self.histories.get((entity_id, alarm_id, check_id))
+        if history is None or not len(history.timestamps):
+            return None
+        return int(history.timestamps[-1])
+
+    def fetch(self, entities):
+        """
+        Fetch and merge histories for all the alarms of the provided
+        entities.
+
+        Only the records newer than the last stored record of each alarm /
+        check pair are requested, so fetching again after C{load} is
+        incremental. Entities, alarms and histories are fetched in three
+        stages, each over a single pool of at most C{max_workers} threads.
+
+        @return: A list of (object, exception) tuples for the requests which
+                 have failed.
+        """
+        errors = []
+
+        def checks_and_alarms(entity):
+            checks = dict([(check.id, check) for check in
+                           self.driver.list_checks(entity=entity)])
+            return checks, list(self.driver.list_alarms(entity=entity))
+
+        alarms = []
+        for entity, result, error in imap_unordered(checks_and_alarms,
+                                                    entities,
+                                                    self.max_workers):
+            if error:
+                errors.append((entity, error))
+                continue
+
+            checks, entity_alarms = result
+            alarms.extend([(entity, checks, alarm) for alarm in
+                           entity_alarms])
+
+        def history_checks(item):
+            entity, checks, alarm = item
+            return self.driver.ex_list_alarm_history_checks(entity=entity,
+                                                            alarm=alarm)
+
+        pairs = []
+        for item, result, error in imap_unordered(history_checks, alarms,
+                                                  self.max_workers):
+            entity, checks, alarm = item
+            if error:
+                errors.append((alarm, error))
+                continue
+
+            # Histories of the checks which have been deleted in the mean
+            # time can't be retrieved anymore.
+            pairs.extend([(entity, alarm, checks[check_id],
+                           self._since(entity.id, alarm.id, check_id))
+                          for check_id in result['check_ids']
+                          if check_id in checks])
+
+        def alarm_history(pair):
+            entity, alarm, check, since = pair
+            return list(self.driver.ex_list_alarm_history(entity=entity,
+                                                          alarm=alarm,
+                                                          check=check,
+                                                          ex_from=since))
+
+        for pair, records, error in imap_unordered(alarm_history, pairs,
+                                                   self.max_workers):
+            entity, alarm, check, since = pair
+            if error:
+                errors.append((alarm, error))
+                continue
+
+            if since is not None:
+                records = [record for record in records if
+                           float(record['timestamp']) > since]
+
+            history = self._get_history(entity.id, alarm.id, check.id,
+                                        alarm.type)
+            history.extend(records)
+
+        return errors
+
+    def summary(self, by='alarm', until=None):
+        """
+        Compute statistics for each group of histories.
+
+        @type by: C{str}
+        @param by: One of C{alarm}, C{entity} or C{check_type}.
+
+        @return: C{dict} which maps a group key to a dict with
+                 C{transitions}, C{flapping_score}, C{mttr} and
+                 C{time_in_state} keys.
+        """
+        attributes = {'alarm': 'alarm_id', 'entity': 'entity_id',
+                      'check_type': 'check_type'}
+        if by not in attributes:
+            raise ValueError('Invalid group: %s (valid: %s)' %
+                             (by, ', '.join(attributes.keys())))
+
+        groups = {}
+        for history in self.histories.values():
+            key = getattr(history, attributes[by])
+            groups.setdefault(key, []).append(history)
+
+        result = {}
+        for key, histories in groups.items():
+            transitions = 0
+            intervals = 0
+            recovery_times = []
+            time_in_state = dict([(state, 0.0) for state in STATES])
+
+            for history in histories:
+                transitions += history.transitions()
+                intervals += max(len(history.states) - 1, 0)
+                recovery_times.extend(history.recovery_times())
+                for state, value in history.time_in_state(until).items():
+                    time_in_state[state] += value
+
+            result[key] = {
+                'transitions': transitions,
+                'flapping_score': (float(transitions) / intervals if
+                                   intervals else 0.0),
+                'mttr': (sum(recovery_times) / len(recovery_times) if
+                         recovery_times else None),
+                'time_in_state': time_in_state}
+
+        return result
+
+    def save(self, path):
+        data = [history.to_dict() for history in self.histories.values()]
+        codec = self.driver.connection.get_json_codec()
+        with open(path, 'w') as fp:
+            fp.write(codec.dumps(data))
+
+    def load(self, path):
+        codec = self.driver.connection.get_json_codec()
+        with open(path, 'r') as fp:
+            data = codec.loads(fp.read())
+
+        for item in data:
+            history = AlarmHistory.from_dict(item)
+            key = (history.entity_id, history.alarm_id, history.check_id)
+            self.histories[key] = history
@@ -0,0 +1,326 @@
+# Licensed to the Apache Software Foundation (ASF) under one or more
+# contributor license agreements.  See the NOTICE file distributed with
+# this work for additional information regarding copyright ownership.
+# The ASF licenses this file to You under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with
+# the License.  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Bulk import of entities from CSV or JSON lines files.
+
+JSON lines rows look like C{{"label": "web01", "ip_addresses": {"public0_v4":
+"10.0.0.1"}, "metadata": {"env": "prod"}}}. CSV files need a C{label}
+column, IP addresses and metadata are read from C{ip.<alias>} and
+C{metadata.<key>} columns.
+
+Usage: python -m rackspace_monitoring.importer [options] <file>
+"""
+
+from __future__ import with_statement
+
+import os
+import sys
+import csv
+import threading
+from optparse import OptionParser
+
+from rackspace_monitoring.json_codecs import get_codec
+from rackspace_monitoring.utils import (imap_unordered, RateLimiter,
+                                        is_over_limit_error)
+
+__all__ = ['read_rows', 'InvalidRow', 'EntityImporter', 'main']
+
+CREATED = 'created'
+EXISTS = 'exists'
+DUPLICATE = 'duplicate'
+INVALID = 'invalid'
+FAILED = 'failed'
+
+
+def _read_csv(fp, codec):
+    for row in csv.DictReader(fp):
+        entity = {'label': row.get('label'), 'ip_addresses': {},
+                  'metadata': {}}
+        for key, value in row.items():
+            if key is None or value in [None, '']:
+                continue
+            if key.startswith('ip.'):
+                entity['ip_addresses'][key[3:]] = value
+            elif key.startswith('metadata.'):
+                entity['metadata'][key[9:]] = value
+        yield entity
+
+
+class InvalidRow(object):
+    """
+    Input line which couldn't be parsed. Yielded by L{read_rows} in place of
+    the row so the other lines are still imported.
+    """
+
+    def __init__(self, line, error):
+        self.line = line
+        self.error = error
+
+    def __repr__(self):
+        return '<InvalidRow: line=%s, error=%s>' % (self.line, self.error)
+
+
+def _read_jsonl(fp, codec):
+    for number, line in enumerate(fp, 1):
+        line = line.strip()
+        if not line:
+            continue
+
+        try:
+            row = codec.loads(line)
+        except ValueError, e:
+            yield InvalidRow(number, str(e))
+            continue
+
+        if not isinstance(row, dict):
+            yield InvalidRow(number, 'Expected a JSON object')
+        else:
+            yield row
+
+
+def read_rows(path, format=None, codec=None):
+    """
+    Yield entity dicts (label, ip_addresses, metadata) from a file. Lines
+    which can't be parsed are yielded as L{InvalidRow}.
+
+    @type format: C{str}
+    @param format: C{csv} or C{jsonl}, detected from the file extension by
+                   default.
+
+    @type codec: C{str} or L{JSONCodec}
+    @param codec: JSON codec of C{jsonl} files.
+    """
+    if format is None:
+        format = os.path.splitext(path)[1].lower() == '.csv' and 'csv' or \
+                 'jsonl'
+
+    readers = {'csv': _read_csv, 'jsonl': _read_jsonl}
+    if format not in readers:
+        raise ValueError('Invalid format: %s (valid: csv, jsonl)' % (format))
+
+    codec = get_codec(codec)
+    with open(path, 'rb') as fp:
+        for row in readers[format](fp, codec):
+            yield row
+
+
+class EntityImporter(object):
+    """
+    Creates entities over a bounded pool of threads.
+
+    Existing entities are indexed by label with a single C{list_entities}
+    listing before the import starts, rows with a label which already
+    exists (or which appears multiple times in the input) are not created.
+    """
+
+    def __init__(self, driver, max_workers=5, rate=None, retries=5,
+                 backoff=1.0):
+        """
+        @type rate: C{float}
+        @param rate: Maximum number of create requests per second.
+
+        @type retries: C{int}
+        @param retries: How many times a request is retried after the API
+                        reported that the rate limit has been exceeded.
+
+        @type backoff: C{float}
+        @param backoff: Initial pause in seconds after the rate limit has
+                        been exceeded, doubled on every retry.
+        """
+        self.driver = driver
+        self.max_workers = max_workers
+        self.retries = retries
+        self.backoff = backoff
+        self.limiter = RateLimiter(rate)
+        self._labels = None
+        self._seen = None
+        # label -> Event set once the row creating it is done
+        self._pending = None
+        self._lock = threading.Lock()
+
+    def _index(self):
+        labels = {}
+        for entity in self.driver.list_entities(ex_stream=True):
+            labels.setdefault(entity.label, entity.id)
+        return labels
+
+    def _reserve(self, label):
+        """
+        Return (status, entity id) if the label already exists or has been
+        imported earlier in the input, otherwise reserve the label and return
+        None. If another row with the same label is being created, wait for
+        it first: the label is only taken if the entity has been created.
+        """
+        while True:
+            with self._lock:
+                if label in self._seen:
+                    return DUPLICATE, self._labels[label]
+                pending = self._pending.get(label)
+                if pending is None:
+                    if label in self._labels:
+                        self._seen.add(label)
+                        return EXISTS, self._labels[label]
+                    self._pending[label] = threading.Event()
+                    return None
+            pending.wait()
+
+    def _release(self, label, entity_id=None):
+        """
+        Release a label reserved by L{_reserve}, entity_id is None if the
+        entity couldn't be created.
+        """
+        with self._lock:
+            pending = self._pending.pop(label)
+            if entity_id is not None:
+                self._labels[label] = entity_id
+                self._seen.add(label)
+        pending.set()
+
+    def _create(self, row):
+        delay = self.backoff
+        for attempt in range(self.retries + 1):
+            self.limiter.acquire()
+            try:
+                return self.driver.create_entity(
+                                label=row['label'],
+                                ip_addresses=row.get('ip_addresses') or {},
+                                extra=row.get('metadata') or {})
+            except Exception, e:
+                if not is_over_limit_error(e) or attempt == self.retries:
+                    raise
+
+                # Slow down all the workers, not just this one
+                self.limiter.pause(delay)
+                delay *= 2
+
+    def _import_row(self, item):
+        number, row = item
+        if isinstance(row, InvalidRow) or not row.get('label'):
+            return INVALID, None
+
+        label = row['label']
+        reserved = self._reserve(label)
+        if reserved is not None:
+            return reserved
+
+        try:
+            entity = self._create(row)
+        except:
+            self._release(label)
+            raise
+        self._release(label, entity.id)
+        return CREATED, entity.id
+
+    def run(self, rows, output=None):
+        """
+        Import entities.
+
+        @type rows: C{iterable}
+        @param rows: Entity dicts, e.g. from L{read_rows}.
+
+        @type output: C{file}
+        @param output: File which a JSON line with the result of every row
+                       is written to (in completion order).
+
+        @return: C{dict} with the number of rows for each status.
+        """
+        self._labels = self._index()
+        self._seen = set()
+        self._pending = {}
+        counts = dict([(status, 0) for status in
+                       [CREATED, EXISTS, DUPLICATE, INVALID, FAILED]])
+
+        items = ((number, row) for number, row in enumerate(rows, 1))
+        results = imap_unordered(self._import_row, items, self.max_workers)
+        codec = self.driver.connection.get_json_codec()
+
+        for item, result, error in results:
+            number, row = item
+            if isinstance(row, InvalidRow):
+                record = {'row': number, 'label': None, 'line': row.line,
+                          'error': row.error}
+            else:
+                record = {'row': number, 'label': row.get('label')}
+            if error:
+                record.update({'status': FAILED, 'error': str(error)})
+            else:
+                record.update({'status': result[0], 'id': result[1]})
+
+            counts[record['status']] += 1
+            if output is not None:
+                output.write(codec.dumps(record) + '\n')
+                output.flush()
+
+        return counts
+
+
+def main(argv=None):
+    parser = OptionParser(usage='%prog [options] <file>')
+    parser.add_option('-u', '--username',
+                      default=os.environ.get('RAXMON_USERNAME'))
+    parser.add_option('-k', '--api-key',
+                      default=os.environ.get('RAXMON_API_KEY'))
+    parser.add_option('--auth-url', default=None)
+    parser.add_option('--base-url', default=None)
+    parser.add_option('-f', '--format', default=None,
+                      help='csv or jsonl (default: detect from extension)')
+    parser.add_option('-o', '--output', default=None,
+                      help='results file (default: stdout)')
+    parser.add_option('-p', '--parallel', type='int', default=5,
+                      help='number of concurrent requests')
+    parser.add_option('-r', '--rate', type='float', default=None,
+                      help='maximum number of requests per second')
+    parser.add_option('--json-codec', default=None,
+                      help='JSON codec (default: fastest installed)')
+    options, args = parser.parse_args(argv)
+
+    if len(args) != 1:
+        parser.error('Missing input file')
+    if not options.username or not options.api_key:
+        parser.error('Missing username or API key')
+
+    from rackspace_monitoring.providers import get_driver
+    from rackspace_monitoring.types import Provider
+
+    kwargs = {}
+    if options.auth_url:
+        kwargs['ex_force_auth_url'] = options.auth_url
+    if options.base_url:
+        kwargs['ex_force_base_url'] = options.base_url
+    if options.json_codec:
+        kwargs['ex_json_codec'] = options.json_codec
+
+    driver = get_driver(Provider.RACKSPACE)(options.username,
+                                            options.api_key, **kwargs)
+    importer = EntityImporter(driver, max_workers=options.parallel,
+                              rate=options.rate)
+
+    output = options.output and open(options.output, 'w') or sys.stdout
+    try:
+        rows = read_rows(args[0], options.format,
+                         driver.connection.get_json_codec())
+        counts = importer.run(rows, output)
+    finally:
+        if output is not sys.stdout:
+            output.close()
+
+    sys.stderr.write(', '.join(['%s: %s' % (status, counts[status]) for
+                                status in sorted(counts.keys())]) + '\n')
+    return (counts[FAILED] or counts[INVALID]) and 1 or 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,114 @@
+# Licensed to the Apache Software Foundation (ASF) under one or more
+# contributor license agreements.  See the NOTICE file distributed with
+# this work for additional information regarding copyright ownership.
+# The ASF licenses this file to You under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with
+# the License.  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Pluggable JSON codecs.
+
+The fastest installed codec is picked automatically (see L{PREFERENCE}),
+a specific one can be selected per driver using the C{ex_json_codec}
+argument.
+"""
+
+__all__ = ['JSONCodec', 'PREFERENCE', 'available_codecs', 'get_codec']
+
+# Fastest first. cjson mishandles escaped slashes and unicode escapes when
+# decoding so it's only used if it's selected explicitly.
+PREFERENCE = ['ujson', 'simplejson', 'json', 'cjson']
+
+
+class JSONCodec(object):
+    """
+    A JSON codec. Custom codecs only need to provide name, loads and dumps.
+    """
+
+    def __init__(self, name, loads, dumps):
+        self.name = name
+        self.loads = loads
+        self.dumps = dumps
+
+    def __repr__(self):
+        return '<JSONCodec: name=%s>' % (self.name)
+
+
+def _load_ujson():
+    import ujson
+    return JSONCodec('ujson', ujson.loads, ujson.dumps)
+
+
+def _load_cjson():
+    import cjson
+    return JSONCodec('cjson', cjson.decode, cjson.encode)
+
+
+def _load_simplejson():
+    import simplejson
+    return JSONCodec('simplejson', simplejson.loads, simplejson.dumps)
+
+
+def _load_json():
+    import json
+    return JSONCodec('json', json.loads, json.dumps)
+
+
+LOADERS = {'ujson': _load_ujson, 'cjson': _load_cjson,
+           'simplejson': _load_simplejson, 'json': _load_json}
+
+_codecs = {}
+
+
+def _load(name):
+    if name not in _codecs:
+        try:
+            _codecs[name] = LOADERS[name]()
+        except ImportError:
+            _codecs[name] = None
+    return _codecs[name]
+
+
+def available_codecs():
+    """
+    Return names of the installed codecs, fastest first. Note that this
+    imports every codec, L{get_codec} stops at the first one installed.
+    """
+    return [name for name in PREFERENCE if _load(name) is not None]
+
+
+def get_codec(codec=None):
+    """
+    Return a codec.
+
+    @type codec: C{str} or L{JSONCodec}
+    @param codec: Codec name, codec instance or None for the fastest
+                  installed codec.
+
+    @rtype: L{JSONCodec}
+    """
+    if isinstance(codec, JSONCodec):
+        return codec
+
+    if codec is None:
+        for name in PREFERENCE:
+            result = _load(name)
+            if result is not None:
+                return result
+
+    if codec not in LOADERS:
+        raise ValueError('Unknown JSON codec: %s (valid: %s)' %
+                         (codec, ', '.join(PREFERENCE)))
+
+    result = _load(codec)
+    if result is None:
+        raise ValueError('JSON codec %s is not installed' % (codec))
+    return result
@@ -0,0 +1,265 @@
+# Licensed to the Apache Software Foundation (ASF) under one or more
+# contributor license agreements.  See the NOTICE file distributed with
+# this work for additional information regarding copyright ownership.
+# The ASF licenses this file to You under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with
+# the License.  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Runs list and get operations across many accounts (tenants and regions)
+concurrently.
+"""
+
+from __future__ import with_statement
+
+import Queue
+import threading
+
+from rackspace_monitoring.utils import imap_unordered
+
+__all__ = ['MultiAccountDriver', 'MultiAccountResult', 'MergedStream']
+
+
+class MultiAccountResult(object):
+    """
+    Result of an operation run on every account.
+
+    C{results} maps account names to return values and C{errors} maps the
+    names of the accounts where the operation failed to the exception.
+    """
+
+    def __init__(self):
+        self.results = {}
+        self.errors = {}
+
+    def items(self):
+        """
+        Return (account name, item) tuples of all the results which are
+        lists, e.g. the results of list methods.
+        """
+        merged = []
+        for name in sorted(self.results.keys()):
+            merged.extend([(name, item) for item in self.results[name]])
+        return merged
+
+    def __repr__(self):
+        return ('<MultiAccountResult: results=%s, errors=%s>' %
+                (len(self.results), len(self.errors)))
+
+
+class MergedStream(object):
+    """
+    Iterator over the streamed results of all the accounts as (account
+    name, item) tuples in the order they are received.
+
+    A failing account doesn't stop the other ones, its exception is stored
+    in C{errors} (which is complete once the iterator is exhausted).
+    """
+
+    def __init__(self, multi, method, args, kwargs, queue_size=1000):
+        self.errors = {}
+        self._multi = multi
+        self._method = method
+        self._args = args
+        self._kwargs = kwargs
+        self._queue = Queue.Queue(maxsize=queue_size)
+        self._closed = False
+        self._iterator = None
+
+    def _put(self, value):
+        # Give up once the consumer is gone instead of blocking forever on
+        # the bounded queue.
+        while not self._closed:
+            try:
+                self._queue.put(value, timeout=0.1)
+                return True
+            except Queue.Full:
+                pass
+        return False
+
+    def _stream_account(self, name):
+        driver = self._multi.get_driver(name)
+        kwargs = dict(self._kwargs, ex_stream=True)
+        for item in getattr(driver, self._method)(*self._args, **kwargs):
+            if not self._put((name, item)):
+                return
+
+    def _run(self, sentinel):
+        try:
+            for name, _, error in imap_unordered(self._stream_account,
+                                                 self._multi.names,
+                                                 self._multi.max_workers):
+                if error is not None:
+                    self.errors[name] = error
+        finally:
+            self._put(sentinel)
+
+    def _iterate(self):
+        sentinel = object()
+        thread = threading.Thread(target=self._run, args=(sentinel,))
+        thread.daemon = True
+        thread.start()
+
+        try:
+            while True:
+                value = self._queue.get()
+                if value is sentinel:
+                    return
+                yield value
+        finally:
+            self._closed = True
+
+    def __iter__(self):
+        if self._iterator is None:
+            self._iterator = self._iterate()
+        return self._iterator
+
+    def next(self):
+        return iter(self).next()
+
+    def close(self):
+        """
+        Stop the workers if the iterator isn't consumed until the end.
+        """
+        self._closed = True
+
+
+class MultiAccountDriver(object):
+    """
+    Pool of per-account L{RackspaceMonitoringDriver} instances.
+
+    Accounts are named (e.g. C{"acme-ord"}) and drivers are only created,
+    and so only authenticate, when an account is first used. Any driver
+    method can be run on every account with L{ex_map} (returns all the
+    results at once) or L{ex_stream} (merges streamed list results). list_*
+    and get_* methods are also available directly, e.g.
+    C{multi.list_entities()} or C{multi.list_entities(ex_stream=True)}.
+    """
+
+    def __init__(self, accounts=None, max_workers=10):
+        """
+        @type accounts: C{dict}
+        @param accounts: Account name -> driver instance or dict of driver
+                         constructor keyword arguments (C{username},
+                         C{api_key}, C{ex_force_base_url}, ...).
+
+        @type max_workers: C{int}
+        @param max_workers: Maximum number of accounts called concurrently.
+        """
+        self.max_workers = max_workers
+        self._lock = threading.Lock()
+        self._accounts = {}
+        self._drivers = {}
+        self._driver_locks = {}
+
+        for name, value in (accounts or {}).items():
+            if isinstance(value, dict):
+                self.add_account(name, **value)
+            else:
+                self.add_account(name, driver=value)
+
+    @property
+    def names(self):
+        return sorted(self._accounts.keys())
+
+    def add_account(self, name, driver=None, **kwargs):
+        """
+        Add an account, either as a driver instance or as keyword arguments
+        of the driver constructor.
+        """
+        with self._lock:
+            self._accounts[name] = kwargs
+            self._driver_locks[name] = threading.Lock()
+            if driver is not None:
+                self._drivers[name] = driver
+            else:
+                self._drivers.pop(name, None)
+
+    def remove_account(self, name):
+        with self._lock:
+            self._accounts.pop(name, None)
+            self._drivers.pop(name, None)
+            self._driver_locks.pop(name, None)
+
+    def get_driver(self, name):
+        """
+        Return the driver of an account, creating it on first use.
+        """
+        driver = self._drivers.get(name)
+        if driver is not None:
+            return driver
+
+        # Accounts authenticate concurrently, only the same account is
+        # serialized so it doesn't authenticate twice.
+        with self._driver_locks[name]:
+            driver = self._drivers.get(name)
+            if driver is None:
+                from rackspace_monitoring.providers import get_driver
+                from rackspace_monitoring.types import Provider
+
+                kwargs = dict(self._accounts[name])
+                username = kwargs.pop('username')
+                api_key = kwargs.pop('api_key')
+                cls = get_driver(Provider.RACKSPACE)
+                driver = cls(username, api_key, **kwargs)
+                self._drivers[name] = driver
+            return driver
+
+    def ex_map(self, method, *args, **kwargs):
+        """
+        Call a driver method on every account concurrently.
+
+        List results are fully loaded so the requests are made by the worker
+        threads.
+
+        @type method: C{str}
+        @param method: Name of the driver method.
+
+        @rtype: L{MultiAccountResult}
+        """
+        def call(name):
+            result = getattr(self.get_driver(name), method)(*args, **kwargs)
+            if hasattr(result, '__iter__') and not isinstance(result,
+                                                              (dict, list)):
+                result = list(result)
+            return result
+
+        result = MultiAccountResult()
+        for name, value, error in imap_unordered(call, self.names,
+                                                 self.max_workers):
+            if error is not None:
+                result.errors[name] = error
+            else:
+                result.results[name] = value
+        return result
+
+    def ex_stream(self, method, *args, **kwargs):
+        """
+        Call a list method with ex_stream=True on every account concurrently
+        and merge the items as (account name, item) tuples as soon as their
+        pages arrive.
+
+        @rtype: L{MergedStream}
+        """
+        return MergedStream(self, method, args, kwargs)
+
+    def __getattr__(self, name):
+        if not (name.startswith('list_') or name.startswith('get_') or
+                name.startswith('ex_list_') or name == 'ex_views_overview'):
+            raise AttributeError(name)
+
+        def method(*args, **kwargs):
+            if kwargs.pop('ex_stream', False):
+                return self.ex_stream(name, *args, **kwargs)
+            return self.ex_map(name, *args, **kwargs)
+
+        method.__name__ = name
+        return method
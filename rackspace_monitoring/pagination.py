@@ -0,0 +1,317 @@
+# Licensed to the Apache Software Foundation (ASF) under one or more
+# contributor license agreements.  See the NOTICE file distributed with
+# this work for additional information regarding copyright ownership.
+# The ASF licenses this file to You under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with
+# the License.  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Streaming list iterators with resumable checkpoints.
+"""
+
+from __future__ import with_statement
+
+import os
+
+from libcloud.common.types import LazyList
+
+from rackspace_monitoring.json_codecs import get_codec
+
+__all__ = ['ListCheckpoint', 'ListIterator', 'FilteredIterator',
+           'IteratorList', 'FileCheckpointSink']
+
+# value_dict keys which are not part of the checkpoint context
+RESERVED_KEYS = ['url', 'params', 'start_marker', 'list_item_mapper',
+                 'object_mapper']
+
+
+class ListCheckpoint(object):
+    """
+    Position of a list iterator.
+
+    A checkpoint always points to the beginning of a page: C{marker} is the
+    marker of the next page which needs to be fetched and C{items} is the
+    number of items which have been read before that page.
+
+    C{filters} holds the client side filters of a L{FilteredIterator}
+    (C{ids} which haven't been found yet and C{attributes}) so they are
+    applied again when the listing is resumed.
+    """
+
+    def __init__(self, url, params=None, marker=None, items=0,
+                 exhausted=False, mapper=None, context=None, filters=None):
+        self.url = url
+        self.params = params or {}
+        self.marker = marker
+        self.items = items
+        self.exhausted = exhausted
+        self.mapper = mapper
+        self.context = context or {}
+        self.filters = filters
+
+    @classmethod
+    def from_value_dict(cls, value_dict):
+        params = dict(value_dict.get('params', {}))
+        params.pop('marker', None)
+
+        mapper = value_dict.get('list_item_mapper')
+        context = dict([(key, value) for key, value in value_dict.items()
+                        if key not in RESERVED_KEYS])
+
+        return cls(url=value_dict['url'], params=params,
+                   marker=value_dict.get('start_marker'),
+                   mapper=mapper and mapper.__name__, context=context)
+
+    def to_value_dict(self, driver):
+        value_dict = dict(self.context)
+        value_dict.update({'url': self.url, 'params': dict(self.params),
+                           'start_marker': self.marker,
+                           'list_item_mapper': getattr(driver, self.mapper)})
+        return value_dict
+
+    def to_dict(self):
+        return {'url': self.url, 'params': self.params,
+                'marker': self.marker, 'items': self.items,
+                'exhausted': self.exhausted, 'mapper': self.mapper,
+                'context': self.context, 'filters': self.filters}
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(**dict([(str(key), value) for key, value in
+                           data.items()]))
+
+    def __repr__(self):
+        return ('<ListCheckpoint: url=%s, marker=%s, items=%s ...>' %
+                (self.url, self.marker, self.items))
+
+
+class ListIterator(object):
+    """
+    Iterator which yields mapped items page by page without retaining them.
+
+    The current position is available as C{checkpoint} and the number of
+    pages requested so far as C{pages}. If a C{sink} is set, the checkpoint
+    is passed to its C{save} method every time a page has been fully
+    consumed.
+    """
+
+    def __init__(self, get_more, value_dict, checkpoint=None, sink=None):
+        self._get_more = get_more
+        self._value_dict = value_dict
+        self._page = iter(())
+        # (page size, next marker, exhausted) of the page being consumed
+        self._pending = None
+        self.checkpoint = checkpoint or \
+                ListCheckpoint.from_value_dict(value_dict)
+        self.sink = sink
+        self.pages = 0
+        # Called before the checkpoint is moved to the next page
+        self.on_advance = None
+
+    def __iter__(self):
+        return self
+
+    @property
+    def exhausted(self):
+        """
+        True if all the pages have been requested and consumed.
+        """
+        return self._pending is None and self.checkpoint.exhausted
+
+    def _fetch(self):
+        self.pages += 1
+        items, marker, exhausted = self._get_more(
+                                            last_key=self.checkpoint.marker,
+                                            value_dict=self._value_dict)
+        self._page = iter(items)
+        self._pending = (len(items), marker, exhausted)
+
+    def _advance(self):
+        # Checkpoint is only moved once the whole page has been consumed
+        if self.on_advance is not None:
+            self.on_advance()
+
+        checkpoint = self.checkpoint
+        size, checkpoint.marker, checkpoint.exhausted = self._pending
+        checkpoint.items += size
+        self._pending = None
+
+        if self.sink is not None:
+            self.sink.save(checkpoint)
+
+    def next(self):
+        while True:
+            try:
+                return self._page.next()
+            except StopIteration:
+                pass
+
+            if self._pending is not None:
+                self._advance()
+
+            if self.checkpoint.exhausted:
+                raise StopIteration
+
+            self._fetch()
+
+    def next_page(self):
+        """
+        Return the remaining items of the current page (or the items of the
+        next page) as a list without requesting any further page.
+
+        Afterwards C{checkpoint.marker} is the marker of the following page,
+        which can be passed as C{ex_next_marker} to render paginated views.
+        """
+        return self._next_page()
+
+    def _next_page(self, predicate=None):
+        if self._pending is None:
+            if self.checkpoint.exhausted:
+                return []
+            self._fetch()
+
+        items = list(self._page)
+        if predicate is not None:
+            # Called for every item before the checkpoint moves
+            items = [item for item in items if predicate(item)]
+        self._advance()
+        return items
+
+
+class FilteredIterator(object):
+    """
+    Yields items of a list iterator which match a predicate.
+
+    If C{ids} is provided, only items with those ids are yielded and no more
+    pages are requested once all of them have been found. C{attributes}
+    maps attribute names to the values the items must have.
+
+    The ids and attributes are stored in the checkpoint. A C{predicate}
+    can't be stored, it needs to be passed again when resuming.
+    """
+
+    def __init__(self, iterator, predicate=None, ids=None, attributes=None):
+        self._iterator = iterator
+        self._predicate = predicate
+        self._attributes = dict(attributes or {})
+        self._remaining = None
+        if ids is not None:
+            self._remaining = set(ids)
+
+        # Doesn't reference self, a cycle would keep the pages alive until
+        # the garbage collector runs.
+        checkpoint = iterator.checkpoint
+        remaining = self._remaining
+        filters = {}
+        if self._attributes:
+            filters['attributes'] = self._attributes
+        if predicate is not None:
+            filters['predicate'] = True
+
+        def update_checkpoint():
+            checkpoint.filters = dict(filters)
+            if remaining is not None:
+                checkpoint.filters['ids'] = sorted(remaining)
+
+        iterator.on_advance = update_checkpoint
+        update_checkpoint()
+
+    def __iter__(self):
+        return self
+
+    @property
+    def checkpoint(self):
+        return self._iterator.checkpoint
+
+    @property
+    def pages(self):
+        return self._iterator.pages
+
+    @property
+    def exhausted(self):
+        return ((self._remaining is not None and not self._remaining) or
+                self._iterator.exhausted)
+
+    def _accept(self, item):
+        if self._remaining is not None:
+            if item.id not in self._remaining:
+                return False
+            self._remaining.discard(item.id)
+
+        for name, value in self._attributes.items():
+            if getattr(item, name) != value:
+                return False
+
+        return self._predicate is None or self._predicate(item)
+
+    def next(self):
+        while True:
+            if self._remaining is not None and not self._remaining:
+                raise StopIteration
+
+            item = self._iterator.next()
+            if self._accept(item):
+                return item
+
+    def next_page(self):
+        """
+        Return the matching items of the current (or next) page of the
+        wrapped iterator, see L{ListIterator.next_page}.
+        """
+        if self._remaining is not None and not self._remaining:
+            return []
+        return self._iterator._next_page(self._accept)
+
+
+class IteratorList(LazyList):
+    """
+    C{LazyList} which reads its pages from a list iterator. Pages aren't
+    requested until the list is first used and the position of the
+    iterator is available as C{checkpoint}.
+    """
+
+    def __init__(self, iterator):
+        def get_more(last_key, value_dict):
+            items = iterator.next_page()
+            return items, None, iterator.exhausted
+
+        super(IteratorList, self).__init__(get_more=get_more)
+        self._iterator = iterator
+
+    @property
+    def checkpoint(self):
+        return self._iterator.checkpoint
+
+
+class FileCheckpointSink(object):
+    """
+    Stores the latest checkpoint as JSON in a file.
+    """
+
+    def __init__(self, path, codec=None):
+        self.path = path
+        self.codec = get_codec(codec)
+
+    def save(self, checkpoint):
+        tmp_path = '%s.tmp' % (self.path)
+        with open(tmp_path, 'w') as fp:
+            fp.write(self.codec.dumps(checkpoint.to_dict()))
+        os.rename(tmp_path, self.path)
+
+    def load(self):
+        """
+        Return the stored checkpoint or None if there is no checkpoint.
+        """
+        if not os.path.exists(self.path):
+            return None
+
+        with open(self.path, 'r') as fp:
+            return ListCheckpoint.from_dict(self.codec.loads(fp.read()))
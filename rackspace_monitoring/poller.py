@@ -0,0 +1,275 @@
+# Licensed to the Apache Software Foundation (ASF) under one or more
+# contributor license agreements.  See the NOTICE file distributed with
+# this work for additional information regarding copyright ownership.
+# The ASF licenses this file to You under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with
+# the License.  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Watches alarm states and notifies subscribers of state transitions.
+
+Instead of downloading the overview of every entity on a fixed interval,
+the poller reads the alarm changelog (a single request for the whole
+account) on every tick and only re-reads the overview of entities which are
+due. Entities which changed recently are due often, the interval of an
+entity grows while it doesn't change until it reaches C{max_interval}.
+"""
+
+from __future__ import with_statement
+
+import time
+import threading
+
+from rackspace_monitoring.utils import ChangelogCursor
+
+__all__ = ['AlarmStatePoller', 'StateTransition']
+
+CHANGELOG = 'changelog'
+OVERVIEW = 'overview'
+
+
+def _to_seconds(timestamp):
+    # The API returns timestamps in milliseconds
+    if timestamp is None:
+        return None
+    return timestamp / 1000.0
+
+
+class StateTransition(object):
+    def __init__(self, entity_id, check_id, alarm_id, previous_state, state,
+                 timestamp, source):
+        self.entity_id = entity_id
+        self.check_id = check_id
+        self.alarm_id = alarm_id
+        self.previous_state = previous_state
+        self.state = state
+        self.timestamp = timestamp
+        # CHANGELOG or OVERVIEW
+        self.source = source
+
+    def __repr__(self):
+        return ('<StateTransition: entity_id=%s, alarm_id=%s, %s -> %s>' %
+                (self.entity_id, self.alarm_id, self.previous_state,
+                 self.state))
+
+
+class _EntitySchedule(object):
+    __slots__ = ['interval', 'due', 'last_change']
+
+    def __init__(self, interval, due, last_change=None):
+        self.interval = interval
+        self.due = due
+        self.last_change = last_change
+
+
+class AlarmStatePoller(object):
+    """
+    Adaptive alarm state poller.
+
+    On every tick (C{poll_once}):
+
+        1. New alarm changelog entries are read and their transitions are
+           emitted right away. Their entities become hot.
+        2. Entities which are due are re-read with C{ex_views_overview}
+           limited to those entities, in batches, to pick up anything the
+           changelog missed.
+
+    After a change the interval of an entity is C{min_interval}. It's
+    multiplied by C{backoff} every time the entity is read without a change
+    until it reaches C{max_interval}.
+    """
+
+    def __init__(self, driver, min_interval=10, max_interval=900,
+                 backoff=2.0, batch_size=100, clock=time.time):
+        """
+        @type min_interval: C{float}
+        @param min_interval: Seconds between ticks and the interval of
+                             entities which have just changed.
+
+        @type max_interval: C{float}
+        @param max_interval: Longest interval between two overview reads of
+                             an entity which doesn't change.
+
+        @type batch_size: C{int}
+        @param batch_size: Maximum number of entities per overview request.
+        """
+        self.driver = driver
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.backoff = backoff
+        self.batch_size = batch_size
+        self.clock = clock
+
+        self._lock = threading.Lock()
+        self._subscribers = []
+        # (entity id, alarm id) -> (check id, state)
+        self._states = {}
+        # entity id -> _EntitySchedule
+        self._schedule = {}
+        # Start of the next changelog request in milliseconds and the ids of
+        # the entries with that timestamp which have already been seen.
+        self._changelog = ChangelogCursor()
+        self._initialized = False
+
+        # Number of API requests (pages) made, by kind
+        self.requests = {CHANGELOG: 0, OVERVIEW: 0}
+
+    def subscribe(self, callback):
+        """
+        Register a function which is called with every L{StateTransition}.
+        """
+        with self._lock:
+            self._subscribers.append(callback)
+
+    def unsubscribe(self, callback):
+        with self._lock:
+            self._subscribers.remove(callback)
+
+    def _emit(self, transition):
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for callback in subscribers:
+            callback(transition)
+
+    def _update_state(self, entity_id, check_id, alarm_id, state, timestamp,
+                      source):
+        key = (entity_id, alarm_id)
+        previous = self._states.get(key)
+        self._states[key] = (check_id, state)
+
+        if previous is None:
+            # The first time an alarm is seen there's nothing to compare to,
+            # but an entry in the changelog still means the entity changed
+            return source == CHANGELOG
+        if previous[1] == state:
+            return False
+
+        self._emit(StateTransition(entity_id=entity_id, check_id=check_id,
+                                   alarm_id=alarm_id,
+                                   previous_state=previous[1], state=state,
+                                   timestamp=timestamp, source=source))
+        return True
+
+    def _reschedule(self, entity_id, now, changed, last_change=None):
+        schedule = self._schedule.get(entity_id)
+        if schedule is None:
+            interval = self.max_interval
+            if last_change is not None:
+                # Entities which changed recently start hot
+                interval = (now - last_change) / self.backoff
+            schedule = _EntitySchedule(interval, now, last_change)
+            self._schedule[entity_id] = schedule
+        elif changed:
+            schedule.interval = self.min_interval
+            schedule.last_change = now
+        else:
+            schedule.interval *= self.backoff
+
+        schedule.interval = max(self.min_interval,
+                                min(self.max_interval, schedule.interval))
+        schedule.due = now + schedule.interval
+
+    def _process_overview(self, item, now):
+        entity_id = item['entity'].id
+        changed = False
+        last_change = None
+        for state in item['latest_alarm_states']:
+            timestamp = _to_seconds(state.timestamp)
+            if timestamp is not None:
+                last_change = max(last_change, timestamp)
+            changed = self._update_state(entity_id, state.check_id,
+                                         state.alarm_id, state.state,
+                                         state.timestamp, OVERVIEW) or changed
+
+        self._reschedule(entity_id, now, changed, last_change)
+
+    def _read_overview(self, now, entity_ids=None):
+        seen = set()
+        stream = self.driver.ex_views_overview(ex_stream=True,
+                                               ex_entity_ids=entity_ids)
+        try:
+            for item in stream:
+                self._process_overview(item, now)
+                seen.add(item['entity'].id)
+        finally:
+            self.requests[OVERVIEW] += stream.pages
+
+        # Entities which have been deleted
+        for entity_id in set(entity_ids or []) - seen:
+            self._forget(entity_id)
+
+    def _forget(self, entity_id):
+        self._schedule.pop(entity_id, None)
+        for key in [key for key in self._states if key[0] == entity_id]:
+            del self._states[key]
+
+    def _read_changelog(self, now):
+        stream = self.driver.list_alarm_changelog(
+                                            ex_stream=True,
+                                            ex_from=self._changelog.start)
+        try:
+            for change in self._changelog.filter(stream):
+                changed = self._update_state(change.entity_id,
+                                             change.check_id, change.alarm_id,
+                                             change.state, change.timestamp,
+                                             CHANGELOG)
+                if change.entity_id in self._schedule:
+                    if changed:
+                        self._reschedule(change.entity_id, now, True)
+                else:
+                    # New entity, read its overview on this tick
+                    self._schedule[change.entity_id] = _EntitySchedule(
+                                                        self.min_interval, now)
+        finally:
+            self.requests[CHANGELOG] += stream.pages
+
+    def due_entities(self, now=None):
+        if now is None:
+            now = self.clock()
+        return sorted([entity_id for entity_id, schedule in
+                       self._schedule.items() if schedule.due <= now])
+
+    def poll_once(self):
+        """
+        Run a single tick and return the number of requests it made.
+        """
+        now = self.clock()
+        before = sum(self.requests.values())
+
+        if not self._initialized:
+            # Start the changelog now so only new changes are read, then
+            # read the full overview once to learn the current states.
+            self._changelog.start = int(now * 1000)
+            self._read_overview(now)
+            self._initialized = True
+            return sum(self.requests.values()) - before
+
+        self._read_changelog(now)
+
+        due = self.due_entities(now)
+        for i in range(0, len(due), self.batch_size):
+            self._read_overview(now, due[i:i + self.batch_size])
+
+        return sum(self.requests.values()) - before
+
+    def run(self, stop_event=None):
+        """
+        Poll every C{min_interval} seconds until C{stop_event} (a
+        C{threading.Event}) is set.
+        """
+        stop_event = stop_event or threading.Event()
+        while not stop_event.isSet():
+            self.poll_once()
+            stop_event.wait(self.min_interval)
+
+    def get_state(self, entity_id, alarm_id):
+        value = self._states.get((entity_id, alarm_id))
+        return value and value[1] or None
@@ -13,7 +13,6 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
-from libcloud.utils.misc import get_driver as get_provider_driver
 from rackspace_monitoring.types import Provider
 
 DRIVERS = {
@@ -24,4 +23,7 @@ DRIVERS = {
 
 
 def get_driver(provider):
+    # Driver modules (and libcloud) are only imported when a driver is
+    # requested.
+    from libcloud.utils.misc import get_driver as get_provider_driver
     return get_provider_driver(DRIVERS, provider)
@@ -0,0 +1,344 @@
+# Licensed to the Apache Software Foundation (ASF) under one or more
+# contributor license agreements.  See the NOTICE file distributed with
+# this work for additional information regarding copyright ownership.
+# The ASF licenses this file to You under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with
+# the License.  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Rolls out a check and an alarm to every entity matching a selector.
+
+Progress is written to an append-only journal so an interrupted rollout can
+be started again with the same journal and only does the remaining work.
+"""
+
+from __future__ import with_statement
+
+import os
+import time
+import fnmatch
+import hashlib
+import threading
+
+from rackspace_monitoring.json_codecs import get_codec
+from rackspace_monitoring.utils import imap_unordered
+
+__all__ = ['EntitySelector', 'RolloutTemplate', 'RolloutJournal', 'Rollout',
+           'RolloutReport']
+
+CHECK_CREATED = 'check_created'
+ALARM_CREATED = 'alarm_created'
+SKIPPED = 'skipped'
+FAILED = 'failed'
+STARTED = 'started'
+
+# Entities with one of these events in the journal are not processed again
+DONE_EVENTS = [ALARM_CREATED, SKIPPED]
+
+
+class EntitySelector(object):
+    """
+    Selects entities by label, metadata and IP address aliases. All the
+    provided conditions need to match.
+    """
+
+    def __init__(self, labels=None, metadata=None, ip_aliases=None):
+        """
+        @type labels: C{list}
+        @param labels: Shell style label patterns (e.g. C{web-*}), at least
+                       one needs to match.
+
+        @type metadata: C{dict}
+        @param metadata: Values which need to be present in C{Entity.extra}.
+
+        @type ip_aliases: C{list}
+        @param ip_aliases: IP address aliases the entity needs to have.
+        """
+        self.labels = labels
+        self.metadata = metadata or {}
+        self.ip_aliases = ip_aliases or []
+
+    def matches(self, entity):
+        if self.labels is not None:
+            label = entity.label or ''
+            if not [pattern for pattern in self.labels if
+                    fnmatch.fnmatchcase(label, pattern)]:
+                return False
+
+        extra = entity.extra or {}
+        for key, value in self.metadata.items():
+            if extra.get(key) != value:
+                return False
+
+        ip_addresses = entity.ip_addresses or []
+        if isinstance(ip_addresses, dict):
+            aliases = ip_addresses.keys()
+        else:
+            aliases = [item[0] for item in ip_addresses]
+
+        for alias in self.ip_aliases:
+            if alias not in aliases:
+                return False
+
+        return True
+
+
+class RolloutTemplate(object):
+    """
+    Check and alarm which are created on every entity.
+    """
+
+    def __init__(self, check, alarm):
+        """
+        @type check: C{dict}
+        @param check: C{create_check} keyword arguments.
+
+        @type alarm: C{dict}
+        @param alarm: C{create_alarm} keyword arguments, C{check_id} and
+                      C{check_type} are filled in.
+        """
+        self.check = check
+        self.alarm = alarm
+
+    @property
+    def fingerprint(self):
+        # Always the standard library codec, the fingerprint is stored in
+        # the journal and must not depend on the installed codecs.
+        data = get_codec('json').dumps({'check': self.check,
+                                        'alarm': self.alarm}, sort_keys=True)
+        return hashlib.sha1(data).hexdigest()
+
+    def is_equivalent_check(self, check):
+        """
+        Return True if an existing check does the same as the template, i.e.
+        it has the same type and target and its details contain the
+        template details.
+        """
+        if check.type != self.check.get('type'):
+            return False
+
+        for name in ['target_alias', 'target_resolver']:
+            value = self.check.get(name)
+            if value is not None and getattr(check, name, None) != value:
+                return False
+
+        details = check.details or {}
+        for key, value in (self.check.get('details') or {}).items():
+            if details.get(key) != value:
+                return False
+
+        return True
+
+    def is_equivalent_alarm(self, alarm, check_id):
+        return (alarm.check_id == check_id and
+                alarm.criteria == self.alarm.get('criteria') and
+                alarm.notification_plan_id ==
+                self.alarm.get('notification_plan_id'))
+
+
+class RolloutJournal(object):
+    """
+    Append-only JSON lines file with the progress of a rollout.
+    """
+
+    def __init__(self, path, fsync=False, codec=None):
+        self.path = path
+        self.fsync = fsync
+        self.codec = get_codec(codec)
+        self._lock = threading.Lock()
+        self._fp = None
+        # entity id -> last event
+        self.entities = {}
+        self.fingerprint = None
+
+        if os.path.exists(path):
+            self._load()
+
+    def _load(self):
+        with open(self.path, 'r') as fp:
+            for line in fp:
+                try:
+                    record = self.codec.loads(line)
+                except ValueError:
+                    # Partially written last line of an interrupted rollout
+                    continue
+
+                if record['event'] == STARTED:
+                    self.fingerprint = record['fingerprint']
+                else:
+                    self._apply(record)
+
+    def _apply(self, record):
+        # A failure after the check has been created keeps its id so the
+        # check is reused when the rollout is resumed.
+        previous = self.entities.get(record['entity_id'], {})
+        if previous.get('check_id') and 'check_id' not in record:
+            record = dict(record, check_id=previous['check_id'])
+        self.entities[record['entity_id']] = record
+
+    def write(self, event, **values):
+        record = dict(values, event=event, timestamp=int(time.time()))
+        line = self.codec.dumps(record) + '\n'
+
+        with self._lock:
+            if self._fp is None:
+                self._fp = open(self.path, 'a+')
+                self._terminate_last_line()
+            self._fp.write(line)
+            self._fp.flush()
+            if self.fsync:
+                os.fsync(self._fp.fileno())
+
+            if event != STARTED:
+                self._apply(record)
+
+    def _terminate_last_line(self):
+        # Don't append to a line which has only been partially written
+        # before the previous rollout was interrupted.
+        self._fp.seek(0, os.SEEK_END)
+        if self._fp.tell() == 0:
+            return
+
+        self._fp.seek(-1, os.SEEK_END)
+        if self._fp.read(1) != '\n':
+            self._fp.seek(0, os.SEEK_END)
+            self._fp.write('\n')
+
+    def is_done(self, entity_id):
+        record = self.entities.get(entity_id)
+        return record is not None and record['event'] in DONE_EVENTS
+
+    def check_id(self, entity_id):
+        """
+        Return id of the check which has already been created for an entity.
+        """
+        record = self.entities.get(entity_id)
+        return record and record.get('check_id') or None
+
+    def close(self):
+        with self._lock:
+            if self._fp is not None:
+                self._fp.close()
+                self._fp = None
+
+
+class RolloutReport(object):
+    def __init__(self):
+        self.created = []
+        self.skipped = []
+        self.already_done = 0
+        self.failed = []
+
+    def __repr__(self):
+        return ('<RolloutReport: created=%s, skipped=%s, already_done=%s, '
+                'failed=%s>' % (len(self.created), len(self.skipped),
+                                self.already_done, len(self.failed)))
+
+
+class Rollout(object):
+    """
+    Creates the check and the alarm of a template on all the selected
+    entities over a pool of threads.
+
+    Entities and their existing checks and alarms are read from
+    C{ex_views_overview} so finding equivalent checks doesn't need a request
+    per entity.
+    """
+
+    def __init__(self, driver, template, selector, journal, max_workers=10):
+        self.driver = driver
+        self.template = template
+        self.selector = selector
+        self.journal = journal
+        self.max_workers = max_workers
+
+    def _targets(self, report, errors):
+        try:
+            for item in self.driver.ex_views_overview(ex_stream=True):
+                entity = item['entity']
+                if not self.selector.matches(entity):
+                    continue
+
+                if self.journal.is_done(entity.id):
+                    report.already_done += 1
+                    continue
+
+                yield item
+        except Exception, e:
+            errors.append(e)
+
+    def _process(self, item):
+        entity = item['entity']
+        template = self.template
+
+        check_id = self.journal.check_id(entity.id)
+        if check_id is None:
+            for check in item['checks']:
+                if template.is_equivalent_check(check):
+                    check_id = check.id
+                    break
+
+        if check_id is not None:
+            for alarm in item['alarms']:
+                if template.is_equivalent_alarm(alarm, check_id):
+                    self.journal.write(SKIPPED, entity_id=entity.id,
+                                       check_id=check_id, alarm_id=alarm.id)
+                    return SKIPPED, check_id, alarm.id
+        else:
+            check = self.driver.create_check(entity=entity, **template.check)
+            check_id = check.id
+            self.journal.write(CHECK_CREATED, entity_id=entity.id,
+                               check_id=check_id)
+
+        kwargs = dict(template.alarm, check_id=check_id,
+                      check_type=template.check.get('type'))
+        alarm = self.driver.create_alarm(entity=entity, **kwargs)
+        self.journal.write(ALARM_CREATED, entity_id=entity.id,
+                           check_id=check_id, alarm_id=alarm.id)
+        return ALARM_CREATED, check_id, alarm.id
+
+    def run(self):
+        """
+        Run (or resume) the rollout.
+
+        @rtype: L{RolloutReport}
+        """
+        fingerprint = self.template.fingerprint
+        if self.journal.fingerprint is None:
+            self.journal.write(STARTED, fingerprint=fingerprint)
+            self.journal.fingerprint = fingerprint
+        elif self.journal.fingerprint != fingerprint:
+            raise ValueError('Journal %s belongs to a different template' %
+                             (self.journal.path))
+
+        report = RolloutReport()
+        errors = []
+        targets = self._targets(report, errors)
+
+        for item, result, error in imap_unordered(self._process, targets,
+                                                  self.max_workers):
+            entity_id = item['entity'].id
+            if error:
+                self.journal.write(FAILED, entity_id=entity_id,
+                                   error=str(error))
+                report.failed.append((entity_id, error))
+                continue
+
+            event, check_id, alarm_id = result
+            if event == SKIPPED:
+                report.skipped.append(entity_id)
+            else:
+                report.created.append((entity_id, check_id, alarm_id))
+
+        if errors:
+            raise errors[0]
+
+        return report
@@ -0,0 +1,215 @@
+# Licensed to the Apache Software Foundation (ASF) under one or more
+# contributor license agreements.  See the NOTICE file distributed with
+# this work for additional information regarding copyright ownership.
+# The ASF licenses this file to You under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with
+# the License.  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Schedules API requests of different priority classes under a single
+concurrency and rate budget.
+"""
+
+from __future__ import with_statement
+
+import time
+import threading
+
+__all__ = ['RequestScheduler', 'PriorityClass', 'INTERACTIVE', 'DEFAULT',
+           'BACKGROUND']
+
+INTERACTIVE = 'interactive'
+DEFAULT = 'default'
+BACKGROUND = 'background'
+
+
+class PriorityClass(object):
+    def __init__(self, name, weight=1, max_concurrency=None):
+        """
+        @type weight: C{float}
+        @param weight: Share of the requests granted to this class while
+                       other classes are waiting too.
+
+        @type max_concurrency: C{int}
+        @param max_concurrency: Maximum number of requests of this class
+                                running at the same time.
+        """
+        self.name = name
+        self.weight = weight
+        self.max_concurrency = max_concurrency
+
+        self.queue = []
+        self.active = 0
+        self.granted = 0
+        # Virtual time, advanced by 1 / weight for every granted request
+        self.vtime = 0.0
+
+    def is_eligible(self):
+        return bool(self.queue) and (self.max_concurrency is None or
+                                     self.active < self.max_concurrency)
+
+    def __repr__(self):
+        return ('<PriorityClass: name=%s, weight=%s, active=%s, waiting=%s>' %
+                (self.name, self.weight, self.active, len(self.queue)))
+
+
+class _Ticket(object):
+    __slots__ = ['priority_class', 'granted', 'queued_at', 'granted_at']
+
+    def __init__(self, priority_class):
+        self.priority_class = priority_class
+        self.granted = False
+        self.queued_at = time.time()
+        self.granted_at = None
+
+
+class RequestScheduler(object):
+    """
+    Weighted fair queuing of requests between priority classes.
+
+    At most C{max_concurrency} requests run at a time (and at most C{rate}
+    start per second). When a slot is free, the waiting class with the
+    lowest virtual time is served, i.e. classes get slots in proportion to
+    their weights and a class which has been idle doesn't accumulate
+    credit. With the default classes background requests never use more
+    than half of the slots, so during a bulk scan interactive requests
+    usually start right away and otherwise get the next free slot.
+
+    A scheduler can be shared by several drivers using the same account.
+    """
+
+    def __init__(self, max_concurrency=8, rate=None, classes=None,
+                 default_class=DEFAULT):
+        """
+        @type rate: C{float}
+        @param rate: Maximum number of requests started per second.
+
+        @type classes: C{list}
+        @param classes: L{PriorityClass} instances. Defaults to interactive
+                        (weight 16), default (weight 4) and background
+                        (weight 1, at most half of the slots).
+        """
+        if classes is None:
+            classes = [PriorityClass(INTERACTIVE, weight=16),
+                       PriorityClass(DEFAULT, weight=4),
+                       PriorityClass(BACKGROUND, weight=1,
+                                     max_concurrency=max(1,
+                                                     max_concurrency / 2))]
+
+        self.max_concurrency = max_concurrency
+        self.rate = rate
+        self.default_class = default_class
+        self.classes = dict([(item.name, item) for item in classes])
+        if default_class not in self.classes:
+            raise ValueError('Unknown default class: %s' % (default_class))
+
+        self._cond = threading.Condition()
+        self._active = 0
+        self._vtime = 0.0
+        self._next_start = 0.0
+
+    def _get_class(self, name):
+        try:
+            return self.classes[name or self.default_class]
+        except KeyError:
+            raise ValueError('Unknown priority class: %s' % (name))
+
+    def _grant(self):
+        """
+        Grant free slots to waiting requests. Return the number of seconds
+        until the rate allows the next request, or None.
+        """
+        while self._active < self.max_concurrency:
+            eligible = [item for item in self.classes.values()
+                        if item.is_eligible()]
+            if not eligible:
+                return None
+
+            now = time.time()
+            if self.rate and now < self._next_start:
+                return self._next_start - now
+
+            priority_class = min(eligible, key=lambda item: (item.vtime,
+                                                              -item.weight))
+            ticket = priority_class.queue.pop(0)
+            ticket.granted = True
+            ticket.granted_at = now
+
+            priority_class.active += 1
+            priority_class.granted += 1
+            priority_class.vtime += 1.0 / priority_class.weight
+            self._active += 1
+            self._update_vtime()
+            if self.rate:
+                self._next_start = max(self._next_start, now) + \
+                                   1.0 / self.rate
+            self._cond.notifyAll()
+        return None
+
+    def _update_vtime(self):
+        # The virtual time of the system is the lowest virtual time of the
+        # classes which have waiting or running requests. It only changes
+        # while some class is busy.
+        busy = [item.vtime for item in self.classes.values()
+                if item.queue or item.active]
+        if busy:
+            self._vtime = min(busy)
+
+    def acquire(self, name=None):
+        """
+        Block until a request of the priority class may start.
+
+        @return: Ticket which needs to be passed to L{release}.
+        """
+        priority_class = self._get_class(name)
+        ticket = _Ticket(priority_class)
+
+        with self._cond:
+            if not priority_class.queue and not priority_class.active:
+                # An idle class starts at the current virtual time instead
+                # of using the credit it accumulated while idle.
+                self._update_vtime()
+                priority_class.vtime = max(priority_class.vtime, self._vtime)
+            priority_class.queue.append(ticket)
+
+            try:
+                while True:
+                    timeout = self._grant()
+                    if ticket.granted:
+                        return ticket
+                    self._cond.wait(timeout)
+            except:
+                # E.g. KeyboardInterrupt while waiting, the slot may have
+                # been granted in the meantime.
+                if ticket.granted:
+                    self.release(ticket)
+                else:
+                    priority_class.queue.remove(ticket)
+                raise
+
+    def release(self, ticket):
+        with self._cond:
+            ticket.priority_class.active -= 1
+            self._active -= 1
+            self._update_vtime()
+            self._grant()
+            self._cond.notifyAll()
+
+    def stats(self):
+        """
+        Return the number of active, waiting and granted requests of every
+        class.
+        """
+        with self._cond:
+            return dict([(name, {'active': item.active,
+                                 'waiting': len(item.queue),
+                                 'granted': item.granted})
+                         for name, item in self.classes.items()])
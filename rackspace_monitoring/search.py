@@ -0,0 +1,343 @@
+# Licensed to the Apache Software Foundation (ASF) under one or more
+# contributor license agreements.  See the NOTICE file distributed with
+# this work for additional information regarding copyright ownership.
+# The ASF licenses this file to You under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with
+# the License.  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Local search over entity and check labels, IP addresses, metadata, target
+aliases and check details.
+
+Each indexed value and each word in it is a token in an inverted index.
+Prefix queries are answered with a binary search over the sorted
+vocabulary, substring queries with a scan over the vocabulary, so query time
+depends on the number of distinct tokens and not on the number of objects.
+"""
+
+from __future__ import with_statement
+
+import re
+import threading
+from bisect import bisect_left
+
+from rackspace_monitoring.base import Entity, Check
+
+__all__ = ['SearchIndex']
+
+SEPARATOR = u'\x00'
+WORD_SPLIT_RE = re.compile(r'[^\w]+', re.UNICODE)
+
+# Attributes which are replaced when the index is rebuilt
+STATE = ['_documents', '_slots', '_children', '_postings', '_vocabulary',
+         '_added', '_removed', '_next_slot', '_blob']
+
+# Above this number of pending vocabulary changes, the vocabulary is sorted
+# again instead of inserting each token.
+RESORT_THRESHOLD = 1000
+
+
+def _to_unicode(value):
+    if isinstance(value, unicode):
+        return value
+    if isinstance(value, str):
+        return value.decode('utf-8', 'replace')
+    return unicode(value)
+
+
+def _flatten(value):
+    """
+    Return a list of the scalar values in nested dicts, lists and tuples.
+    """
+    if value is None or isinstance(value, bool):
+        return []
+    if isinstance(value, dict):
+        value = value.values()
+    if isinstance(value, (list, tuple)):
+        result = []
+        for item in value:
+            result.extend(_flatten(item))
+        return result
+    return [value]
+
+
+def _entity_values(entity):
+    ip_addresses = entity.ip_addresses or []
+    if isinstance(ip_addresses, dict):
+        ip_addresses = ip_addresses.values()
+    else:
+        # List of (alias, ip address) tuples
+        ip_addresses = [item[1] if isinstance(item, (list, tuple)) else item
+                        for item in ip_addresses]
+
+    return ([entity.label] + _flatten(ip_addresses) +
+            _flatten(entity.extra))
+
+
+def _check_values(check):
+    return [check.label, check.target_alias] + _flatten(check.details)
+
+
+class SearchIndex(object):
+    """
+    In-memory inverted index of entities and checks.
+
+    Objects are identified by their type, entity id and id so adding an
+    object which has already been indexed replaces the old version.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.clear()
+
+    def clear(self):
+        with self._lock:
+            # slot -> (object, tokens, kind)
+            self._documents = {}
+            # (kind, entity id, id) -> slot
+            self._slots = {}
+            # entity id -> keys of its indexed checks
+            self._children = {}
+            # token -> set of slots
+            self._postings = {}
+            # Sorted tokens and the changes which haven't been applied yet
+            self._vocabulary = []
+            self._added = set()
+            self._removed = set()
+            self._next_slot = 0
+            self._blob = None
+
+    def __len__(self):
+        return len(self._documents)
+
+    def _key(self, obj):
+        if isinstance(obj, Check):
+            return ('check', obj.entity_id, obj.id)
+        elif isinstance(obj, Entity):
+            return ('entity', None, obj.id)
+
+        raise ValueError('Only Entity and Check objects can be indexed')
+
+    def _tokens(self, obj):
+        if isinstance(obj, Check):
+            values = _check_values(obj)
+        else:
+            values = _entity_values(obj)
+
+        tokens = set()
+        for value in values:
+            if value is None:
+                continue
+
+            value = _to_unicode(value).lower().replace(SEPARATOR, u'')
+            if not value:
+                continue
+
+            tokens.add(value)
+            tokens.update([word for word in WORD_SPLIT_RE.split(value)
+                           if word])
+        return tokens
+
+    def _add(self, key, obj):
+        self._remove(key)
+
+        slot = self._next_slot
+        self._next_slot += 1
+        tokens = self._tokens(obj)
+
+        for token in tokens:
+            slots = self._postings.get(token)
+            if slots is None:
+                slots = self._postings[token] = set()
+                if token in self._removed:
+                    self._removed.discard(token)
+                else:
+                    self._added.add(token)
+            slots.add(slot)
+
+        self._documents[slot] = (obj, tokens, key[0])
+        self._slots[key] = slot
+
+        if key[0] == 'check':
+            self._children.setdefault(key[1], set()).add(key)
+
+    def _remove(self, key):
+        slot = self._slots.pop(key, None)
+        if slot is None:
+            return
+
+        tokens = self._documents.pop(slot)[1]
+        for token in tokens:
+            slots = self._postings[token]
+            slots.discard(slot)
+            if not slots:
+                del self._postings[token]
+                if token in self._added:
+                    self._added.discard(token)
+                else:
+                    self._removed.add(token)
+
+        if key[0] == 'check':
+            children = self._children.get(key[1])
+            if children is not None:
+                children.discard(key)
+                if not children:
+                    del self._children[key[1]]
+
+    def add(self, obj):
+        """
+        Index an Entity or a Check, replacing a previously indexed version.
+        """
+        key = self._key(obj)
+        with self._lock:
+            self._add(key, obj)
+
+    def add_many(self, objects):
+        """
+        Index all the objects from an iterable (e.g. the result of
+        C{list_entities} or C{list_checks}).
+        """
+        for obj in objects:
+            self.add(obj)
+
+    def remove(self, obj):
+        """
+        Remove an object from the index. Removing an entity also removes its
+        checks.
+        """
+        key = self._key(obj)
+        with self._lock:
+            self._remove(key)
+            if key[0] == 'entity':
+                for child in list(self._children.get(obj.id, [])):
+                    self._remove(child)
+
+    def add_overview(self, items):
+        """
+        Index entities and checks from C{ex_views_overview} items. Checks
+        of these entities which are no longer present are removed.
+        """
+        for item in items:
+            entity = item['entity']
+            with self._lock:
+                self._add(self._key(entity), entity)
+
+                keys = set()
+                for check in item['checks']:
+                    key = self._key(check)
+                    keys.add(key)
+                    self._add(key, check)
+
+                stale = self._children.get(entity.id, set()) - keys
+                for key in stale:
+                    self._remove(key)
+
+    def refresh(self, driver):
+        """
+        Rebuild the index from C{ex_views_overview}.
+        """
+        index = SearchIndex()
+        index.add_overview(driver.ex_views_overview(ex_stream=True))
+
+        with self._lock:
+            for name in STATE:
+                setattr(self, name, getattr(index, name))
+
+    def _sync_vocabulary(self):
+        if not self._added and not self._removed:
+            return
+
+        vocabulary = self._vocabulary
+        if len(self._added) + len(self._removed) > RESORT_THRESHOLD:
+            self._vocabulary = sorted(self._postings.keys())
+        else:
+            for token in self._removed:
+                del vocabulary[bisect_left(vocabulary, token)]
+            for token in self._added:
+                vocabulary.insert(bisect_left(vocabulary, token), token)
+
+        self._added = set()
+        self._removed = set()
+        self._blob = None
+
+    def _vocabulary_blob(self):
+        if self._blob is None:
+            self._blob = (SEPARATOR + SEPARATOR.join(self._vocabulary) +
+                          SEPARATOR)
+        return self._blob
+
+    def _prefix_tokens(self, query):
+        vocabulary = self._vocabulary
+        start = bisect_left(vocabulary, query)
+        end = bisect_left(vocabulary, query + u'\uffff', start)
+        return vocabulary[start:end]
+
+    def _substring_tokens(self, query):
+        blob = self._vocabulary_blob()
+        tokens = []
+
+        # Tokens are delimited by separators on both sides
+        position = blob.find(query)
+        while position != -1:
+            start = blob.rfind(SEPARATOR, 0, position) + 1
+            end = blob.find(SEPARATOR, position)
+            tokens.append(blob[start:end])
+            position = blob.find(query, end)
+
+        return tokens
+
+    def search(self, query, prefix=False, kind=None, limit=None):
+        """
+        Return indexed objects with a value containing (or starting with)
+        the query. Matching is case insensitive.
+
+        @type query: C{str}
+        @param query: Text to look for.
+
+        @type prefix: C{bool}
+        @param prefix: Only match values and words which start with the
+                       query.
+
+        @type kind: C{str}
+        @param kind: C{entity} or C{check}, default is both.
+
+        @type limit: C{int}
+        @param limit: Maximum number of returned objects.
+
+        @rtype: C{list}
+        @return: Matching objects in the order they have been indexed.
+        """
+        query = _to_unicode(query).lower().replace(SEPARATOR, u'')
+        if not query:
+            return []
+
+        with self._lock:
+            self._sync_vocabulary()
+            if prefix:
+                tokens = self._prefix_tokens(query)
+            else:
+                tokens = self._substring_tokens(query)
+
+            slots = set()
+            for token in tokens:
+                slots.update(self._postings[token])
+
+            result = []
+            for slot in sorted(slots):
+                obj, _, obj_kind = self._documents[slot]
+                if kind is not None and obj_kind != kind:
+                    continue
+
+                result.append(obj)
+                if limit is not None and len(result) >= limit:
+                    break
+
+        return result
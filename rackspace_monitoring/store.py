@@ -0,0 +1,488 @@
+# Licensed to the Apache Software Foundation (ASF) under one or more
+# contributor license agreements.  See the NOTICE file distributed with
+# this work for additional information regarding copyright ownership.
+# The ASF licenses this file to You under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with
+# the License.  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+SQLite backed account snapshot which can be queried without network access.
+"""
+
+import time
+import sqlite3
+
+from rackspace_monitoring.base import (Entity, Check, Alarm, Notification,
+                                       NotificationPlan)
+from rackspace_monitoring.drivers.rackspace import LatestAlarmState
+from rackspace_monitoring.json_codecs import get_codec
+
+__all__ = ['SnapshotStore']
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS entities (
+    id TEXT PRIMARY KEY,
+    label TEXT,
+    metadata TEXT,
+    generation INTEGER
+);
+CREATE INDEX IF NOT EXISTS entities_label ON entities (label);
+
+CREATE TABLE IF NOT EXISTS entity_ip_addresses (
+    entity_id TEXT,
+    alias TEXT,
+    address TEXT
+);
+CREATE INDEX IF NOT EXISTS entity_ip_addresses_entity_id
+    ON entity_ip_addresses (entity_id);
+CREATE INDEX IF NOT EXISTS entity_ip_addresses_address
+    ON entity_ip_addresses (address);
+
+CREATE TABLE IF NOT EXISTS checks (
+    id TEXT PRIMARY KEY,
+    entity_id TEXT,
+    label TEXT,
+    type TEXT,
+    timeout INTEGER,
+    period INTEGER,
+    target_alias TEXT,
+    target_resolver TEXT,
+    details TEXT,
+    generation INTEGER
+);
+CREATE INDEX IF NOT EXISTS checks_entity_id ON checks (entity_id);
+CREATE INDEX IF NOT EXISTS checks_type ON checks (type);
+CREATE INDEX IF NOT EXISTS checks_target_alias ON checks (target_alias);
+
+CREATE TABLE IF NOT EXISTS check_zones (
+    check_id TEXT,
+    zone_id TEXT
+);
+CREATE INDEX IF NOT EXISTS check_zones_check_id ON check_zones (check_id);
+CREATE INDEX IF NOT EXISTS check_zones_zone_id ON check_zones (zone_id);
+
+CREATE TABLE IF NOT EXISTS alarms (
+    id TEXT PRIMARY KEY,
+    entity_id TEXT,
+    check_type TEXT,
+    check_id TEXT,
+    criteria TEXT,
+    notification_plan_id TEXT,
+    generation INTEGER
+);
+CREATE INDEX IF NOT EXISTS alarms_entity_id ON alarms (entity_id);
+CREATE INDEX IF NOT EXISTS alarms_notification_plan_id
+    ON alarms (notification_plan_id);
+
+CREATE TABLE IF NOT EXISTS notifications (
+    id TEXT PRIMARY KEY,
+    label TEXT,
+    type TEXT,
+    details TEXT,
+    generation INTEGER
+);
+
+CREATE TABLE IF NOT EXISTS notification_plans (
+    id TEXT PRIMARY KEY,
+    label TEXT,
+    critical_state TEXT,
+    warning_state TEXT,
+    ok_state TEXT,
+    generation INTEGER
+);
+
+CREATE TABLE IF NOT EXISTS notification_plan_notifications (
+    notification_plan_id TEXT,
+    state TEXT,
+    notification_id TEXT
+);
+CREATE INDEX IF NOT EXISTS notification_plan_notifications_plan_id
+    ON notification_plan_notifications (notification_plan_id);
+CREATE INDEX IF NOT EXISTS notification_plan_notifications_notification_id
+    ON notification_plan_notifications (notification_id);
+
+CREATE TABLE IF NOT EXISTS latest_alarm_states (
+    entity_id TEXT,
+    check_id TEXT,
+    alarm_id TEXT,
+    timestamp INTEGER,
+    state TEXT,
+    generation INTEGER,
+    PRIMARY KEY (entity_id, check_id, alarm_id)
+);
+CREATE INDEX IF NOT EXISTS latest_alarm_states_state
+    ON latest_alarm_states (state);
+
+CREATE TABLE IF NOT EXISTS refreshes (
+    collection TEXT PRIMARY KEY,
+    refreshed_at REAL
+);
+
+CREATE TABLE IF NOT EXISTS counters (
+    name TEXT PRIMARY KEY,
+    value INTEGER
+);
+INSERT OR IGNORE INTO counters VALUES ('generation', 0);
+"""
+
+PLAN_STATES = ['critical_state', 'warning_state', 'ok_state']
+
+
+def _transaction(func):
+    """
+    Commit the changes made by a write method, or roll them back if it
+    raises (e.g. a stream of items which fails partway) so the previous
+    snapshot is kept.
+    """
+    def wrapper(self, *args, **kwargs):
+        try:
+            result = func(self, *args, **kwargs)
+        except:
+            self.db.rollback()
+            raise
+        self.db.commit()
+        return result
+
+    wrapper.__name__ = func.__name__
+    wrapper.__doc__ = func.__doc__
+    return wrapper
+
+
+class SnapshotStore(object):
+    """
+    Local snapshot of an account stored in a SQLite database.
+
+    Every C{store_*} method replaces the stored collection (or the children
+    of a single entity) with the provided objects, so a snapshot can be
+    refreshed incrementally one collection or one entity at a time.
+
+    Objects returned by the query methods are bound to the C{driver} passed
+    to the constructor (if any) so they can still be updated or deleted.
+    """
+
+    def __init__(self, path, driver=None, codec=None):
+        """
+        @type codec: C{str} or L{JSONCodec}
+        @param codec: JSON codec of the stored details and metadata, the
+                      codec of the driver by default.
+        """
+        self.path = path
+        self.driver = driver
+        if codec is None and driver is not None:
+            self.codec = driver.connection.get_json_codec()
+        else:
+            self.codec = get_codec(codec)
+        self.db = sqlite3.connect(path)
+        self.db.executescript(SCHEMA)
+        self.db.commit()
+
+    def close(self):
+        self.db.close()
+
+    def _generation(self):
+        self.db.execute('UPDATE counters SET value = value + 1 WHERE '
+                        'name = ?', ('generation',))
+        row = self.db.execute('SELECT value FROM counters WHERE name = ?',
+                              ('generation',)).fetchone()
+        return row[0]
+
+    def _mark_refreshed(self, collection):
+        self.db.execute('INSERT OR REPLACE INTO refreshes VALUES (?, ?)',
+                        (collection, time.time()))
+
+    def refreshed_at(self, collection):
+        """
+        Return the time when the collection was last refreshed or None.
+        """
+        row = self.db.execute('SELECT refreshed_at FROM refreshes WHERE '
+                              'collection = ?', (collection,)).fetchone()
+        return row and row[0]
+
+    ##########
+    ## Writes
+    ##########
+
+    def _insert_entity(self, entity, generation):
+        self.db.execute('INSERT OR REPLACE INTO entities VALUES (?, ?, ?, ?)',
+                        (entity.id, entity.label,
+                         self.codec.dumps(entity.extra), generation))
+        self.db.execute('DELETE FROM entity_ip_addresses WHERE entity_id = ?',
+                        (entity.id,))
+        self.db.executemany('INSERT INTO entity_ip_addresses VALUES '
+                            '(?, ?, ?)', [(entity.id, alias, address) for
+                                          alias, address in
+                                          entity.ip_addresses])
+
+    def _insert_check(self, check, generation):
+        self.db.execute('INSERT OR REPLACE INTO checks VALUES '
+                        '(?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                        (check.id, check.entity_id, check.label, check.type,
+                         check.timeout, check.period, check.target_alias,
+                         check.target_resolver,
+                         self.codec.dumps(check.details), generation))
+        self.db.execute('DELETE FROM check_zones WHERE check_id = ?',
+                        (check.id,))
+        self.db.executemany('INSERT INTO check_zones VALUES (?, ?)',
+                            [(check.id, zone) for zone in
+                             check.monitoring_zones or []])
+
+    def _insert_alarm(self, alarm, generation):
+        self.db.execute('INSERT OR REPLACE INTO alarms VALUES '
+                        '(?, ?, ?, ?, ?, ?, ?)',
+                        (alarm.id, alarm.entity_id, alarm.type,
+                         alarm.check_id, alarm.criteria,
+                         alarm.notification_plan_id, generation))
+
+    def _insert_latest_alarm_state(self, state, generation):
+        self.db.execute('INSERT OR REPLACE INTO latest_alarm_states VALUES '
+                        '(?, ?, ?, ?, ?, ?)',
+                        (state.entity_id, state.check_id, state.alarm_id,
+                         state.timestamp, state.state, generation))
+
+    def _sweep(self, table, generation, where='', args=()):
+        if table == 'checks':
+            self.db.execute('DELETE FROM check_zones WHERE check_id IN '
+                            '(SELECT id FROM checks WHERE generation < ? %s)'
+                            % (where), (generation,) + tuple(args))
+        elif table == 'entities':
+            self.db.execute('DELETE FROM entity_ip_addresses WHERE '
+                            'entity_id IN (SELECT id FROM entities WHERE '
+                            'generation < ?)', (generation,))
+        elif table == 'notification_plans':
+            self.db.execute('DELETE FROM notification_plan_notifications '
+                            'WHERE notification_plan_id IN (SELECT id FROM '
+                            'notification_plans WHERE generation < ?)',
+                            (generation,))
+
+        self.db.execute('DELETE FROM %s WHERE generation < ? %s' %
+                        (table, where), (generation,) + tuple(args))
+
+        if table == 'entities':
+            # Children of the removed entities
+            orphaned = 'entity_id NOT IN (SELECT id FROM entities)'
+            self.db.execute('DELETE FROM check_zones WHERE check_id IN '
+                            '(SELECT id FROM checks WHERE %s)' % (orphaned))
+            for child in ['checks', 'alarms', 'latest_alarm_states']:
+                self.db.execute('DELETE FROM %s WHERE %s' % (child, orphaned))
+
+    @_transaction
+    def store_entities(self, entities):
+        generation = self._generation()
+        for entity in entities:
+            self._insert_entity(entity, generation)
+        self._sweep('entities', generation)
+        self._mark_refreshed('entities')
+
+    @_transaction
+    def store_checks(self, entity_id, checks):
+        generation = self._generation()
+        for check in checks:
+            self._insert_check(check, generation)
+        self._sweep('checks', generation, 'AND entity_id = ?', (entity_id,))
+        self._mark_refreshed('checks:%s' % (entity_id))
+
+    @_transaction
+    def store_alarms(self, entity_id, alarms):
+        generation = self._generation()
+        for alarm in alarms:
+            self._insert_alarm(alarm, generation)
+        self._sweep('alarms', generation, 'AND entity_id = ?', (entity_id,))
+        self._mark_refreshed('alarms:%s' % (entity_id))
+
+    @_transaction
+    def store_notifications(self, notifications):
+        generation = self._generation()
+        for notification in notifications:
+            self.db.execute('INSERT OR REPLACE INTO notifications VALUES '
+                            '(?, ?, ?, ?, ?)',
+                            (notification.id, notification.label,
+                             notification.type,
+                             self.codec.dumps(notification.details),
+                             generation))
+        self._sweep('notifications', generation)
+        self._mark_refreshed('notifications')
+
+    @_transaction
+    def store_notification_plans(self, notification_plans):
+        generation = self._generation()
+        for plan in notification_plans:
+            states = [getattr(plan, state) or [] for state in PLAN_STATES]
+            self.db.execute('INSERT OR REPLACE INTO notification_plans VALUES '
+                            '(?, ?, ?, ?, ?, ?)',
+                            tuple([plan.id, plan.label] +
+                                  [self.codec.dumps(value) for value in
+                                   states] + [generation]))
+            self.db.execute('DELETE FROM notification_plan_notifications '
+                            'WHERE notification_plan_id = ?', (plan.id,))
+            for state, value in zip(PLAN_STATES, states):
+                self.db.executemany('INSERT INTO '
+                                    'notification_plan_notifications VALUES '
+                                    '(?, ?, ?)',
+                                    [(plan.id, state, notification_id) for
+                                     notification_id in value])
+        self._sweep('notification_plans', generation)
+        self._mark_refreshed('notification_plans')
+
+    @_transaction
+    def _store_entity(self, entity):
+        self._insert_entity(entity, self._generation())
+
+    @_transaction
+    def store_overview(self, items):
+        """
+        Store items as returned by C{ex_views_overview}. This replaces the
+        entities together with all their checks, alarms and latest alarm
+        states.
+        """
+        generation = self._generation()
+        for item in items:
+            self._insert_entity(item['entity'], generation)
+            for check in item['checks']:
+                self._insert_check(check, generation)
+            for alarm in item['alarms']:
+                self._insert_alarm(alarm, generation)
+            for state in item['latest_alarm_states']:
+                self._insert_latest_alarm_state(state, generation)
+
+        for table in ['entities', 'checks', 'alarms', 'latest_alarm_states']:
+            self._sweep(table, generation)
+        self._mark_refreshed('overview')
+
+    def refresh(self, driver=None):
+        """
+        Refresh the whole snapshot from the API.
+        """
+        driver = driver or self.driver
+        self.store_notifications(driver.list_notifications(ex_stream=True))
+        self.store_notification_plans(
+            driver.list_notification_plans(ex_stream=True))
+        self.store_overview(driver.ex_views_overview(ex_stream=True))
+
+    def refresh_entity(self, entity, driver=None):
+        """
+        Refresh a single entity together with its checks and alarms.
+        """
+        driver = driver or self.driver
+        self._store_entity(driver.get_entity(entity.id))
+        self.store_checks(entity.id, driver.list_checks(entity=entity))
+        self.store_alarms(entity.id, driver.list_alarms(entity=entity))
+
+    ###########
+    ## Queries
+    ###########
+
+    def _select(self, table, columns, joins='', conditions=None):
+        conditions = [(key, value) for key, value in
+                      (conditions or []) if value is not None]
+        query = 'SELECT DISTINCT %s FROM %s %s' % (columns, table, joins)
+        if conditions:
+            query += ' WHERE ' + ' AND '.join(['%s = ?' % (key) for key, _
+                                               in conditions])
+        return self.db.execute(query, [value for _, value in conditions])
+
+    def _to_entity(self, row):
+        ips = self.db.execute('SELECT alias, address FROM entity_ip_addresses '
+                              'WHERE entity_id = ?', (row[0],)).fetchall()
+        return Entity(id=row[0], label=row[1], extra=self.codec.loads(row[2]),
+                      ip_addresses=[tuple(ip) for ip in ips],
+                      driver=self.driver)
+
+    def _to_check(self, row):
+        zones = self.db.execute('SELECT zone_id FROM check_zones WHERE '
+                                'check_id = ?', (row[0],)).fetchall()
+        return Check(id=row[0], entity_id=row[1], label=row[2], type=row[3],
+                     timeout=row[4], period=row[5], target_alias=row[6],
+                     target_resolver=row[7], details=self.codec.loads(row[8]),
+                     monitoring_zones=tuple([zone[0] for zone in zones]),
+                     driver=self.driver)
+
+    def _to_alarm(self, row):
+        return Alarm(id=row[0], entity_id=row[1], type=row[2],
+                     check_id=row[3], criteria=row[4],
+                     notification_plan_id=row[5], driver=self.driver)
+
+    def entities(self, label=None, ip_address=None, target_alias=None):
+        joins = ''
+        if ip_address is not None or target_alias is not None:
+            joins = ('JOIN entity_ip_addresses ON entity_ip_addresses.'
+                     'entity_id = entities.id')
+        rows = self._select('entities',
+                            'entities.id, entities.label, entities.metadata',
+                            joins, [('entities.label', label),
+                                    ('entity_ip_addresses.address',
+                                     ip_address),
+                                    ('entity_ip_addresses.alias',
+                                     target_alias)])
+        return [self._to_entity(row) for row in rows.fetchall()]
+
+    def get_entity(self, entity_id):
+        result = self._select('entities', 'id, label, metadata',
+                              conditions=[('id', entity_id)]).fetchone()
+        return result and self._to_entity(result)
+
+    def checks(self, entity_id=None, type=None, zone=None, target_alias=None):
+        joins = ''
+        if zone is not None:
+            joins = 'JOIN check_zones ON check_zones.check_id = checks.id'
+        columns = ', '.join(['checks.%s' % (name) for name in
+                             ['id', 'entity_id', 'label', 'type', 'timeout',
+                              'period', 'target_alias', 'target_resolver',
+                              'details']])
+        rows = self._select('checks', columns, joins,
+                            [('checks.entity_id', entity_id),
+                             ('checks.type', type),
+                             ('check_zones.zone_id', zone),
+                             ('checks.target_alias', target_alias)])
+        return [self._to_check(row) for row in rows.fetchall()]
+
+    def alarms(self, entity_id=None, notification_plan_id=None,
+               check_type=None):
+        rows = self._select('alarms', 'id, entity_id, check_type, check_id, '
+                            'criteria, notification_plan_id', conditions=[
+                                ('entity_id', entity_id),
+                                ('notification_plan_id', notification_plan_id),
+                                ('check_type', check_type)])
+        return [self._to_alarm(row) for row in rows.fetchall()]
+
+    def notifications(self, type=None):
+        rows = self._select('notifications', 'id, label, type, details',
+                            conditions=[('type', type)])
+        return [Notification(id=row[0], label=row[1], type=row[2],
+                             details=self.codec.loads(row[3]),
+                             driver=self.driver)
+                for row in rows.fetchall()]
+
+    def notification_plans(self, notification_id=None):
+        joins = ''
+        if notification_id is not None:
+            joins = ('JOIN notification_plan_notifications ON '
+                     'notification_plan_notifications.notification_plan_id = '
+                     'notification_plans.id')
+        rows = self._select('notification_plans',
+                            'notification_plans.id, notification_plans.label, '
+                            'critical_state, warning_state, ok_state', joins,
+                            [('notification_plan_notifications.'
+                              'notification_id', notification_id)])
+        return [NotificationPlan(id=row[0], label=row[1],
+                                 critical_state=self.codec.loads(row[2]),
+                                 warning_state=self.codec.loads(row[3]),
+                                 ok_state=self.codec.loads(row[4]),
+                                 driver=self.driver)
+                for row in rows.fetchall()]
+
+    def latest_alarm_states(self, entity_id=None, state=None):
+        rows = self._select('latest_alarm_states', 'entity_id, check_id, '
+                            'alarm_id, timestamp, state',
+                            conditions=[('entity_id', entity_id),
+                                        ('state', state)])
+        return [LatestAlarmState(entity_id=row[0], check_id=row[1],
+                                 alarm_id=row[2], timestamp=row[3],
+                                 state=row[4]) for row in rows.fetchall()]
@@ -13,9 +13,442 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+# Backward compatibility for Python 2.5
+from __future__ import with_statement
+
 import re
+import sys
+import time
+import Queue
+import hashlib
+import weakref
+import threading
+
+from libcloud.common.types import InvalidCredsError
 
 
 def to_underscore_separated(name):
     s1 = re.sub('(.)([A-Z][a-z]+)', r'\1_\2', name)
     return re.sub('([a-z0-9])([A-Z])', r'\1_\2', s1).lower()
+
+
+def imap_unordered(func, items, max_workers=10):
+    """
+    Call C{func} for every item on a pool of threads.
+
+    Items are consumed lazily and the results are yielded as soon as they are
+    available (in completion order) as C{(item, result, error)} tuples.
+    Exceptions raised by C{func} are captured and returned as C{error} so a
+    failure doesn't affect other items. An exception raised while iterating
+    C{items} is raised to the consumer once the started calls are done.
+
+    Closing the generator (or abandoning it) stops the pool. Calls which are
+    already running are finished, the remaining items aren't consumed.
+
+    @type max_workers: C{int}
+    @param max_workers: Maximum number of concurrently running calls.
+    """
+    sentinel = object()
+    in_queue = Queue.Queue(maxsize=max_workers * 2)
+    out_queue = Queue.Queue()
+    stopped = threading.Event()
+    feed_error = []
+
+    def put(item):
+        # Give up once the consumer is gone instead of blocking forever on a
+        # full queue.
+        while not stopped.isSet():
+            try:
+                in_queue.put(item, timeout=0.1)
+                return True
+            except Queue.Full:
+                pass
+        return False
+
+    def feed():
+        iterator = iter(items)
+        try:
+            try:
+                for item in iterator:
+                    if not put(item):
+                        break
+            except Exception:
+                feed_error.append(sys.exc_info())
+        finally:
+            if stopped.isSet() and hasattr(iterator, 'close'):
+                # Stops a nested pool which provides the items
+                iterator.close()
+            for _ in range(max_workers):
+                put(sentinel)
+
+    def work():
+        while not stopped.isSet():
+            try:
+                item = in_queue.get(timeout=0.1)
+            except Queue.Empty:
+                continue
+
+            if item is sentinel:
+                break
+
+            try:
+                out_queue.put((item, func(item), None))
+            except Exception:
+                out_queue.put((item, None, sys.exc_info()[1]))
+        out_queue.put(sentinel)
+
+    threads = [threading.Thread(target=feed)]
+    threads.extend([threading.Thread(target=work) for _ in
+                    range(max_workers)])
+    for thread in threads:
+        thread.daemon = True
+        thread.start()
+
+    try:
+        running = max_workers
+        while running:
+            value = out_queue.get()
+            if value is sentinel:
+                running -= 1
+            else:
+                yield value
+    finally:
+        stopped.set()
+
+    if feed_error:
+        exc_type, exc_value, exc_tb = feed_error[0]
+        raise exc_type, exc_value, exc_tb
+
+
+class IdentityMap(object):
+    """
+    Weak reference map which makes sure there is only a single instance of
+    an object with a given id alive at a time.
+    """
+
+    def __init__(self):
+        self._objects = weakref.WeakValueDictionary()
+        self._lock = threading.Lock()
+
+    def _key(self, obj):
+        return (obj.__class__, getattr(obj, 'entity_id', None), obj.id)
+
+    def add(self, obj):
+        """
+        Register an object and return the canonical instance for its id. If
+        an instance already exists, it is updated in place with the
+        attributes of the provided object.
+        """
+        key = self._key(obj)
+
+        with self._lock:
+            existing = self._objects.get(key)
+            if existing is None:
+                self._objects[key] = obj
+                return obj
+
+            existing.__dict__.update(obj.__dict__)
+
+            # Attributes of lazy models which have already been decoded from
+            # the previous raw item are stale now.
+            for name in getattr(existing, '_lazy_attributes', {}):
+                if name not in obj.__dict__:
+                    existing.__dict__.pop(name, None)
+
+            return existing
+
+    def get(self, cls, id, entity_id=None):
+        return self._objects.get((cls, entity_id, id))
+
+    def __len__(self):
+        return len(self._objects)
+
+
+class Interner(object):
+    """
+    Returns a single shared instance for equal values.
+
+    Unlike the intern() builtin, this also works for unicode strings (which
+    is what the JSON decoder returns) and tuples. Only meant for low
+    cardinality values, once C{max_size} distinct values have been seen the
+    table starts over so it doesn't grow without bounds.
+    """
+
+    def __init__(self, max_size=None):
+        self.max_size = max_size
+        self._values = {}
+
+    def __call__(self, value):
+        if value is None:
+            return None
+
+        values = self._values
+        if self.max_size is not None and len(values) >= self.max_size and \
+           value not in values:
+            values.clear()
+        return values.setdefault(value, value)
+
+    def sequence(self, values):
+        """
+        Return a shared tuple with the interned values of a sequence.
+        """
+        if values is None:
+            return None
+
+        return self(tuple([self(value) for value in values]))
+
+    def clear(self):
+        self._values.clear()
+
+    def __len__(self):
+        return len(self._values)
+
+
+class NullInterner(object):
+    """
+    Interner which doesn't share anything, sequences are still returned as
+    tuples.
+    """
+
+    def __call__(self, value):
+        return value
+
+    def sequence(self, values):
+        if values is None:
+            return None
+
+        return tuple(values)
+
+    def __len__(self):
+        return 0
+
+
+class ChangelogCursor(object):
+    """
+    Position in the alarm changelog of an account.
+
+    Every read starts at the newest timestamp seen so far. Changes with that
+    timestamp are returned again by the API, so they are remembered by id
+    and skipped.
+    """
+
+    def __init__(self, start=None):
+        """
+        @type start: C{int}
+        @param start: Milliseconds since epoch to start reading at, None
+                      starts with the whole changelog.
+        """
+        self.start = start
+        self._seen = {}
+
+    def read(self, driver, **kwargs):
+        """
+        Yield the changes which haven't been returned yet. Additional
+        keyword arguments are passed to C{list_alarm_changelog}.
+        """
+        changes = driver.list_alarm_changelog(ex_stream=True,
+                                              ex_from=self.start, **kwargs)
+        return self.filter(changes)
+
+    def filter(self, changes):
+        for change in changes:
+            if change.id in self._seen:
+                continue
+
+            timestamp = change.timestamp or 0
+            self._seen[change.id] = timestamp
+            self.start = max(self.start, timestamp)
+            yield change
+
+        self._seen = dict([(key, value) for key, value in self._seen.items()
+                           if value >= self.start])
+
+
+class PageSizeTuner(object):
+    """
+    Adjusts the page size of list requests so fetching a single page takes
+    about C{target} seconds.
+
+    Only full pages are taken into account, the last page of a listing is
+    usually shorter and its latency is dominated by the per request
+    overhead.
+    """
+
+    def __init__(self, initial=100, minimum=10, maximum=1000, target=1.0,
+                 smoothing=0.5):
+        self.limit = initial
+        self.minimum = minimum
+        self.maximum = maximum
+        self.target = target
+        self.smoothing = smoothing
+        self._item_latency = None
+        self._lock = threading.Lock()
+
+    def observe(self, elapsed, items, limit):
+        """
+        Record latency of a page request.
+
+        @type elapsed: C{float}
+        @param elapsed: Request duration in seconds.
+
+        @type items: C{int}
+        @param items: Number of items returned.
+
+        @type limit: C{int}
+        @param limit: Page size which has been requested.
+        """
+        if items <= 0 or items < limit:
+            return
+
+        latency = float(elapsed) / items
+
+        with self._lock:
+            if self._item_latency is None:
+                self._item_latency = latency
+            else:
+                self._item_latency = (self.smoothing * latency +
+                                      (1 - self.smoothing) *
+                                      self._item_latency)
+
+            if self._item_latency > 0:
+                limit = int(self.target / self._item_latency)
+            else:
+                limit = self.maximum
+
+            # Change at most by a factor of two per page to avoid
+            # oscillating on a single slow or fast response.
+            limit = max(self.limit / 2, min(self.limit * 2, limit))
+            self.limit = max(self.minimum, min(self.maximum, limit))
+
+
+class RateLimiter(object):
+    """
+    Limits the rate of calls shared by multiple threads.
+
+    C{pause} can be used to stop all the callers for a while after the API
+    reported that the rate limit has been exceeded.
+    """
+
+    def __init__(self, rate=None):
+        """
+        @type rate: C{float}
+        @param rate: Maximum number of calls per second, None means no limit.
+        """
+        self.rate = rate
+        self._lock = threading.Lock()
+        self._next = 0.0
+
+    def acquire(self):
+        """
+        Block until the next call is allowed.
+        """
+        with self._lock:
+            now = time.time()
+            wait = max(self._next - now, 0)
+            interval = self.rate and 1.0 / self.rate or 0
+            self._next = max(self._next, now) + interval
+
+        if wait > 0:
+            time.sleep(wait)
+
+    def pause(self, seconds):
+        with self._lock:
+            self._next = max(self._next, time.time() + seconds)
+
+
+def is_over_limit_error(error):
+    """
+    Return True if an exception raised by the driver means the API rate limit
+    has been exceeded.
+    """
+    body = error.args and error.args[0] or None
+    if not isinstance(body, dict):
+        return False
+
+    return body.get('type') == 'overLimitError' or body.get('code') in [413,
+                                                                        429]
+
+
+def is_auth_error(error):
+    """
+    Return True if an exception raised by the driver means the credentials
+    are invalid or the auth token has expired.
+    """
+    if isinstance(error, InvalidCredsError):
+        return True
+    body = error.args and error.args[0] or None
+    return isinstance(body, dict) and body.get('code') == 401
+
+
+class DriverPool(object):
+    """
+    One driver per credentials, so authentication only happens the first
+    time an account is used (or after its token has expired). Drivers can be
+    shared between threads.
+    """
+
+    def __init__(self, factory, max_size=100):
+        """
+        @type factory: C{callable}
+        @param factory: Called with the username and the API key to create
+                        (and authenticate) a driver.
+
+        @type max_size: C{int}
+        @param max_size: Maximum number of drivers, the least recently used
+                         one is dropped first.
+        """
+        self.factory = factory
+        self.max_size = max_size
+        self._lock = threading.Lock()
+        self._drivers = {}
+        # key -> time of the last use
+        self._used = {}
+
+    def key(self, username, api_key):
+        return hashlib.sha1('%s\n%s' % (username, api_key)).hexdigest()
+
+    def get(self, username, api_key):
+        """
+        Return a (key, driver) tuple for the account.
+        """
+        key = self.key(username, api_key)
+        with self._lock:
+            driver = self._drivers.get(key)
+            if driver is not None:
+                self._used[key] = time.time()
+                return key, driver
+
+        # Authenticate outside of the lock so other accounts aren't blocked
+        driver = self.factory(username, api_key)
+
+        with self._lock:
+            if len(self._drivers) >= self.max_size:
+                oldest = min(self._used, key=self._used.get)
+                del self._drivers[oldest]
+                del self._used[oldest]
+            driver = self._drivers.setdefault(key, driver)
+            self._used[key] = time.time()
+        return key, driver
+
+    def evict(self, key, driver):
+        with self._lock:
+            # Another thread may have already replaced it
+            if self._drivers.get(key) is driver:
+                del self._drivers[key]
+                del self._used[key]
+
+    def call(self, username, api_key, func):
+        """
+        Call C{func(driver)} with the driver of the account. If the token
+        has expired, the driver is replaced and the call is retried once.
+        """
+        key, driver = self.get(username, api_key)
+        try:
+            return func(driver)
+        except Exception, e:
+            if not is_auth_error(e):
+                raise
+
+        self.evict(key, driver)
+        key, driver = self.get(username, api_key)
+        return func(driver)
@@ -16,7 +16,13 @@
 import os
 import sys
 
-from distutils.core import setup
+try:
+    from setuptools import setup
+    has_setuptools = True
+except ImportError:
+    from distutils.core import setup
+    has_setuptools = False
+
 from distutils.core import Command
 from unittest import TextTestRunner, TestLoader
 from glob import glob
@@ -165,6 +171,15 @@ class CoverageCommand(Command):
         cov.save()
         cov.html_report()
 
+extra_kwargs = {}
+if has_setuptools:
+    extra_kwargs['entry_points'] = {
+        'console_scripts': [
+            'raxmon = rackspace_monitoring.cli:main',
+            'raxmon-import = rackspace_monitoring.importer:main',
+        ]
+    }
+
 setup(
     name='rackspace-monitoring',
     version=read_version_string(),
@@ -195,5 +210,6 @@ setup(
         'Operating System :: OS Independent',
         'Programming Language :: Python',
         'Topic :: Software Development :: Libraries :: Python Modules'
-    ]
+    ],
+    **extra_kwargs
 )
@@ -0,0 +1,334 @@
+# Licensed to the Apache Software Foundation (ASF) under one or more
+# contributor license agreements.  See the NOTICE file distributed with
+# this work for additional information regarding copyright ownership.
+# The ASF licenses this file to You under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with
+# the License.  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Helpers shared by the tests of the modules built on top of the driver.
+
+L{FakeMonitoringApi} keeps entities, checks, alarms and the alarm changelog
+in memory and serves them over L{FakeApiHttp} so those tests go through the
+real L{RackspaceMonitoringDriver} instead of a hand-rolled copy of it.
+"""
+
+from __future__ import with_statement
+
+import re
+import time
+import httplib
+import urlparse
+import threading
+
+from cgi import parse_qs
+
+try:
+    import simplejson as json
+except:
+    import json
+
+from rackspace_monitoring.drivers.rackspace import RackspaceMonitoringDriver
+
+from test import MockHttp
+from secrets import RACKSPACE_PARAMS
+
+__all__ = [
+    'FakeMonitoringApi',
+    'FakeApiHttp',
+    'fake_driver',
+    'wait_for'
+]
+
+TENANT_ID = '23213'
+BASE_URL = 'http://www.todo.com'
+
+JSON_CONTENT_HEADERS = {'content-type': 'application/json; charset=UTF-8'}
+
+
+def wait_for(predicate, timeout=2):
+    deadline = time.time() + timeout
+    while not predicate() and time.time() < deadline:
+        time.sleep(0.01)
+    return predicate()
+
+
+class FakeMonitoringApi(object):
+    """
+    In-memory state of the monitoring API.
+
+    Objects are stored as the JSON dicts returned by the API, timestamps are
+    in milliseconds. Every request is recorded in C{requests} as a
+    C{(method, path, query)} tuple with the tenant id stripped from the path.
+    """
+
+    page_size = 100
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.entities = []
+        self.checks = {}
+        self.alarms = {}
+        self.alarm_states = {}
+        self.changelog = []
+        self.requests = []
+        self.failures = []
+        self._ids = {}
+
+    def _next_id(self, prefix):
+        self._ids[prefix] = self._ids.get(prefix, -1) + 1
+        return '%s%d' % (prefix, self._ids[prefix])
+
+    def add_entity(self, label, ip_addresses=None, metadata=None, id=None):
+        with self.lock:
+            entity = {'id': id or self._next_id('en'), 'label': label,
+                      'ip_addresses': ip_addresses or {},
+                      'metadata': metadata or {}}
+            self.entities.append(entity)
+            self.checks.setdefault(entity['id'], [])
+            self.alarms.setdefault(entity['id'], [])
+        return entity
+
+    def get_entity(self, entity_id):
+        for entity in self.entities:
+            if entity['id'] == entity_id:
+                return entity
+        return None
+
+    def set_alarm_state(self, entity_id, check_id, alarm_id, state,
+                        timestamp, changelog=True):
+        """
+        Change the latest state of an alarm as returned by the overview and
+        record the change in the changelog unless changelog is False.
+        """
+        with self.lock:
+            states = self.alarm_states.setdefault(entity_id, {})
+            states[alarm_id] = {'entity_id': entity_id, 'check_id': check_id,
+                                'alarm_id': alarm_id, 'state': state,
+                                'timestamp': timestamp}
+            if changelog:
+                self.changelog.append({'id': self._next_id('cl'),
+                                       'entity_id': entity_id,
+                                       'check_id': check_id,
+                                       'alarm_id': alarm_id, 'state': state,
+                                       'timestamp': timestamp})
+
+    def fail(self, method, path, status=httplib.INTERNAL_SERVER_ERROR,
+             body=None, count=None, match=None):
+        """
+        Respond to the matching requests with an error.
+
+        @type path: C{str}
+        @param path: Regular expression matched against the whole path.
+
+        @type count: C{int}
+        @param count: Number of requests to fail, None means all of them.
+
+        @type match: C{callable}
+        @param match: Only fail requests whose decoded body it returns True
+                      for.
+        """
+        body = body or {'code': status, 'type': 'serviceError',
+                        'message': httplib.responses[status],
+                        'details': httplib.responses[status]}
+        self.failures.append({'method': method,
+                              'path': re.compile('^%s$' % (path)),
+                              'status': status, 'body': body,
+                              'count': count, 'match': match})
+
+    def requests_for(self, method, path, first_page=False):
+        """
+        Return the query of the requests made to path. If first_page is True,
+        the requests for the next pages of a listing are left out.
+        """
+        return [query for request_method, request_path, query in
+                self.requests if request_method == method and
+                request_path == path and
+                not (first_page and 'marker' in query)]
+
+    def handle(self, method, path, query, data):
+        with self.lock:
+            self.requests.append((method, path, query))
+            failure = self._failure(method, path, data)
+        if failure:
+            return failure['status'], failure['body'], {}
+
+        chunks = path.strip('/').split('/')
+        if chunks[0] == 'entities':
+            return self._entities(method, chunks[1:], query, data)
+        elif path == '/views/overview':
+            return self._page(self._overview(query.get('entityId')), query,
+                              lambda item: item['entity']['id'])
+        elif path == '/changelogs/alarms':
+            return self._page(self._changes(query), query)
+
+        return httplib.NOT_FOUND, {'code': 404, 'type': 'notFoundError',
+                                   'message': 'Not found',
+                                   'details': path}, {}
+
+    def _failure(self, method, path, data):
+        for failure in self.failures:
+            if failure['method'] != method or \
+               not failure['path'].match(path) or \
+               failure['count'] == 0:
+                continue
+            if failure['match'] and not failure['match'](data):
+                continue
+            if failure['count'] is not None:
+                failure['count'] -= 1
+            return failure
+        return None
+
+    def _entities(self, method, chunks, query, data):
+        if not chunks:
+            if method == 'POST':
+                entity = self.add_entity(data['label'],
+                                         data.get('ip_addresses'),
+                                         data.get('metadata'))
+                return self._created('/entities/%s' % (entity['id']))
+            return self._page(list(self.entities), query)
+
+        entity = self.get_entity(chunks[0])
+        if entity is None:
+            return httplib.NOT_FOUND, {'code': 404, 'type': 'notFoundError',
+                                       'message': 'Object does not exist',
+                                       'details': chunks[0]}, {}
+
+        if len(chunks) == 1:
+            return self._object(method, self.entities, entity, data,
+                                '/entities/%s' % (entity['id']))
+
+        children = {'checks': self.checks,
+                    'alarms': self.alarms}[chunks[1]][entity['id']]
+        url = '/entities/%s/%s' % (entity['id'], chunks[1])
+
+        if len(chunks) == 2:
+            if method == 'POST':
+                with self.lock:
+                    if chunks[1] == 'checks':
+                        child = self._check(data)
+                    else:
+                        child = dict(data, id=self._next_id('al'))
+                    children.append(child)
+                return self._created('%s/%s' % (url, child['id']))
+            return self._page(list(children), query)
+
+        for child in children:
+            if child['id'] == chunks[2]:
+                return self._object(method, children, child, data,
+                                    '%s/%s' % (url, child['id']))
+        return httplib.NOT_FOUND, {'code': 404, 'type': 'notFoundError',
+                                   'message': 'Object does not exist',
+                                   'details': chunks[2]}, {}
+
+    def _check(self, data):
+        check = {'label': None, 'monitoring_zones_poll': [],
+                 'target_alias': None, 'target_resolver': None,
+                 'details': {}}
+        check.update(data)
+        check['id'] = self._next_id('ch')
+        return check
+
+    def _object(self, method, collection, obj, data, url):
+        if method == 'GET':
+            return httplib.OK, obj, {}
+        elif method == 'PUT':
+            with self.lock:
+                obj.update(data)
+            return httplib.NO_CONTENT, None, {'location': BASE_URL + url}
+        elif method == 'DELETE':
+            with self.lock:
+                collection.remove(obj)
+            return httplib.NO_CONTENT, None, {}
+
+        return httplib.METHOD_NOT_ALLOWED, None, {}
+
+    def _created(self, url):
+        return httplib.CREATED, None, {'location': BASE_URL + url}
+
+    def _overview(self, entity_ids):
+        items = []
+        for entity in self.entities:
+            if entity_ids and entity['id'] not in entity_ids:
+                continue
+            states = self.alarm_states.get(entity['id'], {})
+            items.append({'entity': entity,
+                          'checks': list(self.checks[entity['id']]),
+                          'alarms': list(self.alarms[entity['id']]),
+                          'latest_alarm_states': [states[alarm_id] for
+                                                  alarm_id in sorted(states)]})
+        return items
+
+    def _changes(self, query):
+        start = int(query.get('from', [0])[0])
+        entity_ids = query.get('entityId')
+        return [change for change in self.changelog
+                if change['timestamp'] >= start and
+                (not entity_ids or change['entity_id'] in entity_ids)]
+
+    def _page(self, items, query, key=lambda item: item['id']):
+        limit = int(query.get('limit', [self.page_size])[0])
+        start = 0
+        marker, next_marker = None, None
+        if 'marker' in query:
+            marker = query['marker'][0]
+            start = [key(item) for item in items].index(marker)
+
+        values = items[start:start + limit]
+        if start + limit < len(items):
+            next_marker = key(items[start + limit])
+
+        return httplib.OK, {'values': values,
+                            'metadata': {'count': len(values),
+                                         'limit': limit, 'marker': marker,
+                                         'next_marker': next_marker}}, {}
+
+
+class FakeApiHttp(MockHttp):
+    """
+    Mock HTTP connection which sends every request to
+    C{FakeApiHttp.api}.
+    """
+
+    api = None
+
+    def request(self, method, url, body=None, headers=None, raw=False):
+        parsed = urlparse.urlparse(url)
+        path = parsed.path
+        prefix = '/' + TENANT_ID
+        if path.startswith(prefix):
+            path = path[len(prefix):]
+
+        data = body and json.loads(body) or None
+        status, body, headers = self.api.handle(method, path.rstrip('/'),
+                                                parse_qs(parsed.query),
+                                                data)
+        headers = dict(JSON_CONTENT_HEADERS, **headers)
+        if body is None:
+            body = ''
+        else:
+            body = json.dumps(body)
+        self.response = self.responseCls(status, body, headers,
+                                         httplib.responses[status])
+
+
+def fake_driver(api, **kwargs):
+    """
+    Return a driver whose requests are served by the provided
+    L{FakeMonitoringApi}. The keyword arguments are passed to the driver.
+    """
+    RackspaceMonitoringDriver.connectionCls.conn_classes = (FakeApiHttp,
+                                                            FakeApiHttp)
+    FakeApiHttp.api = api
+    return RackspaceMonitoringDriver(ex_force_base_url=BASE_URL,
+                                     ex_auth_token='token',
+                                     ex_tenant_ids={'compute': TENANT_ID},
+                                     *RACKSPACE_PARAMS[:2], **kwargs)
@@ -0,0 +1,123 @@
+# Licensed to the Apache Software Foundation (ASF) under one or more
+# contributor license agreements.  See the NOTICE file distributed with
+# this work for additional information regarding copyright ownership.
+# The ASF licenses this file to You under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with
+# the License.  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import sys
+import unittest
+
+from rackspace_monitoring.base import Check, AlarmChangelog
+from rackspace_monitoring.drivers.rackspace import LatestAlarmState
+from rackspace_monitoring import aggregation
+from rackspace_monitoring.aggregation import AlarmStateAggregator
+
+
+def _check(id, type, zones):
+    return Check(id=id, label=id, timeout=30, period=60,
+                 monitoring_zones=zones, target_alias=None,
+                 target_resolver=None, type=type, details={},
+                 entity_id=None, driver=None)
+
+
+def _state(entity_id, check_id, state):
+    return LatestAlarmState(entity_id=entity_id, check_id=check_id,
+                            alarm_id='al' + check_id, timestamp=0,
+                            state=state)
+
+
+def _log(entity_id, check_id, state, timestamp):
+    return AlarmChangelog(id=str(timestamp), alarm_id='al' + check_id,
+                          entity_id=entity_id, check_id=check_id,
+                          state=state, timestamp=timestamp)
+
+
+OVERVIEW = [
+    {'entity': None,
+     'checks': [_check('chA', 'remote.http', ['mzA', 'mzB']),
+                _check('chB', 'remote.ping', ['mzA'])],
+     'alarms': [],
+     'latest_alarm_states': [_state('enOne', 'chA', 'OK'),
+                             _state('enOne', 'chB', 'CRITICAL')]},
+    {'entity': None,
+     'checks': [_check('chC', 'remote.http', ['mzB'])],
+     'alarms': [],
+     'latest_alarm_states': [_state('enTwo', 'chC', 'CRITICAL')]},
+]
+
+# deliberately out of order
+CHANGELOG = [
+    _log('enOne', 'chA', 'CRITICAL', 2),
+    _log('enOne', 'chA', 'OK', 1),
+    _log('enOne', 'chA', 'OK', 3),
+    _log('enTwo', 'chC', 'WARNING', 1),
+    _log('enTwo', 'chC', 'WARNING', 2),
+]
+
+
+class AlarmStateAggregatorTests(unittest.TestCase):
+    def setUp(self):
+        if aggregation.numpy is None:
+            self.skipTest('numpy is not installed')
+
+        self.aggregator = AlarmStateAggregator()
+        self.aggregator.add_overview(OVERVIEW)
+        self.aggregator.add_changelog(CHANGELOG)
+
+    def test_state_counts_by_entity(self):
+        result = self.aggregator.state_counts(by='entity')
+        self.assertEqual(result, {'enOne': {'OK': 1, 'CRITICAL': 1},
+                                  'enTwo': {'CRITICAL': 1}})
+
+    def test_state_counts_by_check_type(self):
+        result = self.aggregator.state_counts(by='check_type')
+        self.assertEqual(result, {'remote.http': {'OK': 1, 'CRITICAL': 1},
+                                  'remote.ping': {'CRITICAL': 1}})
+
+    def test_state_counts_by_zone(self):
+        result = self.aggregator.state_counts(by='zone')
+        self.assertEqual(result, {'mzA': {'OK': 1, 'CRITICAL': 1},
+                                  'mzB': {'OK': 1, 'CRITICAL': 1}})
+
+    def test_state_counts_invalid_group(self):
+        self.assertRaises(ValueError, self.aggregator.state_counts,
+                          by='label')
+
+    def test_transition_matrix(self):
+        states, counts = self.aggregator.transition_matrix()
+        ok, critical = states.index('OK'), states.index('CRITICAL')
+        warning = states.index('WARNING')
+        self.assertEqual(counts[ok, critical], 1)
+        self.assertEqual(counts[critical, ok], 1)
+        self.assertEqual(counts[warning, warning], 1)
+        self.assertEqual(counts.sum(), 3)
+
+    def test_transition_rates(self):
+        states, rates = self.aggregator.transition_rates()
+        ok = states.index('OK')
+        self.assertEqual(rates[ok].sum(), 1.0)
+        self.assertEqual(rates[states.index('CRITICAL'), ok], 1.0)
+
+    def test_transition_counts(self):
+        result = self.aggregator.transition_counts(by='entity')
+        self.assertEqual(result, {'enOne': 2})
+        result = self.aggregator.transition_counts(by='check_type')
+        self.assertEqual(result, {'remote.http': 2})
+
+    def test_empty(self):
+        aggregator = AlarmStateAggregator()
+        self.assertEqual(aggregator.state_counts(by='entity'), {})
+        self.assertEqual(aggregator.transition_matrix()[1].shape, (0, 0))
+
+
+if __name__ == '__main__':
+    sys.exit(unittest.main())
@@ -0,0 +1,207 @@
+# Licensed to the Apache Software Foundation (ASF) under one or more
+# contributor license agreements.  See the NOTICE file distributed with
+# this work for additional information regarding copyright ownership.
+# The ASF licenses this file to You under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with
+# the License.  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+import sys
+import shutil
+import httplib
+import tempfile
+import unittest
+
+try:
+    import simplejson as json
+except:
+    import json
+
+from rackspace_monitoring.drivers.rackspace import RackspaceMonitoringDriver
+from rackspace_monitoring.cli import AuthCache, main
+
+from test.test_rackspace import RackspaceMockHttp
+from secrets import RACKSPACE_PARAMS
+
+
+class CliTests(unittest.TestCase):
+    def setUp(self):
+        RackspaceMonitoringDriver.connectionCls.conn_classes = (
+                RackspaceMockHttp, RackspaceMockHttp)
+        RackspaceMonitoringDriver.connectionCls.auth_url = \
+                'https://auth.api.example.com/v1.1/'
+        RackspaceMockHttp.type = None
+        self.tokens = RackspaceMockHttp.__dict__['_v2_0_tokens']
+        self.check_types = RackspaceMockHttp.__dict__['_23213_check_types']
+        self.entities = RackspaceMockHttp.__dict__['_23213_entities']
+        self.entity = RackspaceMockHttp.__dict__['_23213_entities_en8B9YwUn6']
+        self.tmp_dir = tempfile.mkdtemp()
+        self.cache_path = os.path.join(self.tmp_dir, 'cache.json')
+        self.output_path = os.path.join(self.tmp_dir, 'output.jsonl')
+
+    def tearDown(self):
+        RackspaceMockHttp._v2_0_tokens = self.tokens
+        RackspaceMockHttp._23213_check_types = self.check_types
+        RackspaceMockHttp._23213_entities = self.entities
+        RackspaceMockHttp._23213_entities_en8B9YwUn6 = self.entity
+        shutil.rmtree(self.tmp_dir)
+
+    def raxmon(self, *args):
+        argv = ['-u', RACKSPACE_PARAMS[0], '-k', RACKSPACE_PARAMS[1],
+                '--base-url', 'http://www.todo.com',
+                '--cache-file', self.cache_path, '-o', self.output_path]
+        status = main(argv + list(args))
+        fp = open(self.output_path, 'r')
+        records = [json.loads(line) for line in fp]
+        fp.close()
+        return status, records
+
+    def fail_requests(self, name):
+        def handler(*args):
+            raise AssertionError('Unexpected request')
+        setattr(RackspaceMockHttp, name, handler)
+
+    def expired(self, mock):
+        body = json.dumps({'code': 401, 'type': 'unauthorizedError',
+                           'message': 'Token expired'})
+        return (httplib.UNAUTHORIZED, body, mock.json_content_headers,
+                httplib.responses[httplib.UNAUTHORIZED])
+
+    def count_tokens(self, calls):
+        tokens = self.tokens
+
+        def handler(mock, *args):
+            calls['tokens'] += 1
+            return tokens(mock, *args)
+        RackspaceMockHttp._v2_0_tokens = handler
+
+    def test_list_entities(self):
+        status, records = self.raxmon('list', 'entities')
+        self.assertEqual(status, 0)
+        self.assertEqual(len(records), 6)
+        self.assertEqual(records[0]['id'], 'en8B9YwUn6')
+        self.assertFalse('driver' in records[0])
+
+    def test_auth_token_is_cached(self):
+        self.raxmon('list', 'notifications')
+        cache = AuthCache(self.cache_path)
+        entry = cache.get(cache.key(RACKSPACE_PARAMS[0]))
+        self.assertEqual(entry['tenant_ids']['compute'], '23213')
+        self.assertFalse(RACKSPACE_PARAMS[1] in open(self.cache_path).read())
+
+        self.fail_requests('_v2_0_tokens')
+        status, records = self.raxmon('list', 'notifications')
+        self.assertEqual(status, 0)
+        self.assertTrue(records)
+
+        # An expired entry isn't used
+        cache.ttl = -1
+        self.assertEqual(cache.get(cache.key(RACKSPACE_PARAMS[0])), None)
+
+    def test_catalog_is_cached(self):
+        status, first = self.raxmon('list', 'check_types')
+        self.fail_requests('_23213_check_types')
+        status, second = self.raxmon('list', 'check_types')
+        self.assertEqual(first, second)
+        self.assertRaises(AssertionError, self.raxmon, '--no-cache', 'list',
+                          'check_types')
+
+    def test_list_checks_fan_out(self):
+        status, records = self.raxmon('list', 'checks', '--entity',
+                                      'en8B9YwUn6', '--parallel', '2')
+        self.assertEqual(status, 0)
+        self.assertTrue(records)
+        self.assertEqual(set([record['entity_id'] for record in records]),
+                         set(['en8B9YwUn6']))
+
+    def test_fan_out_expired_token(self):
+        self.raxmon('list', 'notifications')
+        calls = {'tokens': 0, 'entities': 0}
+
+        def expired(mock, *args):
+            calls['entities'] += 1
+            return self.expired(mock)
+
+        self.count_tokens(calls)
+        RackspaceMockHttp._23213_entities = expired
+        # The error isn't swallowed by the fan-out (raxmon exits with a
+        # non-zero status), after authenticating again and retrying once.
+        self.assertRaises(Exception, self.raxmon, 'list', 'checks')
+        self.assertEqual(calls, {'tokens': 1, 'entities': 2})
+        self.assertEqual(open(self.output_path).read(), '')
+
+    def test_get_and_delete(self):
+        status, records = self.raxmon('get', 'entities', 'en8B9YwUn6')
+        self.assertEqual(records[0]['id'], 'en8B9YwUn6')
+
+        status, records = self.raxmon('delete', 'checks', 'chhJwYeArX',
+                                      '--entity', 'en8B9YwUn6')
+        self.assertEqual(records, [{'id': 'chhJwYeArX', 'deleted': True}])
+
+    def test_get_update_delete_expired_token(self):
+        self.raxmon('list', 'notifications')
+        calls = {'tokens': 0, 'expired': 0}
+        entity = self.entity
+
+        def expire_once(mock, method, *args):
+            if not calls['expired']:
+                calls['expired'] += 1
+                return self.expired(mock)
+            if method == 'PUT':
+                return (httplib.NO_CONTENT, '', {'location':
+                        'http://www.todo.com/entities/en8B9YwUn6'},
+                        httplib.responses[httplib.NO_CONTENT])
+            return entity(mock, method, *args)
+
+        self.count_tokens(calls)
+        RackspaceMockHttp._23213_entities_en8B9YwUn6 = expire_once
+        for args in [('get',), ('update', '--data', '{"label": "web01"}'),
+                     ('delete',)]:
+            calls['expired'] = 0
+            status, records = self.raxmon(*(args + ('entities',
+                                                    'en8B9YwUn6')))
+            self.assertEqual(status, 0)
+            self.assertEqual(len(records), 1)
+            self.assertEqual(calls['expired'], 1)
+        # Authenticated again once per command
+        self.assertEqual(calls['tokens'], 3)
+
+    def test_create_entity_metadata(self):
+        requests = []
+
+        def create(mock, method, url, body, headers):
+            requests.append(json.loads(body))
+            return (httplib.CREATED, '', {'location':
+                    'http://www.todo.com/entities/en8B9YwUn6'},
+                    httplib.responses[httplib.CREATED])
+
+        RackspaceMockHttp._23213_entities = create
+        status, records = self.raxmon('create', 'entities', '--data',
+                                      '{"label": "web01", '
+                                      '"metadata": {"env": "prod"}}')
+        self.assertEqual(status, 0)
+        self.assertEqual(requests[0]['metadata'], {'env': 'prod'})
+        self.assertEqual(records[0]['id'], 'en8B9YwUn6')
+
+        status, records = self.raxmon('create', 'entities', '--data',
+                                      '{"label": "web01", "metadata": {}, '
+                                      '"extra": {}}')
+        self.assertEqual(status, 1)
+        self.assertEqual(len(requests), 1)
+
+    def test_invalid_arguments(self):
+        self.assertEqual(self.raxmon('list', 'servers')[0], 1)
+        self.assertEqual(self.raxmon('delete', 'check_types', 'x')[0], 1)
+        self.assertEqual(self.raxmon('delete', 'checks', 'chhJwYeArX')[0], 1)
+
+
+if __name__ == '__main__':
+    sys.exit(unittest.main())
@@ -0,0 +1,136 @@
+# Licensed to the Apache Software Foundation (ASF) under one or more
+# contributor license agreements.  See the NOTICE file distributed with
+# this work for additional information regarding copyright ownership.
+# The ASF licenses this file to You under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with
+# the License.  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+import sys
+import unittest
+from os.path import join as pjoin
+
+try:
+    import simplejson as json
+except:
+    import json
+
+from rackspace_monitoring import criteria as criteria_module
+from rackspace_monitoring.criteria import (CriteriaSyntaxError,
+                                           compile_criteria,
+                                           evaluate_criteria, clear_cache)
+
+CHECK_DATA = json.load(open(pjoin(os.getcwd(),
+                                  'test/fixtures/rackspace/v1.0',
+                                  'test_check.json')))
+
+
+class CriteriaTests(unittest.TestCase):
+    def setUp(self):
+        clear_cache()
+
+    def _evaluate(self, criteria, metrics, previous=None, elapsed=None):
+        compiled = compile_criteria(criteria)
+        return compiled.evaluate_metrics(metrics, previous, elapsed)
+
+    def test_default_return(self):
+        result = evaluate_criteria('return OK', CHECK_DATA)
+        self.assertEqual(result, [{'timestamp': 1319222001982,
+                                   'computed_state': 'OK',
+                                   'status': 'Matched default return '
+                                             'statement'}])
+
+    def test_string_and_numeric_comparison(self):
+        criteria = ('if (metric["code"] == "404") '
+                    '{ return CRITICAL, "not found" }\n'
+                    'if (metric["duration"] > 200) '
+                    '{ return WARNING, "slow #{duration}ms" }\n'
+                    'return OK')
+        result = evaluate_criteria(criteria, CHECK_DATA)
+        self.assertEqual(result[0]['computed_state'], 'WARNING')
+        self.assertEqual(result[0]['status'], 'slow 257ms')
+
+        self.assertEqual(self._evaluate(criteria, {'code': '404'}),
+                         ('CRITICAL', 'not found'))
+        self.assertEqual(self._evaluate(criteria, {'code': 404}),
+                         ('CRITICAL', 'not found'))
+
+    def test_boolean_operators_and_regex(self):
+        criteria = """
+            :set consecutiveCount=2
+            // comment
+            if (metric['code'] regex '^5' || !(metric['up'] == 1) &&
+                metric['x'] nregex 'foo') {
+                return new AlarmStatus(CRITICAL);
+            } else if (metric['x'] == 'foo') {
+                return WARNING
+            } else {
+                return OK, 'fine'
+            }
+        """
+        compiled = compile_criteria(criteria)
+        self.assertEqual(compiled.settings, {'consecutiveCount': 2})
+        self.assertEqual(self._evaluate(criteria, {'code': '503'})[0],
+                         'CRITICAL')
+        self.assertEqual(self._evaluate(criteria, {'up': 0, 'x': 'bar'})[0],
+                         'CRITICAL')
+        self.assertEqual(self._evaluate(criteria, {'up': 0, 'x': 'foo'}),
+                         ('WARNING', 'Matched return statement on line 8'))
+        self.assertEqual(self._evaluate(criteria, {'up': 1, 'x': 'a'}),
+                         ('OK', 'fine'))
+
+    def test_previous_and_rate(self):
+        criteria = ('if (rate(metric["bytes"]) > 10) { return CRITICAL }\n'
+                    'if (previous(metric["bytes"]) < -1) { return WARNING }\n'
+                    'return OK')
+        self.assertEqual(self._evaluate(criteria, {'bytes': 100},
+                                        {'bytes': 0}, 5)[0], 'CRITICAL')
+        self.assertEqual(self._evaluate(criteria, {'bytes': 100},
+                                        {'bytes': -5}, None)[0], 'WARNING')
+        self.assertEqual(self._evaluate(criteria, {'bytes': 100})[0], 'OK')
+
+    def test_cache(self):
+        criteria = 'return CRITICAL'
+        self.assertTrue(compile_criteria(criteria) is
+                        compile_criteria(criteria))
+
+    def test_cache_is_bounded(self):
+        size = criteria_module.CACHE_SIZE
+        criteria_module.CACHE_SIZE = 2
+        try:
+            first = compile_criteria('return OK')
+            second = compile_criteria('return WARNING')
+            # Used last, so the second one is dropped instead
+            compile_criteria('return OK')
+            compile_criteria('return CRITICAL')
+        finally:
+            criteria_module.CACHE_SIZE = size
+
+        self.assertEqual(len(criteria_module._cache), 2)
+        self.assertTrue(compile_criteria('return OK') is first)
+        self.assertFalse(compile_criteria('return WARNING') is second)
+
+    def test_syntax_errors(self):
+        for criteria in ['if (metric["a"] == 1) { return OK',
+                         'return BROKEN',
+                         'if metric["a"] { return OK }',
+                         'return OK @']:
+            self.assertRaises(CriteriaSyntaxError, compile_criteria,
+                              criteria)
+
+        try:
+            compile_criteria('return OK\nreturn FOO')
+        except CriteriaSyntaxError, e:
+            self.assertEqual(e.line, 2)
+
+
+if __name__ == '__main__':
+    sys.exit(unittest.main())
@@ -0,0 +1,136 @@
+# Licensed to the Apache Software Foundation (ASF) under one or more
+# contributor license agreements.  See the NOTICE file distributed with
+# this work for additional information regarding copyright ownership.
+# The ASF licenses this file to You under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with
+# the License.  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+import sys
+import imp
+import httplib
+import unittest
+
+from wsgiref.util import setup_testing_defaults
+
+try:
+    import simplejson as json
+except:
+    import json
+
+from rackspace_monitoring.drivers.rackspace import RackspaceMonitoringDriver
+
+from test.test_rackspace import RackspaceMockHttp
+from secrets import RACKSPACE_PARAMS
+
+APP_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(
+                        __file__))), 'demo', 'web', 'app.py')
+
+try:
+    import cherrypy
+    import jinja2
+except ImportError:
+    cherrypy = None
+
+
+class DemoMockHttp(RackspaceMockHttp):
+    calls = {}
+    expired = 0
+
+    def _v2_0_tokens(self, method, url, body, headers):
+        DemoMockHttp.calls['tokens'] = DemoMockHttp.calls.get('tokens', 0) + 1
+        return RackspaceMockHttp._v2_0_tokens(self, method, url, body,
+                                              headers)
+
+    def _23213_entities(self, method, url, body, headers):
+        DemoMockHttp.calls['entities'] = \
+            DemoMockHttp.calls.get('entities', 0) + 1
+        if DemoMockHttp.expired:
+            DemoMockHttp.expired -= 1
+            body = json.dumps({'code': 401, 'type': 'unauthorizedError',
+                               'message': 'Token expired'})
+            return (httplib.UNAUTHORIZED, body, self.json_content_headers,
+                    httplib.responses[httplib.UNAUTHORIZED])
+
+        data = json.loads(self.fixtures.load('entities.json'))
+        data['metadata']['next_marker'] = 'en&x y'
+        return (httplib.OK, json.dumps(data), self.json_content_headers,
+                httplib.responses[httplib.OK])
+
+
+class DemoAppTests(unittest.TestCase):
+    app = None
+
+    def setUp(self):
+        if cherrypy is None:
+            self.skipTest('cherrypy and jinja2 are not installed')
+
+        RackspaceMonitoringDriver.connectionCls.conn_classes = (
+                DemoMockHttp, DemoMockHttp)
+        RackspaceMonitoringDriver.connectionCls.auth_url = \
+                'https://auth.api.example.com/v1.1/'
+        DemoMockHttp.type = None
+        DemoMockHttp.calls = {}
+        DemoMockHttp.expired = 0
+
+        if DemoAppTests.app is None:
+            # Mounts the application on cherrypy.tree
+            DemoAppTests.app = imp.load_source('demo_web_app', APP_PATH)
+            cherrypy.config.update({'log.screen': False})
+        self.app.API_URL = 'http://www.todo.com'
+
+        self.cookie = ('monitoring_username=%s; monitoring_apikey=%s' %
+                       RACKSPACE_PARAMS[:2])
+
+    def request(self, path, query='', cookie=None):
+        environ = {'PATH_INFO': path, 'QUERY_STRING': query}
+        if cookie:
+            environ['HTTP_COOKIE'] = cookie
+        setup_testing_defaults(environ)
+
+        response = []
+
+        def start_response(status, headers, exc_info=None):
+            response.append(status)
+
+        body = ''.join(cherrypy.tree(environ, start_response))
+        return int(response[0].split()[0]), body
+
+    def test_index(self):
+        status, body = self.request('/')
+        self.assertEqual(status, 200)
+
+        status, body = self.request('/', cookie=self.cookie)
+        # Redirected to the list of entities
+        self.assertTrue(status in (302, 303))
+
+    def test_list_entities(self):
+        status, body = self.request('/list_entities', 'limit=10',
+                                    cookie=self.cookie)
+        self.assertEqual(status, 200)
+        self.assertTrue('en8B9YwUn6' in body)
+        self.assertTrue('marker=en%26x%20y&amp;limit=10' in body)
+
+    def test_list_entities_expired_token(self):
+        self.request('/list_entities', 'limit=11', cookie=self.cookie)
+        DemoMockHttp.calls = {}
+        DemoMockHttp.expired = 1
+
+        # The pooled driver authenticates again and the request is retried
+        status, body = self.request('/list_entities', 'limit=12',
+                                    cookie=self.cookie)
+        self.assertEqual(status, 200)
+        self.assertTrue('en8B9YwUn6' in body)
+        self.assertEqual(DemoMockHttp.calls, {'tokens': 1, 'entities': 2})
+
+
+if __name__ == '__main__':
+    sys.exit(unittest.main())
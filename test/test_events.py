@@ -0,0 +1,152 @@
+# Licensed to the Apache Software Foundation (ASF) under one or more
+# contributor license agreements.  See the NOTICE file distributed with
+# this work for additional information regarding copyright ownership.
+# The ASF licenses this file to You under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with
+# the License.  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import sys
+import time
+import threading
+import unittest
+
+from rackspace_monitoring.base import AlarmChangelog
+from rackspace_monitoring.events import EventBus
+
+from test.fakes import FakeMonitoringApi, fake_driver, wait_for
+
+CHECK_TYPES = {'ch1': 'remote.http', 'ch2': 'remote.ping'}
+
+
+def change(i, entity_id='en1', check_id='ch1', state='CRITICAL',
+           timestamp=None):
+    return AlarmChangelog(id='cl%d' % (i), alarm_id='al1',
+                          entity_id=entity_id, check_id=check_id,
+                          state=state, timestamp=timestamp or i)
+
+
+class EventBusTests(unittest.TestCase):
+    def setUp(self):
+        self.api = FakeMonitoringApi()
+        self.driver = fake_driver(self.api)
+        self.bus = EventBus(self.driver, max_workers=2,
+                            check_type_resolver=lambda entity_id, check_id:
+                            CHECK_TYPES[check_id])
+
+    def tearDown(self):
+        self.bus.stop()
+
+    def test_filters_and_batches(self):
+        batches = []
+        critical = []
+        self.bus.subscribe(batches.append, batch_window=10, max_batch=3)
+        self.bus.subscribe(critical.extend, entity_ids=['en2'],
+                           check_types=['remote.ping'], states=['CRITICAL'])
+        self.bus.start()
+
+        self.bus.publish([change(1), change(2, entity_id='en2'),
+                          change(3, entity_id='en2', check_id='ch2'),
+                          change(4, entity_id='en2', check_id='ch2',
+                                 state='OK')])
+        self.bus.stop()
+
+        self.assertEqual([len(batch) for batch in batches], [3, 1])
+        self.assertEqual([item.id for item in batches[0]],
+                         ['cl1', 'cl2', 'cl3'])
+        self.assertEqual([item.id for item in critical], ['cl3'])
+
+    def test_batch_window(self):
+        batches = []
+        self.bus.subscribe(batches.append, batch_window=0.05)
+        self.bus.start()
+        self.bus.publish([change(1), change(2)])
+
+        self.assertTrue(wait_for(lambda: batches))
+        self.assertEqual(len(batches), 1)
+        self.assertEqual(len(batches[0]), 2)
+
+    def test_backpressure_and_failures(self):
+        release = threading.Event()
+        delivered = []
+        errors = []
+
+        def slow(batch):
+            release.wait()
+            delivered.extend(batch)
+
+        def failing(batch):
+            raise ValueError('ticketing is down')
+
+        self.bus.on_error = lambda handler, batch, e: errors.append(e)
+        self.bus.subscribe(slow, batch_window=0, max_batch=1, max_pending=2)
+        failing_handler = self.bus.subscribe(failing, batch_window=0)
+        self.bus.start()
+
+        publisher = threading.Thread(target=self.bus.publish,
+                                     args=([change(i) for i in
+                                            range(1, 11)],))
+        publisher.start()
+        publisher.join(0.3)
+        # Blocked until the slow handler catches up
+        self.assertTrue(publisher.isAlive())
+
+        release.set()
+        publisher.join()
+        self.bus.stop()
+        self.assertEqual([item.id for item in delivered],
+                         ['cl%d' % (i) for i in range(1, 11)])
+        self.assertTrue(failing_handler.errors > 0)
+        self.assertTrue(isinstance(errors[0], ValueError))
+
+    def test_failing_error_callback(self):
+        bus = EventBus(self.driver, max_workers=1)
+        delivered = []
+
+        def on_error(handler, batch, e):
+            raise RuntimeError('on_error is broken too')
+
+        def failing(batch):
+            raise ValueError('ticketing is down')
+
+        bus.on_error = on_error
+        failing_handler = bus.subscribe(failing, batch_window=0,
+                                        max_batch=1)
+        bus.subscribe(delivered.extend, batch_window=0)
+        bus.start()
+        bus.publish([change(1)])
+        bus.publish([change(2)])
+
+        stopper = threading.Thread(target=bus.stop)
+        stopper.daemon = True
+        stopper.start()
+        stopper.join(2)
+        self.assertFalse(stopper.isAlive())
+        self.assertEqual(failing_handler.errors, 2)
+        self.assertEqual([item.id for item in delivered], ['cl1', 'cl2'])
+
+    def test_poll_once(self):
+        seen = []
+        self.bus.subscribe(seen.extend, batch_window=0)
+        self.bus.start()
+        self.assertEqual(self.bus.poll_once(), 0)
+
+        now = int(time.time() * 1000)
+        for timestamp in [now - 1000, now + 1, now + 2]:
+            self.api.set_alarm_state('en1', 'ch1', 'al1', 'CRITICAL',
+                                     timestamp)
+        self.assertEqual(self.bus.poll_once(), 2)
+        self.assertEqual(self.bus.poll_once(), 0)
+        self.bus.stop()
+        self.assertEqual(sorted([item.id for item in seen]), ['cl1', 'cl2'])
+
+
+if __name__ == '__main__':
+    sys.exit(unittest.main())
@@ -0,0 +1,145 @@
+# Licensed to the Apache Software Foundation (ASF) under one or more
+# contributor license agreements.  See the NOTICE file distributed with
+# this work for additional information regarding copyright ownership.
+# The ASF licenses this file to You under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with
+# the License.  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import sys
+import unittest
+
+from rackspace_monitoring.base import (Entity, Check, Alarm, Notification,
+                                      NotificationPlan)
+from rackspace_monitoring.drivers.rackspace import RackspaceMonitoringDriver
+from rackspace_monitoring.graph import DependencyGraph, DependencyError
+
+from test.test_rackspace import RackspaceMockHttp
+from secrets import RACKSPACE_PARAMS
+
+
+class DependencyGraphTests(unittest.TestCase):
+    def setUp(self):
+        self.entity = Entity(id='en1', label='web', ip_addresses=[],
+                             driver=None)
+        self.check = Check(id='ch1', label='http', timeout=30, period=60,
+                           monitoring_zones=[], target_alias=None,
+                           target_resolver=None, type='remote.http',
+                           details={}, entity_id='en1', driver=None)
+        self.email = Notification(id='nt1', label='email', type='email',
+                                  details={}, driver=None)
+        self.pager = Notification(id='nt2', label='pager', type='webhook',
+                                  details={}, driver=None)
+        self.plan = NotificationPlan(id='np1', label='ops', driver=None,
+                                     critical_state=['nt2'],
+                                     warning_state=['nt1'],
+                                     ok_state=['nt1'])
+        self.alarm = Alarm(id='al1', type='remote.http', criteria='',
+                           notification_plan_id='np1', driver=None,
+                           entity_id='en1', check_id='ch1')
+
+        self.graph = DependencyGraph()
+        self.graph.add_many([self.entity, self.check, self.email,
+                             self.pager, self.plan, self.alarm])
+
+    def test_reverse_dependencies(self):
+        self.assertEqual(self.graph.plans_for_notification(self.email),
+                         [self.plan])
+        self.assertEqual(self.graph.alarms_for_notification(self.pager),
+                         [self.alarm])
+        self.assertEqual(self.graph.alarms_for_notification_plan(self.plan),
+                         [self.alarm])
+        self.assertEqual(self.graph.alarms_for_check(self.check),
+                         [self.alarm])
+        self.assertEqual(self.graph.checks_for_entity(self.entity),
+                         [self.check])
+
+    def test_references(self):
+        references = self.graph.references(self.alarm)
+        self.assertEqual(len(references), 3)
+        self.assertTrue(self.plan in references)
+        notifications = self.graph.references(self.plan, kind='notification')
+        self.assertEqual(sorted([obj.id for obj in notifications]),
+                         ['nt1', 'nt2'])
+        self.assertEqual(self.graph.missing_references(self.alarm), [])
+
+    def test_impact(self):
+        impact = self.graph.impact(self.pager)
+        self.assertEqual(len(impact), 2)
+        self.assertTrue(self.plan in impact and self.alarm in impact)
+        self.assertEqual(self.graph.impact(self.alarm), [])
+
+    def test_update_and_remove(self):
+        plan = NotificationPlan(id='np1', label='ops', driver=None,
+                                critical_state=['nt1'])
+        self.graph.add(plan)
+        self.assertEqual(self.graph.plans_for_notification(self.pager), [])
+        self.assertEqual(self.graph.alarms_for_notification(self.email),
+                         [self.alarm])
+
+        self.graph.remove(self.alarm)
+        self.assertEqual(self.graph.alarms_for_notification_plan(plan), [])
+        self.graph.check_delete(plan)
+
+        self.graph.remove(self.email)
+        self.assertEqual(self.graph.missing_references(plan),
+                         [('notification', 'nt1')])
+
+    def test_check_delete(self):
+        self.assertRaises(DependencyError, self.graph.check_delete,
+                          self.plan)
+        try:
+            self.graph.check_delete(self.email)
+        except DependencyError, e:
+            self.assertEqual(e.dependents, [self.plan])
+        else:
+            self.fail('DependencyError not raised')
+
+
+class DriverDependencyGraphTests(unittest.TestCase):
+    def setUp(self):
+        RackspaceMonitoringDriver.connectionCls.conn_classes = (
+                RackspaceMockHttp, RackspaceMockHttp)
+        RackspaceMonitoringDriver.connectionCls.auth_url = \
+                'https://auth.api.example.com/v1.1/'
+        RackspaceMockHttp.type = None
+        self.driver = RackspaceMonitoringDriver(*RACKSPACE_PARAMS,
+                ex_force_base_url='http://www.todo.com')
+        snapshot = self.driver.ex_fetch_account_snapshot()
+        self.graph = DependencyGraph.from_snapshot(snapshot)
+
+    def test_delete_referenced_notification_plan(self):
+        plan = [plan for plan in self.driver.list_notification_plans() if
+                plan.id == 'npIXxOAn5'][0]
+        self.assertRaises(DependencyError,
+                          self.driver.delete_notification_plan, plan,
+                          ex_dependency_graph=self.graph)
+
+        alarm = self.graph.alarms_for_notification_plan(plan)[0]
+        self.graph.remove(alarm)
+        self.assertTrue(self.driver.delete_notification_plan(plan,
+                                            ex_dependency_graph=self.graph))
+        self.assertFalse(plan in self.graph)
+
+    def test_delete_referenced_notification(self):
+        notification = self.driver.list_notifications()[0]
+        plan = NotificationPlan(id='npNew', label='new', driver=None,
+                                critical_state=[notification.id])
+        self.graph.add(plan)
+        self.assertRaises(DependencyError, self.driver.delete_notification,
+                          notification, ex_dependency_graph=self.graph)
+
+        self.graph.remove(plan)
+        self.assertTrue(self.driver.delete_notification(notification,
+                                            ex_dependency_graph=self.graph))
+
+
+if __name__ == '__main__':
+    sys.exit(unittest.main())
@@ -0,0 +1,156 @@
+# Licensed to the Apache Software Foundation (ASF) under one or more
+# contributor license agreements.  See the NOTICE file distributed with
+# this work for additional information regarding copyright ownership.
+# The ASF licenses this file to You under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with
+# the License.  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+import sys
+import httplib
+import tempfile
+import unittest
+import urlparse
+
+from rackspace_monitoring.drivers.rackspace import RackspaceMonitoringDriver
+from rackspace_monitoring.history import AlarmHistory, AlarmHistoryAnalyzer
+
+from test.test_rackspace import RackspaceMockHttp
+from secrets import RACKSPACE_PARAMS
+
+
+class HistoryMockHttp(RackspaceMockHttp):
+    history_queries = []
+
+    def _23213_entities_en8B9YwUn6_alarms_aldIpNY8t3_history(self, method,
+                                                             url, body,
+                                                             headers):
+        body = self.fixtures.load('list_alarm_history_checks_analyzer.json')
+        return (httplib.OK, body, self.json_content_headers,
+                httplib.responses[httplib.OK])
+
+    def _23213_entities_en8B9YwUn6_alarms_aldIpNY8t3_history_chhJwYeArX(self,
+                                                             method,
+                                                             url, body,
+                                                             headers):
+        HistoryMockHttp.history_queries.append(
+                urlparse.parse_qs(urlparse.urlparse(url).query))
+        return RackspaceMockHttp.\
+            _23213_entities_en8B9YwUn6_alarms_aldIpNY8t3_history_chhJwYeArX(
+                self, method, url, body, headers)
+
+
+def _records(*pairs):
+    return [{'timestamp': timestamp, 'computed_state': state} for
+            timestamp, state in pairs]
+
+
+class AlarmHistoryTests(unittest.TestCase):
+    def setUp(self):
+        self.history = AlarmHistory(entity_id='enOne', alarm_id='alOne',
+                                    check_id='chOne')
+        self.history.extend(_records((30, 'OK'), (0, 'OK'),
+                                     (10, 'CRITICAL'), (20, 'WARNING'),
+                                     (50, 'CRITICAL')))
+
+    def test_extend_sorts_and_ignores_duplicates(self):
+        self.assertEqual(list(self.history.timestamps),
+                         [0, 10, 20, 30, 50])
+        added = self.history.extend(_records((30, 'OK'), (60, 'OK')))
+        self.assertEqual(added, 1)
+        self.assertEqual(len(self.history.states), 6)
+
+    def test_flapping_score(self):
+        self.assertEqual(self.history.transitions(), 4)
+        self.assertEqual(self.history.flapping_score(), 1.0)
+
+    def test_mttr(self):
+        self.assertEqual(self.history.recovery_times(), [20])
+        self.assertEqual(self.history.mttr(), 20)
+
+    def test_time_in_state(self):
+        result = self.history.time_in_state(until=60)
+        self.assertEqual(result, {'OK': 30, 'WARNING': 10, 'CRITICAL': 20})
+
+    def test_to_dict_from_dict(self):
+        history = AlarmHistory.from_dict(self.history.to_dict())
+        self.assertEqual(history.timestamps, self.history.timestamps)
+        self.assertEqual(history.states, self.history.states)
+
+
+class AlarmHistoryAnalyzerTests(unittest.TestCase):
+    def setUp(self):
+        RackspaceMonitoringDriver.connectionCls.conn_classes = (
+                HistoryMockHttp, HistoryMockHttp)
+        RackspaceMonitoringDriver.connectionCls.auth_url = \
+                'https://auth.api.example.com/v1.1/'
+        HistoryMockHttp.type = None
+        HistoryMockHttp.history_queries = []
+        self.driver = RackspaceMonitoringDriver(*RACKSPACE_PARAMS,
+                ex_force_base_url='http://www.todo.com')
+        self.analyzer = AlarmHistoryAnalyzer(driver=self.driver,
+                                             max_workers=2)
+
+    def test_fetch(self):
+        entity = self.driver.list_entities()[0]
+        errors = self.analyzer.fetch([entity])
+        self.assertEqual(errors, [])
+        self.assertEqual(len(self.analyzer.histories), 1)
+
+        history = self.analyzer.histories[('en8B9YwUn6', 'aldIpNY8t3',
+                                           'chhJwYeArX')]
+        self.assertEqual(history.check_type, 'remote.http')
+        self.assertEqual(list(history.timestamps), [1320885544875])
+
+    def test_fetch_is_incremental(self):
+        entity = self.driver.list_entities()[0]
+        self.analyzer.fetch([entity])
+        self.assertEqual(HistoryMockHttp.history_queries, [{}])
+
+        errors = self.analyzer.fetch([entity])
+        self.assertEqual(errors, [])
+        self.assertEqual(HistoryMockHttp.history_queries[1],
+                         {'from': ['1320885544875']})
+        history = self.analyzer.histories[('en8B9YwUn6', 'aldIpNY8t3',
+                                           'chhJwYeArX')]
+        self.assertEqual(list(history.timestamps), [1320885544875])
+
+    def test_fetch_errors_are_captured(self):
+        entity = self.driver.list_entities()[1]
+        errors = self.analyzer.fetch([entity])
+        self.assertEqual(len(errors), 1)
+        self.assertEqual(errors[0][0], entity)
+
+    def test_summary(self):
+        self.analyzer.fetch([self.driver.list_entities()[0]])
+        result = self.analyzer.summary(by='check_type')
+        self.assertEqual(result['remote.http']['transitions'], 0)
+        self.assertEqual(result['remote.http']['mttr'], None)
+        self.assertRaises(ValueError, self.analyzer.summary, by='zone')
+
+    def test_save_load(self):
+        self.analyzer.fetch([self.driver.list_entities()[0]])
+        fd, path = tempfile.mkstemp()
+        os.close(fd)
+
+        try:
+            self.analyzer.save(path)
+            analyzer = AlarmHistoryAnalyzer(driver=self.driver)
+            analyzer.load(path)
+        finally:
+            os.unlink(path)
+
+        self.assertEqual(analyzer.histories.keys(),
+                         self.analyzer.histories.keys())
+
+
+if __name__ == '__main__':
+    sys.exit(unittest.main())
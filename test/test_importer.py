@@ -0,0 +1,174 @@
+# Licensed to the Apache Software Foundation (ASF) under one or more
+# contributor license agreements.  See the NOTICE file distributed with
+# this work for additional information regarding copyright ownership.
+# The ASF licenses this file to You under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with
+# the License.  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+import sys
+import shutil
+import tempfile
+import httplib
+import unittest
+
+from StringIO import StringIO
+
+try:
+    import simplejson as json
+except:
+    import json
+
+from rackspace_monitoring.importer import (read_rows, InvalidRow,
+                                          EntityImporter)
+from rackspace_monitoring.utils import RateLimiter, is_over_limit_error
+
+from test.fakes import FakeMonitoringApi, fake_driver
+
+
+def fake_api(labels=None, over_limit=0):
+    api = FakeMonitoringApi()
+    for label in labels or []:
+        api.add_entity(label)
+    api.fail('POST', '/entities', 413, {'code': 413, 'type': 'overLimitError',
+                                        'message': 'Over limit',
+                                        'details': ''}, count=over_limit)
+    api.fail('POST', '/entities', httplib.SERVICE_UNAVAILABLE,
+             match=lambda data: data['label'] == 'broken')
+    return api
+
+
+class ReadRowsTests(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def write(self, name, data):
+        path = os.path.join(self.tmp_dir, name)
+        fp = open(path, 'w')
+        fp.write(data)
+        fp.close()
+        return path
+
+    def test_csv(self):
+        path = self.write('entities.csv',
+                          'label,ip.public0_v4,metadata.env\n'
+                          'web01,10.0.0.1,prod\n'
+                          'web02,,\n')
+        rows = list(read_rows(path))
+        self.assertEqual(rows[0], {'label': 'web01',
+                                   'ip_addresses': {'public0_v4': '10.0.0.1'},
+                                   'metadata': {'env': 'prod'}})
+        self.assertEqual(rows[1], {'label': 'web02', 'ip_addresses': {},
+                                   'metadata': {}})
+
+    def test_jsonl(self):
+        path = self.write('entities.txt',
+                          '{"label": "web01", "metadata": {"env": "prod"}}\n'
+                          '\n{"label": "web02"}\n')
+        rows = list(read_rows(path, format='jsonl'))
+        self.assertEqual([row['label'] for row in rows], ['web01', 'web02'])
+        self.assertRaises(ValueError, list, read_rows(path, format='xml'))
+
+    def test_jsonl_invalid_lines(self):
+        path = self.write('entities.jsonl',
+                          '{"label": "a"}\n{"label": \n["b"]\n'
+                          '{"label": "c"}\n')
+        rows = list(read_rows(path))
+        self.assertEqual(rows[0], {'label': 'a'})
+        self.assertTrue(isinstance(rows[1], InvalidRow))
+        self.assertEqual((rows[1].line, rows[2].line), (2, 3))
+        self.assertEqual(rows[3], {'label': 'c'})
+
+        api = fake_api()
+        output = StringIO()
+        counts = EntityImporter(fake_driver(api)).run(read_rows(path),
+                                                      output)
+        self.assertEqual((counts['created'], counts['invalid']), (2, 2))
+        self.assertEqual(sorted([entity['label'] for entity in
+                                 api.entities]), ['a', 'c'])
+        records = [json.loads(line) for line in
+                   output.getvalue().splitlines()]
+        self.assertEqual(sorted([record['line'] for record in records
+                                 if 'line' in record]), [2, 3])
+
+
+class EntityImporterTests(unittest.TestCase):
+    def run_import(self, api, rows, **kwargs):
+        output = StringIO()
+        importer = EntityImporter(fake_driver(api), max_workers=4,
+                                  backoff=0.01, **kwargs)
+        counts = importer.run(rows, output)
+        results = [json.loads(line) for line in
+                   output.getvalue().splitlines()]
+        return counts, sorted(results, key=lambda item: item['row'])
+
+    def test_import(self):
+        api = fake_api(labels=['web00'])
+        rows = [{'label': 'web%02d' % (i)} for i in range(20)]
+        rows += [{'label': 'web05'}, {'label': ''}, {'label': 'broken'}]
+
+        counts, results = self.run_import(api, rows)
+        self.assertEqual(len(api.requests_for('GET', '/entities')), 1)
+        self.assertEqual(counts, {'created': 19, 'exists': 1, 'duplicate': 1,
+                                  'invalid': 1, 'failed': 1})
+        self.assertEqual(len(api.entities), 20)
+        self.assertEqual(results[0], {'row': 1, 'label': 'web00',
+                                      'status': 'exists', 'id': 'en0'})
+        self.assertEqual(results[-1]['status'], 'failed')
+        self.assertTrue('Service Unavailable' in results[-1]['error'])
+
+    def test_failed_label_is_not_taken(self):
+        api = FakeMonitoringApi()
+        api.fail('POST', '/entities', count=1)
+        rows = [{'label': 'web01'}, {'label': 'web01'}, {'label': 'web01'}]
+
+        counts, results = self.run_import(api, rows)
+        # Whichever row was created first, the others are duplicates of it
+        # rather than of the row which failed
+        self.assertEqual((counts['failed'], counts['created'],
+                          counts['duplicate']), (1, 1, 1))
+        entity_id = api.entities[0]['id']
+        self.assertEqual([result.get('id') for result in results
+                          if result['status'] != 'failed'],
+                         [entity_id, entity_id])
+
+    def test_over_limit_is_retried(self):
+        rows = [{'label': 'web%02d' % (i)} for i in range(5)]
+        counts, results = self.run_import(fake_api(over_limit=3), rows)
+        self.assertEqual(counts['created'], 5)
+
+        counts, results = self.run_import(fake_api(over_limit=10), rows[:1],
+                                          retries=2)
+        self.assertEqual(counts['failed'], 1)
+
+
+class RateLimiterTests(unittest.TestCase):
+    def test_is_over_limit_error(self):
+        self.assertTrue(is_over_limit_error(Exception({'code': 413})))
+        self.assertTrue(is_over_limit_error(
+                        Exception({'type': 'overLimitError'})))
+        self.assertFalse(is_over_limit_error(Exception({'code': 500})))
+        self.assertFalse(is_over_limit_error(Exception('413')))
+        self.assertFalse(is_over_limit_error(Exception()))
+
+    def test_acquire(self):
+        limiter = RateLimiter(rate=1000)
+        for i in range(5):
+            limiter.acquire()
+        # Without a rate acquire never blocks
+        RateLimiter().acquire()
+
+
+if __name__ == '__main__':
+    sys.exit(unittest.main())
@@ -0,0 +1,117 @@
+# Licensed to the Apache Software Foundation (ASF) under one or more
+# contributor license agreements.  See the NOTICE file distributed with
+# this work for additional information regarding copyright ownership.
+# The ASF licenses this file to You under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with
+# the License.  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+
+from StringIO import StringIO
+
+from rackspace_monitoring import json_codecs
+from rackspace_monitoring.json_codecs import (JSONCodec, PREFERENCE,
+                                              available_codecs, get_codec)
+from rackspace_monitoring.history import AlarmHistoryAnalyzer
+from rackspace_monitoring.importer import EntityImporter
+from rackspace_monitoring.store import SnapshotStore
+
+from test.fakes import FakeMonitoringApi, fake_driver
+
+DOCUMENT = {'values': [{'id': 'en8B9YwUn6', 'label': u'b\xe4r',
+                        'ip_addresses': {'default': '127.0.0.1'},
+                        'metadata': None, 'managed': False}],
+            'metadata': {'count': 1, 'next_marker': None}}
+
+
+class JSONCodecsTests(unittest.TestCase):
+    def test_available_codecs(self):
+        names = available_codecs()
+        self.assertTrue('json' in names)
+        self.assertEqual(names, [name for name in PREFERENCE
+                                 if name in names])
+
+    def test_get_codec_default_is_fastest(self):
+        self.assertEqual(get_codec().name, available_codecs()[0])
+        self.assertTrue(get_codec() is get_codec())
+
+    def test_get_codec_stops_at_first_installed(self):
+        loaded = json_codecs._codecs.copy()
+        json_codecs._codecs.clear()
+        try:
+            name = get_codec().name
+            tried = PREFERENCE[:PREFERENCE.index(name) + 1]
+            self.assertEqual(sorted(json_codecs._codecs.keys()),
+                             sorted(tried))
+            self.assertNotEqual(name, 'cjson')
+        finally:
+            json_codecs._codecs.update(loaded)
+
+    def test_get_codec_by_name(self):
+        self.assertEqual(get_codec('json').name, 'json')
+
+        codec = JSONCodec('custom', None, None)
+        self.assertTrue(get_codec(codec) is codec)
+
+    def test_get_codec_invalid(self):
+        self.assertRaises(ValueError, get_codec, 'yaml')
+
+    def test_round_trip(self):
+        for name in available_codecs():
+            codec = get_codec(name)
+            self.assertEqual(codec.loads(codec.dumps(DOCUMENT)), DOCUMENT)
+
+    def test_driver_codec_is_used_by_the_helpers(self):
+        calls = []
+        json = get_codec('json')
+
+        def loads(value):
+            calls.append('loads')
+            return json.loads(value)
+
+        def dumps(value):
+            calls.append('dumps')
+            return json.dumps(value)
+
+        api = FakeMonitoringApi()
+        api.add_entity('web01', metadata={'env': 'prod'})
+        driver = fake_driver(api, ex_json_codec=JSONCodec('recording', loads,
+                                                          dumps))
+        entities = list(driver.list_entities())
+        self.assertEqual(calls, ['loads'])
+
+        store = SnapshotStore(':memory:', driver)
+        store.store_entities(entities)
+        self.assertEqual(store.entities()[0].extra, {'env': 'prod'})
+        self.assertEqual(calls[1:], ['dumps', 'loads'])
+
+        del calls[:]
+        EntityImporter(driver).run([{'label': 'web02'}], StringIO())
+        # The create request and the output record
+        self.assertEqual(calls.count('dumps'), 2)
+
+        tmp_dir = tempfile.mkdtemp()
+        try:
+            del calls[:]
+            path = os.path.join(tmp_dir, 'history.json')
+            AlarmHistoryAnalyzer(driver).save(path)
+            AlarmHistoryAnalyzer(driver).load(path)
+            self.assertEqual(calls, ['dumps', 'loads'])
+        finally:
+            shutil.rmtree(tmp_dir)
+
+
+if __name__ == '__main__':
+    sys.exit(unittest.main())
@@ -0,0 +1,83 @@
+# Licensed to the Apache Software Foundation (ASF) under one or more
+# contributor license agreements.  See the NOTICE file distributed with
+# this work for additional information regarding copyright ownership.
+# The ASF licenses this file to You under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with
+# the License.  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import sys
+import unittest
+
+from rackspace_monitoring.drivers.rackspace import RackspaceMonitoringDriver
+from rackspace_monitoring.multi import MultiAccountDriver
+
+from test.test_rackspace import RackspaceMockHttp
+from secrets import RACKSPACE_PARAMS
+
+
+class FailingDriver(object):
+    def list_entities(self, ex_stream=False):
+        raise Exception('Service unavailable')
+
+
+class MultiAccountDriverTests(unittest.TestCase):
+    def setUp(self):
+        RackspaceMonitoringDriver.connectionCls.conn_classes = (
+                RackspaceMockHttp, RackspaceMockHttp)
+        RackspaceMonitoringDriver.connectionCls.auth_url = \
+                'https://auth.api.example.com/v1.1/'
+        RackspaceMockHttp.type = None
+
+        account = {'username': RACKSPACE_PARAMS[0],
+                   'api_key': RACKSPACE_PARAMS[1],
+                   'ex_force_base_url': 'http://www.todo.com'}
+        self.multi = MultiAccountDriver({'dfw': account, 'ord': account,
+                                         'lon': FailingDriver()},
+                                        max_workers=3)
+
+    def test_map(self):
+        result = self.multi.list_entities()
+        self.assertEqual(sorted(result.results.keys()), ['dfw', 'ord'])
+        self.assertEqual(len(result.results['dfw']), 6)
+        self.assertEqual(result.errors.keys(), ['lon'])
+
+        items = result.items()
+        self.assertEqual(len(items), 12)
+        self.assertEqual(items[0][0], 'dfw')
+
+        result = self.multi.get_entity('en8B9YwUn6')
+        self.assertEqual(result.results['ord'].id, 'en8B9YwUn6')
+        self.assertTrue('lon' in result.errors)
+
+    def test_stream(self):
+        stream = self.multi.list_entities(ex_stream=True)
+        items = list(stream)
+        self.assertEqual(len(items), 12)
+        self.assertEqual(sorted(set([name for name, _ in items])),
+                         ['dfw', 'ord'])
+        self.assertEqual(str(stream.errors['lon']), 'Service unavailable')
+
+    def test_stream_closed_early(self):
+        stream = self.multi.ex_stream('list_entities')
+        first = stream.next()
+        stream.close()
+        self.assertTrue(first[0] in ['dfw', 'ord'])
+
+    def test_drivers_are_reused(self):
+        driver = self.multi.get_driver('dfw')
+        self.assertTrue(self.multi.get_driver('dfw') is driver)
+        self.assertFalse(self.multi.get_driver('ord') is driver)
+        self.assertRaises(AttributeError, getattr, self.multi,
+                          'delete_entity')
+
+
+if __name__ == '__main__':
+    sys.exit(unittest.main())
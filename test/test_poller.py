@@ -0,0 +1,128 @@
+# Licensed to the Apache Software Foundation (ASF) under one or more
+# contributor license agreements.  See the NOTICE file distributed with
+# this work for additional information regarding copyright ownership.
+# The ASF licenses this file to You under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with
+# the License.  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import sys
+import unittest
+
+from rackspace_monitoring.poller import AlarmStatePoller, _to_seconds
+
+from test.fakes import FakeMonitoringApi, fake_driver
+
+NOW = 1321898988.0
+
+
+class Clock(object):
+    def __init__(self):
+        self.now = NOW
+
+    def __call__(self):
+        return self.now
+
+
+class AlarmStatePollerTests(unittest.TestCase):
+    def setUp(self):
+        self.clock = Clock()
+        self.api = FakeMonitoringApi()
+        for i in range(500):
+            entity = self.api.add_entity('web%d' % (i))
+            # Nothing changed for a day
+            self.set_state(entity['id'], 'OK', NOW - 86400, changelog=False)
+        self.poller = AlarmStatePoller(fake_driver(self.api), min_interval=10,
+                                       max_interval=900, clock=self.clock)
+        self.transitions = []
+        self.poller.subscribe(self.transitions.append)
+        self.poller.poll_once()
+
+    def set_state(self, entity_id, state, timestamp, changelog=True):
+        self.api.set_alarm_state(entity_id, 'ch' + entity_id,
+                                 'al' + entity_id, state,
+                                 int(timestamp * 1000), changelog=changelog)
+
+    def overview_requests(self):
+        return [query.get('entityId') for query in
+                self.api.requests_for('GET', '/views/overview',
+                                      first_page=True)]
+
+    def tick(self, count=1):
+        for _ in range(count):
+            self.clock.now += 10
+            self.poller.poll_once()
+
+    def test_cold_entities_are_not_polled(self):
+        self.assertEqual(len(self.overview_requests()), 1)
+        # The full overview of 500 entities takes 5 pages
+        self.assertEqual(self.poller.requests['overview'], 5)
+        self.tick(30)
+        # Only the changelog is read until the entities are due
+        self.assertEqual(len(self.overview_requests()), 1)
+        self.assertEqual(self.poller.requests['changelog'], 30)
+
+        self.tick(60)
+        self.assertEqual(len(self.overview_requests()), 6)
+        self.assertEqual(self.transitions, [])
+
+    def test_changelog_transitions(self):
+        self.tick()
+        self.set_state('en7', 'CRITICAL', self.clock.now + 5)
+        self.tick()
+        self.assertEqual(len(self.transitions), 1)
+        transition = self.transitions[0]
+        self.assertEqual((transition.entity_id, transition.previous_state,
+                          transition.state), ('en7', 'OK', 'CRITICAL'))
+        self.assertEqual(transition.source, 'changelog')
+        self.assertEqual(self.poller.get_state('en7', 'alen7'), 'CRITICAL')
+
+        # The same change isn't emitted again
+        self.tick()
+        self.assertEqual(len(self.transitions), 1)
+
+    def test_hot_entities_are_polled_often(self):
+        self.set_state('en3', 'WARNING', self.clock.now + 5)
+        self.tick()
+        self.assertEqual(self.poller.due_entities(self.clock.now + 10),
+                         ['en3'])
+
+        # Missed by the changelog, picked up by the overview of the entity
+        self.set_state('en3', 'OK', self.clock.now + 5,
+                              changelog=False)
+        self.tick()
+        self.assertEqual(self.overview_requests()[-1], ['en3'])
+        self.assertEqual([(item.state, item.source) for item in
+                          self.transitions],
+                         [('WARNING', 'changelog'), ('OK', 'overview')])
+
+        # The interval grows while nothing changes
+        self.tick(20)
+        self.assertTrue(len(self.overview_requests()) < 8)
+
+    def test_new_alarm_in_changelog_reschedules(self):
+        self.tick()
+        # An alarm which has been added to a known entity
+        self.api.set_alarm_state('en7', 'chen7', 'alnew', 'WARNING',
+                                 int((self.clock.now + 5) * 1000))
+        self.tick()
+        self.assertEqual(self.transitions, [])
+        self.assertEqual(self.poller.get_state('en7', 'alnew'), 'WARNING')
+        self.assertEqual(self.poller.due_entities(self.clock.now + 10),
+                         ['en7'])
+
+    def test_timestamps_are_milliseconds(self):
+        self.assertEqual(_to_seconds(1500), 1.5)
+        self.assertEqual(_to_seconds(int(NOW * 1000)), NOW)
+        self.assertEqual(_to_seconds(None), None)
+
+
+if __name__ == '__main__':
+    sys.exit(unittest.main())
@@ -15,8 +15,13 @@
 
 import sys
 import os
+import time
+import tempfile
 import unittest
 import httplib
+import urlparse
+import threading
+import subprocess
 from os.path import join as pjoin
 
 from rackspace_monitoring.base import (MonitoringDriver, Entity,
@@ -26,6 +31,17 @@ from rackspace_monitoring.base import (MonitoringDriver, Entity,
 from rackspace_monitoring.drivers.rackspace import (RackspaceMonitoringDriver,
                                             RackspaceMonitoringValidationError)
 
+try:
+    import simplejson as json
+except:
+    import json
+
+from libcloud.common.types import LazyList
+from rackspace_monitoring.pagination import (ListCheckpoint,
+                                             FileCheckpointSink)
+from rackspace_monitoring.json_codecs import JSONCodec, get_codec
+from rackspace_monitoring.utils import PageSizeTuner
+
 from test import MockResponse, MockHttpTestCase
 from test.file_fixtures import FIXTURES_ROOT
 from test.file_fixtures import FileFixtures
@@ -48,6 +64,7 @@ class RackspaceTests(unittest.TestCase):
         RackspaceMonitoringDriver.connectionCls.auth_url = \
                 'https://auth.api.example.com/v1.1/'
         RackspaceMockHttp.type = None
+        RackspaceMockHttp.paged_requests = 0
         self.driver = RackspaceMonitoringDriver(*RACKSPACE_PARAMS,
                 ex_force_base_url='http://www.todo.com')
 
@@ -62,6 +79,227 @@ class RackspaceTests(unittest.TestCase):
         self.assertEqual(result[0].id, 'en8B9YwUn6')
         self.assertEqual(result[0].label, 'bar')
 
+    def test_list_entities_stream(self):
+        RackspaceMockHttp.type = 'PAGED'
+        result = self.driver.list_entities(ex_stream=True)
+        self.assertFalse(isinstance(result, LazyList))
+
+        first = result.next()
+        self.assertEqual(first.id, 'en8B9YwUn6')
+        self.assertEqual(RackspaceMockHttp.paged_requests, 1)
+        self.assertEqual(result.pages, 1)
+
+        stream = result
+        result = [first] + list(result)
+        self.assertEqual(len(result), 6)
+        self.assertEqual(result[-1].id, 'enjoLD0Al3')
+        self.assertEqual(RackspaceMockHttp.paged_requests, 2)
+        self.assertEqual(stream.pages, 2)
+
+    def test_list_entities_limit(self):
+        RackspaceMockHttp.type = 'PAGED'
+        list(self.driver.list_entities(ex_limit=3))
+        self.assertEqual(RackspaceMockHttp.last_query['limit'], ['3'])
+
+        # Without a limit the API default page size is used
+        list(self.driver.list_entities())
+        self.assertFalse('limit' in RackspaceMockHttp.last_query)
+
+        # Unless the page size is picked automatically
+        RackspaceMockHttp.type = None
+        driver = RackspaceMonitoringDriver(*RACKSPACE_PARAMS,
+                ex_force_base_url='http://www.todo.com',
+                ex_auto_page_size=True)
+        RackspaceMockHttp.type = 'PAGED'
+        list(driver.list_entities())
+        self.assertEqual(RackspaceMockHttp.last_query['limit'], ['100'])
+
+    def test_list_entities_ids_stops_early(self):
+        RackspaceMockHttp.type = 'PAGED'
+        result = self.driver.list_entities(ex_ids=['en8B9YwUn6'])
+        self.assertEqual([entity.id for entity in result], ['en8B9YwUn6'])
+        self.assertEqual(RackspaceMockHttp.paged_requests, 1)
+
+        result = self.driver.list_entities(ex_ids=['en8B9YwUn6',
+                                                   'enjoLD0Al3'])
+        self.assertEqual(len(result), 2)
+        self.assertEqual(RackspaceMockHttp.paged_requests, 3)
+
+    def test_list_entities_client_side_filters(self):
+        RackspaceMockHttp.type = 'PAGED'
+        result = self.driver.list_entities(ex_label='foooo')
+        self.assertEqual(len(result), 4)
+
+        result = self.driver.list_entities(ex_stream=True, ex_filter=lambda
+                                           entity: entity.label == 'bar')
+        self.assertEqual(result.next().id, 'en8B9YwUn6')
+        self.assertEqual(RackspaceMockHttp.paged_requests, 3)
+        self.assertEqual(result.checkpoint.items, 0)
+
+        RackspaceMockHttp.type = None
+        entity = self.driver.list_entities()[0]
+        result = self.driver.list_checks(entity=entity, ex_type='remote.ping')
+        self.assertEqual(list(result), [])
+
+    def test_list_entities_filtered_list_is_lazy(self):
+        RackspaceMockHttp.type = 'PAGED'
+        result = self.driver.list_entities(ex_label='foooo')
+        self.assertTrue(isinstance(result, LazyList))
+        # Nothing is requested until the list is used
+        self.assertEqual(RackspaceMockHttp.paged_requests, 0)
+        self.assertEqual(len(result), 4)
+        self.assertEqual(RackspaceMockHttp.paged_requests, 2)
+
+        result = self.driver.list_entities(ex_ids=['en8B9YwUn6'])
+        self.assertTrue(isinstance(result, LazyList))
+        self.assertEqual(RackspaceMockHttp.paged_requests, 2)
+        self.assertEqual(result[0].id, 'en8B9YwUn6')
+        self.assertEqual(len(result), 1)
+        # Found on the first page, so the second one isn't requested
+        self.assertEqual(RackspaceMockHttp.paged_requests, 3)
+
+    def test_ex_views_overview_entity_ids(self):
+        list(self.driver.ex_views_overview(ex_entity_ids=['en8B9YwUn6',
+                                                          'endYGlC6Gt']))
+        self.assertEqual(RackspaceMockHttp.last_query['entityId'],
+                         ['en8B9YwUn6', 'endYGlC6Gt'])
+
+    def test_page_size_tuner(self):
+        tuner = PageSizeTuner(initial=100, target=1.0)
+
+        # Short pages are ignored
+        tuner.observe(5.0, 10, 100)
+        self.assertEqual(tuner.limit, 100)
+
+        # 5 ms per item, grows by at most a factor of two at a time
+        tuner.observe(0.5, 100, 100)
+        self.assertEqual(tuner.limit, 200)
+        tuner.observe(1.0, 200, 200)
+        self.assertEqual(tuner.limit, 200)
+
+        # Slow responses shrink the page size
+        tuner.observe(10.0, 200, 200)
+        self.assertEqual(tuner.limit, 100)
+
+    def test_list_entities_stream_checkpoint_resume(self):
+        RackspaceMockHttp.type = 'PAGED'
+        result = self.driver.list_entities(ex_stream=True)
+        self.assertEqual(result.checkpoint.url, '/entities')
+        self.assertEqual(result.checkpoint.marker, None)
+
+        # Checkpoint only moves once a whole page has been consumed
+        consumed = [result.next() for _ in range(4)]
+        checkpoint = ListCheckpoint.from_dict(result.checkpoint.to_dict())
+        self.assertEqual(checkpoint.items, 3)
+        self.assertEqual(checkpoint.marker, 'enBq9glhau')
+        self.assertFalse(checkpoint.exhausted)
+
+        saved = []
+        resumed = self.driver.ex_resume(checkpoint, ex_checkpoint_sink=Sink(
+                                                                    saved))
+        ids = [entity.id for entity in resumed]
+        self.assertEqual(ids, [entity.id for entity in
+                               self.driver.list_entities()][3:])
+        self.assertEqual(consumed[3].id, ids[0])
+        self.assertEqual(len(saved), 1)
+        self.assertEqual(saved[0].items, 6)
+        self.assertTrue(saved[0].exhausted)
+
+    def test_list_entities_next_page(self):
+        RackspaceMockHttp.type = 'PAGED'
+        result = self.driver.list_entities(ex_stream=True, ex_limit=3)
+        page = result.next_page()
+        self.assertEqual(len(page), 3)
+        self.assertEqual(result.checkpoint.marker, 'enBq9glhau')
+        self.assertEqual(RackspaceMockHttp.paged_requests, 1)
+
+        result = self.driver.list_entities(ex_stream=True, ex_limit=3,
+                                  ex_next_marker=result.checkpoint.marker)
+        self.assertEqual(len(result.next_page()), 3)
+        self.assertTrue(result.checkpoint.exhausted)
+        self.assertEqual(result.next_page(), [])
+        self.assertEqual(RackspaceMockHttp.paged_requests, 2)
+
+    def test_list_entities_list_checkpoint(self):
+        RackspaceMockHttp.type = 'PAGED'
+        result = self.driver.list_entities()
+        self.assertEqual(result.checkpoint.items, 0)
+        self.assertEqual(len(result), 6)
+        self.assertEqual(result.checkpoint.items, 6)
+        self.assertTrue(result.checkpoint.exhausted)
+
+    def test_resume_filtered_listing(self):
+        RackspaceMockHttp.type = 'PAGED'
+        result = self.driver.list_entities(ex_stream=True, ex_label='foooo')
+        # The whole first page, the third item is on the second page
+        [result.next() for _ in range(3)]
+        checkpoint = ListCheckpoint.from_dict(result.checkpoint.to_dict())
+        self.assertEqual(checkpoint.filters,
+                         {'attributes': {'label': 'foooo'}})
+
+        saved = []
+        resumed = self.driver.ex_resume(checkpoint, ex_stream=False,
+                                        ex_checkpoint_sink=Sink(saved))
+        self.assertTrue(isinstance(resumed, LazyList))
+        self.assertEqual([entity.id for entity in resumed],
+                         ['enQJCKqUZ9', 'enjoLD0Al3'])
+        self.assertEqual(saved[-1].filters,
+                         {'attributes': {'label': 'foooo'}})
+
+    def test_resume_ids_listing(self):
+        RackspaceMockHttp.type = 'PAGED'
+        result = self.driver.list_entities(ex_stream=True,
+                                           ex_ids=['enBq9glhau',
+                                                   'enjoLD0Al3'])
+        self.assertEqual([entity.id for entity in result.next_page()],
+                         ['enBq9glhau'])
+        # Only the ids which haven't been found yet
+        self.assertEqual(result.checkpoint.filters, {'ids': ['enjoLD0Al3']})
+
+        checkpoint = ListCheckpoint.from_dict(result.checkpoint.to_dict())
+        resumed = self.driver.ex_resume(checkpoint)
+        self.assertEqual([entity.id for entity in resumed], ['enjoLD0Al3'])
+
+    def test_resume_predicate_listing(self):
+        RackspaceMockHttp.type = 'PAGED'
+        predicate = lambda entity: entity.label == 'server'
+        result = self.driver.list_entities(ex_stream=True,
+                                           ex_filter=predicate)
+        result.next_page()
+        checkpoint = ListCheckpoint.from_dict(result.checkpoint.to_dict())
+
+        self.assertRaises(ValueError, self.driver.ex_resume, checkpoint)
+        resumed = self.driver.ex_resume(checkpoint, ex_filter=predicate)
+        self.assertEqual([entity.id for entity in resumed], ['endYGlC6Gt'])
+
+    def test_file_checkpoint_sink(self):
+        fd, path = tempfile.mkstemp()
+        os.close(fd)
+        os.unlink(path)
+        sink = FileCheckpointSink(path)
+
+        try:
+            self.assertEqual(sink.load(), None)
+            result = self.driver.list_entities(ex_stream=True)
+            result.sink = sink
+            list(result)
+            checkpoint = sink.load()
+        finally:
+            os.unlink(path)
+
+        self.assertEqual(checkpoint.items, 6)
+        self.assertTrue(checkpoint.exhausted)
+        self.assertEqual(list(self.driver.ex_resume(checkpoint)), [])
+
+    def test_ex_resume_child_listing(self):
+        entity = self.driver.list_entities()[0]
+        checks = self.driver.list_checks(entity=entity, ex_stream=True)
+        checkpoint = checks.checkpoint
+        self.assertEqual(checkpoint.context, {'entity_id': 'en8B9YwUn6'})
+
+        result = list(self.driver.ex_resume(checkpoint))
+        self.assertEqual(result[0].entity_id, 'en8B9YwUn6')
+
     def test_list_checks(self):
         en = self.driver.list_entities()[0]
         result = list(self.driver.list_checks(entity=en))
@@ -100,6 +338,63 @@ class RackspaceTests(unittest.TestCase):
         self.assertEqual(len(result), 8)
         self.assertEqual(result[0].label, 'test-notification-plan')
 
+    def test_ex_views_overview(self):
+        result = list(self.driver.ex_views_overview())
+        self.assertEqual(len(result), 2)
+        self.assertEqual(result[0]['entity'].id, 'en8B9YwUn6')
+        self.assertEqual(result[0]['checks'][0].entity_id, 'en8B9YwUn6')
+        self.assertEqual(result[0]['alarms'][0].notification_plan_id,
+                         'npIXxOAn5')
+        self.assertEqual(result[0]['latest_alarm_states'][0].state,
+                         'CRITICAL')
+        self.assertEqual(result[1]['checks'][0].monitoring_zones,
+                         ('mzxJ4L2IU', 'mzdfw'))
+
+    def test_ex_fetch_account_snapshot(self):
+        snapshot = self.driver.ex_fetch_account_snapshot(ex_max_workers=3)
+        self.assertEqual(len(snapshot.entities), 6)
+        self.assertEqual(len(snapshot.notifications), 2)
+        self.assertEqual(len(snapshot.notification_plans), 8)
+        self.assertEqual(len(snapshot.monitoring_zones), 1)
+        self.assertEqual(len(snapshot.check_types), 2)
+        self.assertEqual(len(snapshot.notification_types), 1)
+
+        # Only the first entity has checks and alarms mocked
+        self.assertFalse(snapshot.complete)
+        self.assertEqual(len(snapshot.errors), 10)
+
+        entity = snapshot.get_entity('en8B9YwUn6')
+        alarm = snapshot.alarms_for(entity)[0]
+        self.assertEqual(snapshot.checks_for(entity)[0].id, 'chhJwYeArX')
+        self.assertEqual(snapshot.check_for(alarm), None)
+        plan = snapshot.notification_plan_for(alarm)
+        self.assertEqual(plan.id, 'npIXxOAn5')
+        self.assertEqual(snapshot.notifications_for(plan), [])
+
+    def test_ex_views_overview_shares_repeated_values(self):
+        driver = RackspaceMonitoringDriver(*RACKSPACE_PARAMS,
+                ex_force_base_url='http://www.todo.com',
+                ex_intern_values=True)
+        result = list(driver.ex_views_overview())
+        check = result[0]['checks'][0]
+        alarm = result[0]['alarms'][0]
+        self.assertTrue(alarm.type is check.type)
+
+        again = list(driver.ex_views_overview())
+        self.assertTrue(again[1]['checks'][0].monitoring_zones is
+                        result[1]['checks'][0].monitoring_zones)
+        self.assertTrue(again[0]['latest_alarm_states'][0].state is
+                        result[0]['latest_alarm_states'][0].state)
+        # Unique values aren't kept
+        self.assertFalse(result[0]['entity'].id in driver._intern._values)
+
+        # Off by default
+        result = list(self.driver.ex_views_overview())
+        again = list(self.driver.ex_views_overview())
+        self.assertEqual(len(self.driver._intern), 0)
+        self.assertEqual(result[1]['checks'][0].monitoring_zones,
+                         ('mzxJ4L2IU', 'mzdfw'))
+
     def test_ex_list_alarm_history_checks(self):
         entity = self.driver.list_entities()[0]
         alarm = self.driver.list_alarms(entity=entity)[0]
@@ -144,6 +439,136 @@ class RackspaceTests(unittest.TestCase):
         self.assertTrue('available' in result[0])
         self.assertTrue('metrics' in result[0])
 
+    def test_ex_test_check_and_alarm_many(self):
+        entities = self.driver.list_entities()
+        check_kwargs = {'type': 'remote.http', 'target_alias': 'default'}
+        specs = [(entities[0], 'return OK', check_kwargs),
+                 (entities[1], 'return OK', check_kwargs)]
+        result = dict([(entity.id, (value, error)) for entity, value, error in
+                       self.driver.ex_test_check_and_alarm_many(specs)])
+
+        self.assertEqual(len(result), 2)
+        value, error = result['en8B9YwUn6']
+        self.assertEqual(error, None)
+        self.assertEqual(value[0]['computed_state'], 'OK')
+        value, error = result['en8Xmk5lv1']
+        self.assertEqual(value, None)
+        self.assertTrue(error is not None)
+
+    def test_ex_test_check_and_alarm_many_local_criteria(self):
+        entity = self.driver.list_entities()[0]
+        criteria = 'if (metric["code"] == "200") { return WARNING, "ok" }'
+        specs = [(entity, criteria, {})]
+        result = list(self.driver.ex_test_check_and_alarm_many(specs,
+                                                ex_local_criteria=True))
+        self.assertEqual(result[0][1][0]['computed_state'], 'WARNING')
+
+    def test_get_entity(self):
+        entity = self.driver.get_entity('en8B9YwUn6')
+        self.assertEqual(entity.label, 'bar')
+        self.assertEqual(entity.ip_addresses, [('1', '127.0.0.1')])
+
+    def test_identity_map(self):
+        self.assertFalse(self.driver.list_entities()[0] is
+                         self.driver.get_entity('en8B9YwUn6'))
+
+        driver = RackspaceMonitoringDriver(*RACKSPACE_PARAMS,
+                ex_force_base_url='http://www.todo.com',
+                ex_identity_map=True)
+        entity = driver.list_entities()[0]
+        entity.label = 'stale'
+        entity.extra = None
+
+        self.assertTrue(driver.get_entity('en8B9YwUn6') is entity)
+        self.assertEqual(entity.label, 'bar')
+        self.assertEqual(entity.extra, {})
+
+        check = driver.list_checks(entity=entity)[0]
+        self.assertTrue(driver.list_checks(entity=entity)[0] is check)
+        alarm = driver.list_alarms(entity=entity)[0]
+        self.assertTrue(driver.list_alarms(entity=entity)[0] is alarm)
+
+        # Instances are only kept alive by the caller
+        count = len(driver._identity_map)
+        del entity, check, alarm
+        self.assertEqual(len(driver._identity_map), count - 3)
+
+    def test_lazy_models(self):
+        driver = RackspaceMonitoringDriver(*RACKSPACE_PARAMS,
+                ex_force_base_url='http://www.todo.com', ex_lazy_models=True)
+        entity = driver.list_entities()[0]
+        self.assertTrue(isinstance(entity, Entity))
+        self.assertFalse('ip_addresses' in entity.__dict__)
+        self.assertEqual(entity.ip_addresses, [('1', '127.0.0.1')])
+        self.assertTrue('ip_addresses' in entity.__dict__)
+        self.assertEqual(entity.extra, {})
+        self.assertRaises(AttributeError, getattr, entity, 'missing')
+
+        check = driver.list_checks(entity=entity)[0]
+        self.assertEqual(check.entity_id, 'en8B9YwUn6')
+        self.assertEqual(check.details['url'], 'http://www.foo.com')
+        self.assertEqual(check.monitoring_zones, ('mzxJ4L2IU',))
+        self.assertEqual(check.period, 150)
+
+        alarm = driver.list_alarms(entity=entity)[0]
+        self.assertEqual(alarm.criteria,
+                         "if (metric['status'] == 404) { return CRITICAL }")
+
+        notification = driver.list_notifications()[0]
+        self.assertEqual(notification.details['url'],
+                         'http://www.postbin.org/lulz')
+
+    def test_lazy_models_with_identity_map(self):
+        driver = RackspaceMonitoringDriver(*RACKSPACE_PARAMS,
+                ex_force_base_url='http://www.todo.com', ex_lazy_models=True,
+                ex_identity_map=True)
+        entity = driver.list_entities()[0]
+        entity.extra['stale'] = True
+
+        self.assertTrue(driver.get_entity('en8B9YwUn6') is entity)
+        self.assertEqual(entity.extra, {})
+
+    def test_json_codec(self):
+        calls = []
+
+        def loads(body):
+            calls.append(body)
+            return json.loads(body)
+
+        codec = JSONCodec('counting', loads, json.dumps)
+        driver = RackspaceMonitoringDriver(*RACKSPACE_PARAMS,
+                ex_force_base_url='http://www.todo.com', ex_json_codec=codec)
+        result = list(driver.list_entities())
+
+        self.assertEqual(len(result), 6)
+        self.assertEqual(len(calls), 1)
+        self.assertTrue(self.driver.connection.get_json_codec() is get_codec())
+
+        driver = RackspaceMonitoringDriver(*RACKSPACE_PARAMS,
+                ex_force_base_url='http://www.todo.com', ex_json_codec='json')
+        self.assertEqual(driver.connection.json_codec.name, 'json')
+        self.assertEqual(len(driver.list_entities()), 6)
+
+    def test_concurrent_identical_gets_share_request(self):
+        RackspaceMockHttp.type = 'SLOW'
+        RackspaceMockHttp.slow_requests = 0
+        result = []
+
+        def get_entity():
+            result.append(self.driver.get_entity('en8B9YwUn6'))
+
+        threads = [threading.Thread(target=get_entity) for _ in range(5)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(result), 5)
+        self.assertEqual(RackspaceMockHttp.slow_requests, 1)
+
+        self.driver.get_entity('en8B9YwUn6')
+        self.assertEqual(RackspaceMockHttp.slow_requests, 2)
+
     def test_delete_entity_success(self):
         entity = self.driver.list_entities()[0]
         result = self.driver.delete_entity(entity=entity,
@@ -181,10 +606,42 @@ class RackspaceTests(unittest.TestCase):
         notification_plan.delete()
 
 
+class ImportTests(unittest.TestCase):
+    def _loaded_modules(self, module):
+        code = ('import sys; import %s; '
+                'sys.stdout.write(" ".join(sys.modules.keys()))' % (module))
+        process = subprocess.Popen([sys.executable, '-c', code],
+                                   stdout=subprocess.PIPE, cwd=os.getcwd())
+        return process.communicate()[0].split()
+
+    def test_providers_import_is_lazy(self):
+        modules = self._loaded_modules('rackspace_monitoring.providers')
+        self.assertTrue('rackspace_monitoring.types' in modules)
+        self.assertFalse('libcloud' in modules)
+
+    def test_driver_import_is_lazy(self):
+        modules = self._loaded_modules(
+                                    'rackspace_monitoring.drivers.rackspace')
+        self.assertTrue('libcloud.common.base' in modules)
+        self.assertFalse('rackspace_monitoring.criteria' in modules)
+        self.assertFalse('rackspace_monitoring.pagination' in modules)
+
+
+class Sink(object):
+    def __init__(self, saved):
+        self.saved = saved
+
+    def save(self, checkpoint):
+        self.saved.append(ListCheckpoint.from_dict(checkpoint.to_dict()))
+
+
 class RackspaceMockHttp(MockHttpTestCase):
     auth_fixtures = MonitoringFileFixtures('rackspace/auth')
     fixtures = MonitoringFileFixtures('rackspace/v1.0')
     json_content_headers = {'content-type': 'application/json; charset=UTF-8'}
+    slow_requests = 0
+    paged_requests = 0
+    last_query = None
 
     def _v2_0_tokens(self, method, url, body, headers):
         body = self.auth_fixtures.load('_v2_0_tokens.json')
@@ -201,6 +658,23 @@ class RackspaceMockHttp(MockHttpTestCase):
         return (httplib.OK, body, self.json_content_headers,
                 httplib.responses[httplib.OK])
 
+    def _23213_entities_PAGED(self, method, url, body, headers):
+        # Split entities.json in two pages of three entities
+        RackspaceMockHttp.paged_requests += 1
+        data = json.loads(self.fixtures.load('entities.json'))
+        qs = urlparse.parse_qs(urlparse.urlparse(url).query)
+        RackspaceMockHttp.last_query = qs
+
+        if 'marker' in qs:
+            data['values'] = data['values'][3:]
+            data['metadata']['next_marker'] = None
+        else:
+            data['values'] = data['values'][:3]
+            data['metadata']['next_marker'] = data['values'][-1]['id']
+
+        return (httplib.OK, json.dumps(data), self.json_content_headers,
+                httplib.responses[httplib.OK])
+
     def _23213_check_types(self, method, url, body, headers):
         body = self.fixtures.load('check_types.json')
         return (httplib.OK, body, self.json_content_headers,
@@ -221,6 +695,13 @@ class RackspaceMockHttp(MockHttpTestCase):
         return (httplib.OK, body, self.json_content_headers,
                 httplib.responses[httplib.OK])
 
+    def _23213_views_overview(self, method, url, body, headers):
+        RackspaceMockHttp.last_query = urlparse.parse_qs(
+                                                urlparse.urlparse(url).query)
+        body = self.fixtures.load('views_overview.json')
+        return (httplib.OK, body, self.json_content_headers,
+                httplib.responses[httplib.OK])
+
     def _23213_entities_en8B9YwUn6_checks(self, method, url, body, headers):
         body = self.fixtures.load('checks.json')
         return (httplib.OK, body, self.json_content_headers,
@@ -263,9 +744,18 @@ class RackspaceMockHttp(MockHttpTestCase):
         if method == 'DELETE':
             return (httplib.NO_CONTENT, body, self.json_content_headers,
                     httplib.responses[httplib.NO_CONTENT])
+        elif method == 'GET':
+            body = self.fixtures.load('get_entity.json')
+            return (httplib.OK, body, self.json_content_headers,
+                    httplib.responses[httplib.OK])
 
         raise NotImplementedError('')
 
+    def _23213_entities_en8B9YwUn6_SLOW(self, method, url, body, headers):
+        RackspaceMockHttp.slow_requests += 1
+        time.sleep(0.2)
+        return self._23213_entities_en8B9YwUn6(method, url, body, headers)
+
     def _23213_entities_en8Xmk5lv1_CHILDREN_EXIST(self, method, url, body,
                                                   headers):
         if method == 'DELETE':
@@ -0,0 +1,142 @@
+# Licensed to the Apache Software Foundation (ASF) under one or more
+# contributor license agreements.  See the NOTICE file distributed with
+# this work for additional information regarding copyright ownership.
+# The ASF licenses this file to You under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with
+# the License.  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+
+from rackspace_monitoring.rollout import (EntitySelector, RolloutTemplate,
+                                          RolloutJournal, Rollout)
+
+from test.fakes import FakeMonitoringApi, fake_driver
+
+HTTP_CHECK = {'label': 'homepage', 'type': 'remote.http',
+              'target_alias': 'public0_v4', 'monitoring_zones': ['mzdfw'],
+              'details': {'url': 'http://localhost/', 'method': 'GET'}}
+HTTP_ALARM = {'criteria': 'if (metric["code"] != "200") { return CRITICAL }',
+              'notification_plan_id': 'npTechnicalContactsEmail'}
+
+
+class RolloutTests(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmp_dir, 'rollout.jsonl')
+        self.api = FakeMonitoringApi()
+        for i in range(20):
+            env = i % 2 and 'staging' or 'prod'
+            self.api.add_entity('web-%d' % (i),
+                                ip_addresses={'public0_v4': '10.0.0.%d' % (i)},
+                                metadata={'env': env})
+        self.driver = fake_driver(self.api)
+        self.template = RolloutTemplate(check=HTTP_CHECK, alarm=HTTP_ALARM)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def rollout(self, selector=None):
+        journal = RolloutJournal(self.path)
+        return Rollout(self.driver, self.template,
+                       selector or EntitySelector(), journal, max_workers=4)
+
+    def counts(self, name):
+        values = getattr(self.api, name).values()
+        return sorted(set([len(items) for items in values]))
+
+    def test_selector(self):
+        entity = self.driver.get_entity('en3')
+        self.assertTrue(EntitySelector().matches(entity))
+        self.assertTrue(EntitySelector(labels=['db-*', 'web-?'],
+                                       metadata={'env': 'staging'},
+                                       ip_aliases=['public0_v4'])
+                        .matches(entity))
+        self.assertFalse(EntitySelector(labels=['web-1*']).matches(entity))
+        self.assertFalse(EntitySelector(metadata={'env': 'prod'})
+                         .matches(entity))
+        self.assertFalse(EntitySelector(ip_aliases=['private0_v4'])
+                         .matches(entity))
+
+    def test_rollout(self):
+        report = self.rollout(EntitySelector(metadata={'env': 'prod'})).run()
+        self.assertEqual(len(report.created), 10)
+        self.assertEqual(len(self.api.checks['en0']), 1)
+        self.assertEqual(self.api.checks['en1'], [])
+
+        alarm = self.api.alarms['en0'][0]
+        self.assertEqual(alarm['check_id'], self.api.checks['en0'][0]['id'])
+        self.assertEqual(alarm['check_type'], 'remote.http')
+
+        # Running again with the same journal doesn't do anything
+        report = self.rollout(EntitySelector(metadata={'env': 'prod'})).run()
+        self.assertEqual(report.already_done, 10)
+        self.assertEqual(report.created, [])
+        self.assertEqual(self.counts('checks'), [0, 1])
+        self.assertEqual(self.counts('alarms'), [0, 1])
+
+    def test_resume_after_failure(self):
+        self.api.fail('POST', '/entities/(en2|en5)/alarms')
+        report = self.rollout().run()
+        self.assertEqual(len(report.created), 18)
+        self.assertEqual(sorted([item[0] for item in report.failed]),
+                         ['en2', 'en5'])
+
+        del self.api.failures[:]
+        report = self.rollout().run()
+        self.assertEqual(report.already_done, 18)
+        self.assertEqual(sorted([item[0] for item in report.created]),
+                         ['en2', 'en5'])
+        self.assertEqual(self.counts('checks'), [1])
+        self.assertEqual(self.counts('alarms'), [1])
+
+    def test_equivalent_checks_are_skipped(self):
+        # Created before the journal existed (e.g. by hand)
+        entity = self.driver.get_entity('en0')
+        check = self.driver.create_check(entity, **HTTP_CHECK)
+        self.driver.create_alarm(entity, check_id=check.id,
+                                 check_type='remote.http', **HTTP_ALARM)
+        entity = self.driver.get_entity('en1')
+        self.driver.create_check(entity, **HTTP_CHECK)
+
+        report = self.rollout().run()
+        self.assertEqual(report.skipped, ['en0'])
+        self.assertEqual(len(report.created), 19)
+        self.assertEqual(self.counts('checks'), [1])
+        self.assertEqual(self.counts('alarms'), [1])
+
+    def test_partially_written_journal(self):
+        del self.api.entities[2:]
+        self.rollout().run()
+        fp = open(self.path, 'a')
+        fp.write('{"event": "alarm_cre')
+        fp.close()
+
+        self.api.add_entity('web-2', id='en2')
+        report = self.rollout().run()
+        self.assertEqual(len(report.created), 1)
+
+        journal = RolloutJournal(self.path)
+        self.assertEqual(len(journal.entities), 3)
+        self.assertTrue(journal.is_done('en2'))
+
+    def test_different_template(self):
+        self.rollout().run()
+        self.template = RolloutTemplate(check=HTTP_CHECK,
+                                        alarm={'criteria': 'return OK'})
+        self.assertRaises(ValueError, self.rollout().run)
+
+
+if __name__ == '__main__':
+    sys.exit(unittest.main())
@@ -0,0 +1,240 @@
+# Licensed to the Apache Software Foundation (ASF) under one or more
+# contributor license agreements.  See the NOTICE file distributed with
+# this work for additional information regarding copyright ownership.
+# The ASF licenses this file to You under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with
+# the License.  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from __future__ import with_statement
+
+import sys
+import time
+import threading
+import unittest
+
+from rackspace_monitoring.drivers.rackspace import RackspaceMonitoringDriver
+from rackspace_monitoring.scheduler import RequestScheduler, PriorityClass
+
+from test.fakes import wait_for
+from test.test_rackspace import RackspaceMockHttp
+from secrets import RACKSPACE_PARAMS
+
+
+class RequestSchedulerTests(unittest.TestCase):
+    def test_interactive_goes_first(self):
+        scheduler = RequestScheduler(max_concurrency=1)
+        order = []
+
+        def request(name):
+            ticket = scheduler.acquire(name)
+            order.append(name)
+            scheduler.release(ticket)
+
+        running = scheduler.acquire('background')
+        threads = [threading.Thread(target=request, args=('background',))
+                   for _ in range(3)]
+        threads.append(threading.Thread(target=request,
+                                        args=('interactive',)))
+        for thread in threads:
+            thread.start()
+            # Queue them in order
+            wait_for(lambda: sum([item['waiting'] for item in
+                                  scheduler.stats().values()]) ==
+                     threads.index(thread) + 1)
+
+        scheduler.release(running)
+        for thread in threads:
+            thread.join()
+        self.assertEqual(order, ['interactive', 'background', 'background',
+                                 'background'])
+
+    def test_class_concurrency_limit(self):
+        scheduler = RequestScheduler(max_concurrency=4)
+        tickets = [scheduler.acquire('background') for _ in range(2)]
+
+        thread = threading.Thread(target=lambda: tickets.append(
+                                  scheduler.acquire('background')))
+        thread.start()
+        self.assertTrue(wait_for(lambda: scheduler.stats()['background']
+                                 ['waiting'] == 1))
+
+        # Other classes can still use the free slots
+        tickets.append(scheduler.acquire('interactive'))
+        self.assertEqual(scheduler.stats()['background']['active'], 2)
+
+        scheduler.release(tickets.pop(0))
+        thread.join()
+        self.assertEqual(scheduler.stats()['background'],
+                         {'active': 2, 'waiting': 0, 'granted': 3})
+
+    def test_returning_class_starts_at_lowest_busy_vtime(self):
+        scheduler = RequestScheduler(max_concurrency=10, classes=[
+                                     PriorityClass('fast', weight=10),
+                                     PriorityClass('slow', weight=1),
+                                     PriorityClass('new', weight=1)],
+                                     default_class='slow')
+        scheduler.acquire('fast')
+        scheduler.acquire('slow')
+        # Clamped to the virtual time of the fast class (0.1), not to the
+        # one of the last granted request (1.0)
+        scheduler.acquire('new')
+        self.assertAlmostEqual(scheduler.classes['new'].vtime, 1.1)
+
+    def test_interrupted_acquire(self):
+        scheduler = RequestScheduler(max_concurrency=1)
+        running = scheduler.acquire()
+        wait = scheduler._cond.wait
+
+        def interrupted(timeout=None):
+            raise KeyboardInterrupt()
+
+        def granted_then_interrupted(timeout=None):
+            # The slot is granted to the waiting request right before the
+            # interrupt
+            scheduler.release(running)
+            raise KeyboardInterrupt()
+
+        scheduler._cond.wait = interrupted
+        self.assertRaises(KeyboardInterrupt, scheduler.acquire)
+        self.assertEqual(scheduler.stats()['default'],
+                         {'active': 1, 'waiting': 0, 'granted': 1})
+
+        scheduler._cond.wait = granted_then_interrupted
+        self.assertRaises(KeyboardInterrupt, scheduler.acquire)
+        self.assertEqual(scheduler.stats()['default'],
+                         {'active': 0, 'waiting': 0, 'granted': 2})
+
+        scheduler._cond.wait = wait
+        scheduler.release(scheduler.acquire('interactive'))
+        self.assertEqual(scheduler._active, 0)
+
+    def test_rate(self):
+        scheduler = RequestScheduler(max_concurrency=4, rate=20)
+        start = time.time()
+        for _ in range(5):
+            scheduler.release(scheduler.acquire())
+        self.assertTrue(time.time() - start >= 0.15)
+
+    def test_unknown_class(self):
+        scheduler = RequestScheduler(classes=[PriorityClass('default')])
+        self.assertRaises(ValueError, scheduler.acquire, 'interactive')
+        self.assertRaises(ValueError, RequestScheduler,
+                          classes=[PriorityClass('bulk')])
+
+
+class DriverPriorityTests(unittest.TestCase):
+    def setUp(self):
+        RackspaceMonitoringDriver.connectionCls.conn_classes = (
+                RackspaceMockHttp, RackspaceMockHttp)
+        RackspaceMonitoringDriver.connectionCls.auth_url = \
+                'https://auth.api.example.com/v1.1/'
+        RackspaceMockHttp.type = None
+
+        self.scheduler = RequestScheduler()
+        self.driver = RackspaceMonitoringDriver(
+            *RACKSPACE_PARAMS, ex_force_base_url='http://www.todo.com',
+            ex_scheduler=self.scheduler)
+
+    def granted(self):
+        return dict([(name, item['granted']) for name, item in
+                     self.scheduler.stats().items()])
+
+    def test_default_priority(self):
+        self.assertEqual(len(self.driver.list_entities()), 6)
+        self.assertEqual(self.granted(), {'interactive': 0, 'default': 1,
+                                          'background': 0})
+
+    def test_priority_context(self):
+        with self.driver.ex_priority('interactive'):
+            len(self.driver.list_notifications())
+        len(self.driver.list_notifications())
+        self.assertEqual(self.granted(), {'interactive': 1, 'default': 1,
+                                          'background': 0})
+
+    def test_priority_view(self):
+        background = self.driver.ex_with_priority('background')
+        entities = background.list_entities()
+        self.assertEqual(self.granted()['background'], 0)
+        # The pages are requested when the list is used
+        self.assertEqual(len(entities), 6)
+
+        for entity in background.list_entities(ex_stream=True):
+            pass
+        self.assertEqual(self.granted(), {'interactive': 0, 'default': 0,
+                                          'background': 2})
+
+
+    def test_workers_use_caller_priority(self):
+        background = self.driver.ex_with_priority('background')
+        background.ex_fetch_account_snapshot(ex_max_workers=3)
+        granted = self.granted()
+        self.assertEqual((granted['interactive'], granted['default']),
+                         (0, 0))
+        self.assertTrue(granted['background'] > 6)
+
+    def test_service_time_excludes_waiting(self):
+        running = self.scheduler.acquire('default')
+        for _ in range(self.scheduler.max_concurrency - 1):
+            self.scheduler.acquire('interactive')
+        times = []
+
+        def list_entities():
+            start = time.time()
+            len(self.driver.list_entities())
+            times.append((time.time() - start,
+                          self.driver.connection.last_service_time))
+
+        thread = threading.Thread(target=list_entities)
+        thread.daemon = True
+        thread.start()
+        time.sleep(0.3)
+        self.scheduler.release(running)
+        thread.join(2)
+
+        total, service_time = times[0]
+        self.assertTrue(total >= 0.3)
+        self.assertTrue(service_time < 0.2)
+
+    def test_single_flight_per_priority(self):
+        scheduler = RequestScheduler(max_concurrency=2)
+        self.driver.connection.scheduler = scheduler
+        # Only one background request at a time, which is taken
+        running = scheduler.acquire('background')
+
+        background = threading.Thread(target=self.driver.ex_with_priority(
+                                      'background').get_entity,
+                                      args=('en8B9YwUn6',))
+        background.daemon = True
+        background.start()
+        self.assertTrue(wait_for(lambda: scheduler.stats()['background']
+                                 ['waiting'] == 1))
+
+        # The same GET isn't shared with the queued background request
+        result = []
+
+        def get_entity():
+            with self.driver.ex_priority('interactive'):
+                result.append(self.driver.get_entity('en8B9YwUn6'))
+
+        interactive = threading.Thread(target=get_entity)
+        interactive.daemon = True
+        interactive.start()
+        interactive.join(2)
+        self.assertEqual([entity.id for entity in result], ['en8B9YwUn6'])
+        self.assertTrue(background.isAlive())
+
+        scheduler.release(running)
+        background.join(2)
+        self.assertFalse(background.isAlive())
+
+
+if __name__ == '__main__':
+    sys.exit(unittest.main())
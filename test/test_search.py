@@ -0,0 +1,117 @@
+# Licensed to the Apache Software Foundation (ASF) under one or more
+# contributor license agreements.  See the NOTICE file distributed with
+# this work for additional information regarding copyright ownership.
+# The ASF licenses this file to You under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with
+# the License.  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import sys
+import unittest
+
+from rackspace_monitoring.base import Entity, Check
+from rackspace_monitoring.drivers.rackspace import RackspaceMonitoringDriver
+from rackspace_monitoring.search import SearchIndex
+
+from test.test_rackspace import RackspaceMockHttp
+from secrets import RACKSPACE_PARAMS
+
+
+def entity(id, label, ip_addresses=None, extra=None):
+    return Entity(id=id, label=label, ip_addresses=ip_addresses or [],
+                  extra=extra, driver=None)
+
+
+def check(id, entity_id, label, target_alias=None, details=None):
+    return Check(id=id, label=label, timeout=30, period=60,
+                 monitoring_zones=[], target_alias=target_alias,
+                 target_resolver=None, type='remote.http',
+                 details=details or {}, entity_id=entity_id, driver=None)
+
+
+class SearchIndexTests(unittest.TestCase):
+    def setUp(self):
+        self.index = SearchIndex()
+        self.web = entity('en1', 'prod-web-01',
+                          ip_addresses=[('public0_v4', '10.1.2.3')],
+                          extra={'environment': 'Production'})
+        self.db = entity('en2', 'prod-db-01',
+                         ip_addresses=[('public0_v4', '10.1.9.9')])
+        self.http = check('ch1', 'en1', 'Homepage', target_alias='public0_v4',
+                          details={'url': 'http://www.example.com/login',
+                                   'headers': {'Host': 'example.com'}})
+        self.index.add_many([self.web, self.db, self.http])
+
+    def ids(self, result):
+        return [obj.id for obj in result]
+
+    def test_substring(self):
+        self.assertEqual(self.ids(self.index.search('web')), ['en1'])
+        self.assertEqual(self.ids(self.index.search('prod')), ['en1', 'en2'])
+        self.assertEqual(self.ids(self.index.search('1.2.')), ['en1'])
+        self.assertEqual(self.ids(self.index.search('/LOGIN')), ['ch1'])
+        self.assertEqual(self.ids(self.index.search('uction')), ['en1'])
+        self.assertEqual(self.index.search('missing'), [])
+        self.assertEqual(self.index.search(''), [])
+
+    def test_prefix(self):
+        self.assertEqual(self.ids(self.index.search('10.1', prefix=True)),
+                         ['en1', 'en2'])
+        self.assertEqual(self.ids(self.index.search('db', prefix=True)),
+                         ['en2'])
+        self.assertEqual(self.index.search('eb', prefix=True), [])
+        self.assertEqual(self.ids(self.index.search('public0',
+                                                    prefix=True)), ['ch1'])
+
+    def test_kind_and_limit(self):
+        self.assertEqual(self.ids(self.index.search('o', kind='check')),
+                         ['ch1'])
+        self.assertEqual(self.ids(self.index.search('o', limit=2)),
+                         ['en1', 'en2'])
+
+    def test_incremental_updates(self):
+        renamed = entity('en2', 'staging-db-01')
+        self.index.add(renamed)
+        self.assertEqual(self.ids(self.index.search('prod')), ['en1'])
+        self.assertTrue(self.index.search('staging')[0] is renamed)
+        self.assertEqual(len(self.index), 3)
+
+        # Removing an entity also removes its checks
+        self.index.remove(self.web)
+        self.assertEqual(self.index.search('homepage'), [])
+        self.assertEqual(self.index.search('prod'), [])
+        self.assertEqual(len(self.index), 1)
+
+    def test_many_pending_changes(self):
+        self.index.add_many([entity('en%d' % (i), 'host-%05d' % (i))
+                             for i in range(3000)])
+        self.assertEqual(len(self.index.search('host-', prefix=True)), 3000)
+        self.assertEqual(self.ids(self.index.search('02999')), ['en2999'])
+
+    def test_refresh_from_overview(self):
+        RackspaceMonitoringDriver.connectionCls.conn_classes = (
+                RackspaceMockHttp, RackspaceMockHttp)
+        RackspaceMonitoringDriver.connectionCls.auth_url = \
+                'https://auth.api.example.com/v1.1/'
+        RackspaceMockHttp.type = None
+        driver = RackspaceMonitoringDriver(*RACKSPACE_PARAMS,
+                ex_force_base_url='http://www.todo.com')
+
+        self.index.refresh(driver)
+        self.assertEqual(len(self.index), 4)
+        self.assertEqual(self.ids(self.index.search('86.58')), ['endYGlC6Gt'])
+        self.assertEqual(self.ids(self.index.search('www.foo')),
+                         ['chhJwYeArX'])
+        self.assertEqual(self.ids(self.index.search('ping', kind='check')),
+                         ['chAb1Ya1Ct'])
+
+
+if __name__ == '__main__':
+    sys.exit(unittest.main())
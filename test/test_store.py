@@ -0,0 +1,116 @@
+# Licensed to the Apache Software Foundation (ASF) under one or more
+# contributor license agreements.  See the NOTICE file distributed with
+# this work for additional information regarding copyright ownership.
+# The ASF licenses this file to You under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with
+# the License.  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import sys
+import unittest
+
+from rackspace_monitoring.base import Entity
+from rackspace_monitoring.drivers.rackspace import RackspaceMonitoringDriver
+from rackspace_monitoring.store import SnapshotStore
+
+from test.test_rackspace import RackspaceMockHttp
+from secrets import RACKSPACE_PARAMS
+
+
+class SnapshotStoreTests(unittest.TestCase):
+    def setUp(self):
+        RackspaceMonitoringDriver.connectionCls.conn_classes = (
+                RackspaceMockHttp, RackspaceMockHttp)
+        RackspaceMonitoringDriver.connectionCls.auth_url = \
+                'https://auth.api.example.com/v1.1/'
+        RackspaceMockHttp.type = None
+        self.driver = RackspaceMonitoringDriver(*RACKSPACE_PARAMS,
+                ex_force_base_url='http://www.todo.com')
+        self.store = SnapshotStore(':memory:', driver=self.driver)
+        self.store.refresh()
+
+    def tearDown(self):
+        self.store.close()
+
+    def test_entities(self):
+        self.assertEqual(len(self.store.entities()), 2)
+        entity = self.store.get_entity('endYGlC6Gt')
+        self.assertEqual(entity.label, 'server')
+        self.assertEqual(entity.extra, {'environment': 'production'})
+        self.assertEqual(entity.ip_addresses, [('default', '86.58.76.208')])
+
+        result = self.store.entities(ip_address='127.0.0.1')
+        self.assertEqual([entity.id for entity in result], ['en8B9YwUn6'])
+        result = self.store.entities(target_alias='default', label='server')
+        self.assertEqual([entity.id for entity in result], ['endYGlC6Gt'])
+        self.assertEqual(self.store.get_entity('enMissing'), None)
+
+    def test_checks(self):
+        self.assertEqual(len(self.store.checks()), 2)
+        self.assertEqual(len(self.store.checks(zone='mzxJ4L2IU')), 2)
+        result = self.store.checks(zone='mzdfw')
+        self.assertEqual(result[0].id, 'chAb1Ya1Ct')
+        self.assertEqual(result[0].monitoring_zones, ('mzxJ4L2IU', 'mzdfw'))
+        result = self.store.checks(type='remote.http', target_alias='1')
+        self.assertEqual(result[0].details['url'], 'http://www.foo.com')
+        self.assertEqual(self.store.checks(entity_id='enMissing'), [])
+
+    def test_alarms_and_notification_plans(self):
+        result = self.store.alarms(notification_plan_id='npIXxOAn5')
+        self.assertEqual([alarm.id for alarm in result], ['aldIpNY8t3'])
+        self.assertEqual(result[0].check_id, 'chhJwYeArX')
+
+        self.assertEqual(len(self.store.notifications()), 2)
+        self.assertEqual(len(self.store.notification_plans()), 8)
+        result = self.store.notification_plans(notification_id='ntvJMd0gcG')
+        self.assertEqual([plan.id for plan in result], ['npIXxOAn5'])
+
+    def test_latest_alarm_states(self):
+        result = self.store.latest_alarm_states(state='CRITICAL')
+        self.assertEqual(len(result), 1)
+        self.assertEqual(result[0].alarm_id, 'aldIpNY8t3')
+
+    def test_incremental_refresh(self):
+        entity = self.store.get_entity('en8B9YwUn6')
+        self.store.store_checks(entity.id, [])
+        self.assertEqual(self.store.checks(entity_id=entity.id), [])
+        self.assertEqual(len(self.store.checks()), 1)
+
+        self.store.refresh_entity(entity)
+        self.assertEqual(len(self.store.checks(entity_id=entity.id)), 1)
+        self.assertTrue(self.store.refreshed_at('checks:en8B9YwUn6'))
+
+    def test_removed_entities_are_swept(self):
+        entities = [entity for entity in self.driver.list_entities() if
+                    entity.id != 'endYGlC6Gt']
+        self.store.store_entities(entities)
+        self.assertEqual(len(self.store.entities()), 5)
+        self.assertEqual(self.store.checks(entity_id='endYGlC6Gt'), [])
+        self.assertEqual(len(self.store.checks()), 1)
+
+    def test_failed_overview_is_rolled_back(self):
+        refreshed_at = self.store.refreshed_at('overview')
+        item = list(self.driver.ex_views_overview())[0]
+        item['entity'] = Entity(id='enNew', label='new', ip_addresses=[],
+                                driver=self.driver)
+
+        def items():
+            yield item
+            raise IOError('Connection reset')
+
+        self.assertRaises(IOError, self.store.store_overview, items())
+        # Not left in an open transaction which the next write would commit
+        self.store.store_notifications(self.driver.list_notifications())
+        self.assertEqual(self.store.get_entity('enNew'), None)
+        self.assertEqual(len(self.store.checks()), 2)
+        self.assertEqual(self.store.refreshed_at('overview'), refreshed_at)
+
+if __name__ == '__main__':
+    sys.exit(unittest.main())
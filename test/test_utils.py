@@ -0,0 +1,156 @@
+# Licensed to the Apache Software Foundation (ASF) under one or more
+# contributor license agreements.  See the NOTICE file distributed with
+# this work for additional information regarding copyright ownership.
+# The ASF licenses this file to You under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with
+# the License.  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import sys
+import threading
+import unittest
+
+from rackspace_monitoring.base import AlarmChangelog
+from rackspace_monitoring.utils import imap_unordered, ChangelogCursor
+from rackspace_monitoring.utils import Interner, DriverPool, is_auth_error
+
+from test.fakes import FakeMonitoringApi, fake_driver, wait_for
+
+
+class ImapUnorderedTests(unittest.TestCase):
+    def test_results_and_errors(self):
+        def func(item):
+            if item == 3:
+                raise ValueError('three')
+            return item * 2
+
+        results = sorted(imap_unordered(func, range(5), max_workers=2))
+        self.assertEqual([(item, result) for item, result, _ in results],
+                         [(0, 0), (1, 2), (2, 4), (3, None), (4, 8)])
+        self.assertTrue(isinstance(results[3][2], ValueError))
+
+    def test_items_error_is_raised(self):
+        def items():
+            yield 1
+            raise ValueError('bad input')
+
+        results = []
+
+        def consume():
+            for value in imap_unordered(lambda item: item * 2, items(),
+                                        max_workers=2):
+                results.append(value)
+
+        self.assertRaises(ValueError, consume)
+        self.assertEqual(results, [(1, 2, None)])
+
+    def test_close_stops_workers(self):
+        before = threading.activeCount()
+        consumed = []
+
+        def items():
+            for i in xrange(1000):
+                consumed.append(i)
+                yield i
+
+        inner = imap_unordered(lambda item: item, items(), max_workers=2)
+        outer = imap_unordered(lambda value: value[1], inner, max_workers=2)
+        outer.next()
+        outer.close()
+
+        self.assertTrue(wait_for(lambda: threading.activeCount() == before))
+        self.assertTrue(len(consumed) < 1000)
+
+
+
+class ChangelogCursorTests(unittest.TestCase):
+    def change(self, id, timestamp):
+        return AlarmChangelog(id=id, alarm_id='al1', entity_id='en1',
+                              check_id='ch1', state='OK',
+                              timestamp=timestamp)
+
+    def test_filter(self):
+        cursor = ChangelogCursor()
+        changes = [self.change('cl1', 1000), self.change('cl2', 2000)]
+        self.assertEqual([item.id for item in cursor.filter(changes)],
+                         ['cl1', 'cl2'])
+        self.assertEqual(cursor.start, 2000)
+
+        # The API returns the changes at the start timestamp again
+        changes = [self.change('cl2', 2000), self.change('cl3', 2000),
+                   self.change('cl4', 3000)]
+        self.assertEqual([item.id for item in cursor.filter(changes)],
+                         ['cl3', 'cl4'])
+        self.assertEqual(cursor.start, 3000)
+        self.assertEqual(list(cursor.filter(changes[2:])), [])
+
+
+
+class InternerTests(unittest.TestCase):
+    def test_shared_and_bounded(self):
+        interner = Interner(max_size=3)
+        value = interner(u'remote.http')
+        self.assertTrue(interner(u'remote.' + u'http') is value)
+        self.assertEqual(interner.sequence([u'mzdfw', u'mzord']),
+                         (u'mzdfw', u'mzord'))
+
+        for i in range(10):
+            interner(u'value%d' % (i))
+        self.assertTrue(len(interner) <= 3)
+
+TOKEN_EXPIRED = {'code': 401, 'type': 'unauthorizedError',
+                 'message': 'Token expired', 'details': ''}
+
+
+class DriverPoolTests(unittest.TestCase):
+    def setUp(self):
+        self.api = FakeMonitoringApi()
+        self.api.add_entity('web01')
+        self.created = []
+        self.pool = DriverPool(self.create_driver, max_size=2)
+
+    def create_driver(self, username, api_key):
+        self.created.append(username)
+        return fake_driver(self.api)
+
+    def list_entities(self, driver):
+        return [entity.label for entity in driver.list_entities()]
+
+    def test_is_auth_error(self):
+        self.assertTrue(is_auth_error(Exception({'code': 401})))
+        self.assertFalse(is_auth_error(Exception({'code': 413})))
+        self.assertFalse(is_auth_error(Exception('401')))
+
+    def test_drivers_are_reused(self):
+        for username in ['a', 'b', 'a', 'c', 'b']:
+            self.assertEqual(self.pool.call(username, 'key',
+                                            self.list_entities), ['web01'])
+        # b has been dropped to make room for c
+        self.assertEqual(self.created, ['a', 'b', 'c', 'b'])
+
+    def test_expired_token_is_retried_once(self):
+        self.pool.call('a', 'key', self.list_entities)
+        self.api.fail('GET', '/entities', 401, TOKEN_EXPIRED, count=1)
+        self.assertEqual(self.pool.call('a', 'key', self.list_entities),
+                         ['web01'])
+        self.assertEqual(self.created, ['a', 'a'])
+
+        self.api.fail('GET', '/entities', 401, TOKEN_EXPIRED, count=2)
+        self.assertRaises(Exception, self.pool.call, 'a', 'key',
+                          self.list_entities)
+        self.api.fail('GET', '/entities', count=1)
+        # Other errors aren't retried
+        self.assertRaises(Exception, self.pool.call, 'a', 'key',
+                          self.list_entities)
+        self.assertEqual(self.created, ['a', 'a', 'a'])
+
+
+if __name__ == '__main__':
+    sys.exit(unittest.main())